@@ -3,7 +3,10 @@ from typing import Any, Final
 from rest_framework import serializers
 
 from apps.arts import models
-from api.v1.users.serializers import ShortRetrieveUserSerializer
+from api.v1.users.serializers import (
+    PrefetchingListSerializer,
+    ShortRetrieveUserSerializer,
+)
 
 
 class RetrieveArtSerializer(serializers.ModelSerializer):
@@ -111,6 +114,10 @@ class ArtCommentSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'art': {'read_only': True},
         }
+        list_serializer_class = PrefetchingListSerializer
+
+    def prefetch(self, comments: list[models.ArtComment]) -> None:
+        self.fields['user'].prefetch_cards([comment.user_id for comment in comments])
 
     def create(self, validated_data: dict[str, Any]) -> models.ArtComment:
         user = self.context['request'].user
@@ -235,6 +235,8 @@ class ArtViewSet(
             )
 
         ArtLike.objects.create(user_id=request.user.pk, art_id=art.pk)
+        # Лайки пользователя участвуют в рекомендациях подписок его подписчиков.
+        User.objects.log_follow_suggestions_input_change(request.user.pk)
 
         return Response(status=status.HTTP_200_OK)
     
@@ -248,6 +250,7 @@ class ArtViewSet(
             )
         
         ArtLike.objects.filter(user_id=request.user.pk, art_id=art.pk).delete()
+        User.objects.log_follow_suggestions_input_change(request.user.pk)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -275,7 +278,12 @@ class ArtCommentsViewSet(
         return self.permissions_map.get(self.action, ())
 
     def get_queryset(self) -> QuerySet[ArtComment]:
-        return ArtComment.objects.filter(art_id=self.kwargs['art_pk']).order_by('-created_at')
+        return (
+            ArtComment.objects
+            .filter(art_id=self.kwargs['art_pk'])
+            .select_related('user')
+            .order_by('-created_at')
+        )
     
     def perform_authentication(self, request: Request) -> None:
         if self.action in ('list', ):
@@ -19,16 +19,16 @@ chats_openapi = {
         summary=_("Получение чатов пользователя"),
         description=_(
             'Позволяет получить список чатов в порядке последних сообщений: чаты со свежими сообщениями - в начале, с более старыми - в конце.<br><br>'
-            'Поддерживает пагинацию по следующим параметрам: `page`, `page_size`.<br><br>'
+            'Поддерживает пагинацию по курсору: `cursor`, `page_size`. '
+            'Ссылки на соседние страницы отдаются в полях `next` и `previous`.<br><br>'
+            'Поле `unread_count` - количество непрочитанных сообщений собеседников после отметки о прочтении.<br>'
         ),
         parameters=[
             OpenApiParameter(
-                name='page',
+                name='cursor',
                 description=_(
-                    'Выбор страницы с чатами.<br><br>'
-                    'Принимает целое число (номер страницы) либо `last` значение для выбора последней страницы.<br><br>'
-                    'Нумерация страниц начинается с `1`.<br><br>'
-                    'По умолчанию выбирает чаты `первой` страницы.<br>'
+                    'Курсор страницы из ссылок `next` или `previous` предыдущего ответа.<br><br>'
+                    'Без курсора возвращаются чаты с самой свежей активностью.<br>'
                 ),
                 type=OpenApiTypes.STR,
                 location='query',
@@ -62,18 +62,27 @@ chat_messages_openapi = {
         summary=_("Получение сообщений чата"),
         description=_(
             'Позволяет получить список сообщений в порядке убывания даты: в начале - самые свежие сообщения, в конце - самые старые сообщения.<br><br>'
-            'Поддерживает пагинацию по следующим параметрам: `page`, `page_size`.<br><br>'
+            'Поддерживает пагинацию по курсору из id сообщения: `before`, `after`, `page_size`.<br><br>'
+            'Поле `has_more` показывает, есть ли еще сообщения в направлении курсора '
+            '(без курсора и с `before` - более старые, с `after` - более новые).<br>'
         ),
         parameters=[
             OpenApiParameter(
-                name='page',
+                name='before',
                 description=_(
-                    'Выбор страницы с сообщениями.<br><br>'
-                    'Принимает целое число (номер страницы) либо `last` значение для выбора последней страницы.<br><br>'
-                    'Нумерация страниц начинается с `1`.<br><br>'
-                    'По умолчанию выбирает сообщения `первой` страницы.<br>'
+                    'Id сообщения, сообщения старше которого нужно получить.<br><br>'
+                    'Без `before` и `after` возвращаются самые свежие сообщения.<br>'
                 ),
-                type=OpenApiTypes.STR,
+                type=OpenApiTypes.INT,
+                location='query',
+            ),
+            OpenApiParameter(
+                name='after',
+                description=_(
+                    'Id сообщения, сообщения новее которого нужно получить.<br><br>'
+                    'Нельзя передавать вместе с `before`.<br>'
+                ),
+                type=OpenApiTypes.INT,
                 location='query',
             ),
             OpenApiParameter(
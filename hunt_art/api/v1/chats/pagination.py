@@ -1,13 +1,121 @@
-from rest_framework.pagination import PageNumberPagination
+from typing import Any
 
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+)
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.chats.models import ChatMessage
+from apps.chats.services.chat_messages import get_chat_message_created_at
+
+
+class ChatPagination(CursorPagination):
+    """
+    Пагинация списка чатов по курсору: от чатов с самой свежей активностью к давним.
+
+    Порядок покрыт индексом `(-last_message_at, -id)`, COUNT не выполняется.
+    """
 
-class ChatPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 50
+    ordering = ('-last_message_at', '-id')
+
+
+class ChatMessagePagination(BasePagination):
+    """
+    Пагинация истории чата по курсору из id сообщения.
+
+    `before=<id>` - сообщения старше указанного, `after=<id>` - новее, без курсора -
+    самые свежие. Сообщения упорядочены по `(created_at, id)`: порядок стабилен
+    и покрыт индексом `(chat, created_at, id)`, поэтому страница в глубине
+    истории стоит столько же, сколько первая. COUNT не выполняется, вместо него
+    отдается `has_more` - есть ли еще сообщения в направлении курсора.
+
+    Сообщения на любой странице идут от новых к старым.
 
+    При отложенной записи клиент получает id сообщения раньше, чем оно попадает в БД.
+    Курсор такого сообщения восстанавливается из самого id: время создания в нем зашито.
+    """
 
-class ChatMessagePagination(PageNumberPagination):
     page_size = 50
-    page_query_param = "page_size"
+    page_size_query_param = "page_size"
     max_page_size = 200
+    before_query_param = "before"
+    after_query_param = "after"
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet[ChatMessage],
+        request: Request,
+        view: APIView | None = None,
+    ) -> list[ChatMessage]:
+        page_size = self._get_int_param(request, self.page_size_query_param) or self.page_size
+        page_size = min(max(page_size, 1), self.max_page_size)
+        before_pk = self._get_int_param(request, self.before_query_param)
+        after_pk = self._get_int_param(request, self.after_query_param)
+        if before_pk is not None and after_pk is not None:
+            raise ValidationError({self.after_query_param: "Нельзя передать одновременно before и after."})
+
+        if after_pk is not None:
+            cursor = self._get_cursor(queryset, after_pk)
+            queryset = queryset.filter(
+                Q(created_at__gt=cursor[0]) | Q(created_at=cursor[0], pk__gt=cursor[1]),
+                # Избыточное условие дает индексу границу диапазона.
+                created_at__gte=cursor[0],
+            ).order_by("created_at", "pk")
+        else:
+            if before_pk is not None:
+                cursor = self._get_cursor(queryset, before_pk)
+                queryset = queryset.filter(
+                    Q(created_at__lt=cursor[0]) | Q(created_at=cursor[0], pk__lt=cursor[1]),
+                    created_at__lte=cursor[0],
+                )
+            queryset = queryset.order_by("-created_at", "-pk")
+
+        # Лишнее сообщение показывает, есть ли что-то дальше.
+        messages = list(queryset[:page_size + 1])
+        self.has_more = len(messages) > page_size
+        messages = messages[:page_size]
+        if after_pk is not None:
+            messages.reverse()
+        return messages
+
+    def get_paginated_response(self, data: list[dict[str, Any]]) -> Response:
+        return Response({
+            "has_more": self.has_more,
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "type": "object",
+            "required": ["has_more", "results"],
+            "properties": {
+                "has_more": {"type": "boolean"},
+                "results": schema,
+            },
+        }
+
+    def _get_cursor(self, queryset: QuerySet[ChatMessage], message_pk: int) -> tuple[Any, int]:
+        cursor = queryset.filter(pk=message_pk).values_list("created_at", "pk").first()
+        if cursor is None and settings.CHAT_MESSAGES_WRITE_BEHIND:
+            return get_chat_message_created_at(message_pk), message_pk
+        if cursor is None:
+            raise ValidationError({"detail": "Сообщение для курсора не найдено в этом чате."})
+        return cursor
+
+    def _get_int_param(self, request: Request, name: str) -> int | None:
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: "Ожидается целое число."})
@@ -1,3 +1,5 @@
+from typing import Any, Iterable
+
 from rest_framework import serializers
 
 from apps.chats.models import (
@@ -8,14 +10,29 @@ from apps.chats.models import (
     ChatMessage,
 )
 from apps.users.models import User
+from apps.users.services.user_cards import UserCard, user_cards_cache
+from api.v1.users.serializers import (
+    PrefetchingListSerializer,
+    build_absolute_media_uri,
+)
 
 
 class ShortChatSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор чата для списка чатов.
+
+    Собеседник персонального чата определяется по паре пользователей из `PersonalChatData`,
+    а его имя и аватарка берутся из кэша карточек пользователей одним обращением
+    на всю страницу (см. `prefetch`). Карточки хранятся в контексте под ключом `user_cards`.
+    """
+
     name = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
     # chat_id = serializers.SerializerMethodField()
     user_id = serializers.SerializerMethodField()
     has_unread_messages = serializers.SerializerMethodField()
+    # Счетчик текущего участника чата, подставляется аннотацией в `ChatsViewSet.get_queryset`.
+    unread_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Chat
@@ -26,22 +43,33 @@ class ShortChatSerializer(serializers.ModelSerializer):
             "name",
             "avatar",
             "has_unread_messages",
+            "unread_count",
+            "last_message_id",
+            "last_message_at",
+            "last_message_preview",
         )
+        list_serializer_class = PrefetchingListSerializer
 
-    def get_has_unread_messages(self, obj: Chat) -> bool:
-        current_user: User = self.context['request'].user
-        chat_member = ChatMember.objects.filter(chat=obj, user=current_user).first()
-        if chat_member.read_before is None:
-            return True
-        
-        print('---------------------')
-        print(f'Member: {chat_member.read_before}')
-        print(f'Message: {ChatMessage.objects.filter(chat=obj).order_by("-created_at").first().created_at}')
-        print('=====================')
+    def prefetch(self, chats: list[Chat]) -> None:
+        self._prefetch_cards(
+            self._get_other_user_pk(chat)
+            for chat in chats
+            if chat.chat_type == Chat.ChatType.PERSONAL
+        )
+
+    def _prefetch_cards(self, user_pks: Iterable[Any]) -> None:
+        # Для удаленных собеседников карточки нет. Запоминаем это как `None`,
+        # чтобы не обращаться за ней повторно на каждое поле каждого чата.
+        cards: dict[Any, UserCard | None] = self.context.setdefault("user_cards", {})
+        user_pks = set(user_pks) - cards.keys()
+        if len(user_pks) > 0:
+            loaded_cards = user_cards_cache.get_many(user_pks)
+            cards.update({pk: loaded_cards.get(pk) for pk in user_pks})
 
-        return ChatMessage.objects.filter(chat=obj, created_at__gt=chat_member.read_before).exists()
+    def get_has_unread_messages(self, obj: Chat) -> bool:
+        return obj.unread_count > 0
 
-    def get_name(self, obj: Chat) -> str:
+    def get_name(self, obj: Chat) -> str | None:
         """
         Получение названия чата.
         
@@ -50,14 +78,10 @@ class ShortChatSerializer(serializers.ModelSerializer):
         """
 
         if obj.chat_type == Chat.ChatType.PERSONAL:
-            # Получим другого пользователя переписки.
-            current_user = self.context["request"].user
-            other_user = [
-                user 
-                for user in obj.users.all()
-                if user.pk != current_user.pk
-            ][0]
-            return str(other_user.username) or None
+            card = self._get_other_user_card(obj)
+            if card is None:
+                return
+            return card.username or None
         else:
             return str(obj.group_chat_data.name) or None
 
@@ -70,17 +94,10 @@ class ShortChatSerializer(serializers.ModelSerializer):
         """
         
         if obj.chat_type == Chat.ChatType.PERSONAL:
-            # Получим другого пользователя переписки.
-            current_user = self.context["request"].user
-            other_user = [
-                user 
-                for user in obj.users.all()
-                if user.pk != current_user.pk
-            ][0]
-            avatar = str(other_user.profile.avatar)
-            if not avatar:
+            card = self._get_other_user_card(obj)
+            if card is None or card.avatar_url is None:
                 return
-            return self.context["request"].build_absolute_uri(other_user.profile.avatar.url)
+            return build_absolute_media_uri(self.context, card.avatar_url)
         else:
             return self.context["request"].build_absolute_uri(obj.group_chat_data.avatar.url) or None
 
@@ -90,13 +107,20 @@ class ShortChatSerializer(serializers.ModelSerializer):
         
     def get_user_id(self, obj: Chat) -> int | None:
         if obj.chat_type == Chat.ChatType.PERSONAL:
-            current_user = self.context["request"].user
-            other_user = [
-                user 
-                for user in obj.users.all()
-                if user.pk != current_user.pk
-            ][0]
-            return other_user.pk
+            return self._get_other_user_pk(obj)
+
+    def _get_other_user_pk(self, obj: Chat) -> int:
+        """Id собеседника текущего пользователя в персональном чате"""
+        current_user = self.context["request"].user
+        personal_chat_data: PersonalChatData = obj.personal_chat_data
+        if personal_chat_data.user_low_id == current_user.pk:
+            return personal_chat_data.user_high_id
+        return personal_chat_data.user_low_id
+
+    def _get_other_user_card(self, obj: Chat) -> UserCard | None:
+        other_user_pk = self._get_other_user_pk(obj)
+        self._prefetch_cards([other_user_pk])
+        return self.context["user_cards"][other_user_pk]
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
@@ -3,7 +3,8 @@ from typing import (
     Type,
 )
 
-from django.db.models import QuerySet
+from django.db.models import F, QuerySet
+from django.utils import timezone
 
 from rest_framework import mixins
 from rest_framework.permissions import (
@@ -13,6 +14,7 @@ from rest_framework.permissions import (
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.serializers import Serializer
 from rest_framework.viewsets import GenericViewSet
 
@@ -23,7 +25,6 @@ from apps.chats.models import (
     ChatMember,
     ChatMessage,
 )
-from apps.users.models import User
 
 from .pagination import ChatPagination, ChatMessagePagination
 from .serializers import ShortChatSerializer, ChatMessageSerializer
@@ -35,8 +36,11 @@ class ChatsViewSet(
     GenericViewSet,
 ):
     pagination_class = ChatPagination
+    # Идентификатор в пути - это id собеседника по персональному чату.
+    lookup_value_regex = r"\d+"
     permissions_map: dict[str, Collection[BasePermission]] = {
         "list": (IsAuthenticated(), ),
+        "read_all_messages": (IsAuthenticated(), ),
     }
 
     def get_permissions(self) -> Collection[BasePermission]:
@@ -51,9 +55,13 @@ class ChatsViewSet(
         """Чаты аутентифицированного пользователя"""
         return (
             self.request.user.chats
+            # Аннотация переиспользует join с участником текущего пользователя,
+            # поэтому счетчик непрочитанных достается без отдельных запросов.
+            .annotate(unread_count=F("chat_member__unread_count"))
+            # Собеседник берется из пары пользователей персонального чата,
+            # а его имя и аватарка - из кэша карточек (см. `ShortChatSerializer`).
+            # Порядок по последней активности задает пагинация (см. `ChatPagination`).
             .select_related("group_chat_data", "personal_chat_data")
-            .prefetch_related("users")
-            .all()
         )
     
     @chats_openapi.get("list")
@@ -63,31 +71,20 @@ class ChatsViewSet(
     @action(methods=("post", ), detail=True, url_path="read-all-messages")
     def read_all_messages(self, request: Request, **kwargs) -> Response:
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
-        other_user = User.objects.filter(pk=self.kwargs[lookup_url_kwarg]).first()
-
-        print(f'Other user: {other_user.username}, pk: {other_user.pk}')
-
-        chat = list(
-            self.request.user.chats
-            .filter(chat_type=Chat.ChatType.PERSONAL)
-            .intersection(
-                other_user.chats
-                .filter(chat_type=Chat.ChatType.PERSONAL)
-            )
-        )[0]
-
-        print(f'Chat pk: {chat.pk}')
-
-        chat_member = ChatMember.objects.filter(chat=chat, user=request.user).first()
-        print(f'Member pk: {chat_member.pk}')
-
-        last_message = ChatMessage.objects.filter(chat=chat).order_by('-created_at').first()
-        print(f'Message: (created_at) {last_message.created_at}, (pk) {last_message.pk}, (chat) {last_message.chat.pk}, (user) {last_message.user.pk}')
-
-        print(f'Read before (user: {chat_member.user.pk}, pk: {chat_member.pk}) {chat_member.read_before}')
-        chat_member.read_before = last_message.created_at
-        chat_member.save()
-        print(f'Read before (user: {chat_member.user.pk}, pk: {chat_member.pk}) {chat_member.read_before}')
+        chat = Chat.objects.get_personal_chat(request.user.pk, int(self.kwargs[lookup_url_kwarg]))
+        if chat is None:
+            raise NotFound()
+
+        # Отметка - текущее время, а не последнее сообщение в БД: при отложенной записи
+        # уже полученные пользователем сообщения могут быть еще не записаны, и после
+        # записи они снова стали бы непрочитанными. Счетчик пересчитывается по БД.
+        chat_member_pk = (
+            ChatMember.objects
+            .filter(chat=chat, user=request.user)
+            .values_list("pk", flat=True)
+            .first()
+        )
+        ChatMember.objects.update_read_progress({chat_member_pk: timezone.now()})
 
         return Response(status=200)
     
@@ -103,17 +100,10 @@ class ChatMessagesViewSet(
     }
 
     def get_queryset(self) -> QuerySet[ChatMessage]:
-        other_user = User.objects.filter(pk=self.kwargs["chat_pk"]).first()
-        chat = list(
-            self.request.user.chats
-            .filter(chat_type=Chat.ChatType.PERSONAL)
-            .intersection(
-                other_user.chats
-                .filter(chat_type=Chat.ChatType.PERSONAL)
-            )
-        )[0]
-
-        return ChatMessage.objects.filter(chat=chat).order_by('-created_at')
+        # Персональный чат ищется подзапросом по уникальной паре пользователей.
+        chat = Chat.objects.filter_personal_chat(self.request.user.pk, int(self.kwargs["chat_pk"]))
+        # Порядок задает пагинация (см. `ChatMessagePagination`).
+        return ChatMessage.objects.filter(chat__in=chat)
 
     @chat_messages_openapi.get("list")
     def list(self, request: Request, *args, **kwargs) -> Response:
@@ -0,0 +1,64 @@
+from rest_framework import status
+from drf_spectacular.utils import extend_schema
+from django.utils.translation import gettext_lazy as _
+
+from utils.drf_spectacular import OpenAPIDetailSerializer
+
+from . import serializers
+
+
+slow_queries_openapi = {
+    'list': extend_schema(
+        operation_id='list_slow_queries',
+        methods=('get', ),
+        summary=_('Медленные запросы к БД'),
+        description=_(
+            'Позволяет администратору получить последние медленные запросы к БД '
+            'вместе с их планами выполнения (`EXPLAIN (ANALYZE, BUFFERS)`).<br><br>'
+            'Записи отсортированы от новых к старым.<br><br>'
+            'Буфер хранится в памяти процесса, поэтому при нескольких воркерах '
+            'ответ содержит записи только того воркера, который обработал запрос.<br>'
+        ),
+        request=None,
+        responses={
+            status.HTTP_200_OK: serializers.SlowQuerySerializer(many=True),
+            status.HTTP_401_UNAUTHORIZED: OpenAPIDetailSerializer,
+            status.HTTP_403_FORBIDDEN: OpenAPIDetailSerializer,
+        },
+    ),
+    'clear': extend_schema(
+        operation_id='clear_slow_queries',
+        methods=('delete', ),
+        summary=_('Очистка буфера медленных запросов'),
+        description=_('Позволяет администратору очистить буфер медленных запросов текущего воркера.'),
+        request=None,
+        responses={
+            status.HTTP_204_NO_CONTENT: None,
+            status.HTTP_401_UNAUTHORIZED: OpenAPIDetailSerializer,
+            status.HTTP_403_FORBIDDEN: OpenAPIDetailSerializer,
+        },
+    ),
+}
+
+
+password_hashing_openapi = {
+    'retrieve': extend_schema(
+        operation_id='retrieve_password_hashing_pool_stats',
+        methods=('get', ),
+        summary=_('Состояние пула хэширования паролей'),
+        description=_(
+            'Позволяет администратору получить размер очереди пула процессов, '
+            'в котором хэшируются и проверяются пароли.<br><br>'
+            '`pending` - задачи, которые выполняются или ждут свободного процесса, '
+            '`rejected` - задачи, отклоненные из-за переполнения очереди.<br><br>'
+            'Пул свой у каждого воркера, поэтому ответ содержит данные только того воркера, '
+            'который обработал запрос.<br>'
+        ),
+        request=None,
+        responses={
+            status.HTTP_200_OK: serializers.PasswordHashingPoolStatsSerializer,
+            status.HTTP_401_UNAUTHORIZED: OpenAPIDetailSerializer,
+            status.HTTP_403_FORBIDDEN: OpenAPIDetailSerializer,
+        },
+    ),
+}
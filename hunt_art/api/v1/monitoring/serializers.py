@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+
+class SlowQuerySerializer(serializers.Serializer):
+    """Сериализатор записи о медленном запросе"""
+
+    sql = serializers.CharField()
+    duration_ms = serializers.FloatField()
+    source = serializers.CharField(allow_null=True)
+    database = serializers.CharField()
+    captured_at = serializers.DateTimeField()
+    plan = serializers.CharField(allow_null=True)
+
+
+class PasswordHashingPoolStatsSerializer(serializers.Serializer):
+    """Сериализатор состояния пула хэширования паролей"""
+
+    workers = serializers.IntegerField()
+    pending = serializers.IntegerField()
+    max_pending = serializers.IntegerField()
+    rejected = serializers.IntegerField()
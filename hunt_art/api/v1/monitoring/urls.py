@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import views
+
+
+urlpatterns = [
+    path(
+        'slow-queries/',
+        views.SlowQueriesViewSet.as_view({'get': 'list', 'delete': 'clear'}),
+        name='slow_queries',
+    ),
+    path(
+        'password-hashing/',
+        views.PasswordHashingPoolViewSet.as_view({'get': 'retrieve'}),
+        name='password_hashing',
+    ),
+]
@@ -0,0 +1,44 @@
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser
+from rest_framework.viewsets import ViewSet
+
+from apps.monitoring.slow_queries import slow_query_recorder
+from apps.users.services.password_hashing import password_hashing_pool
+
+from .serializers import (
+    SlowQuerySerializer,
+    PasswordHashingPoolStatsSerializer,
+)
+from .openapi import (
+    slow_queries_openapi,
+    password_hashing_openapi,
+)
+
+
+class SlowQueriesViewSet(ViewSet):
+    """API для просмотра медленных запросов к БД"""
+
+    permission_classes = (IsAdminUser, )
+
+    @slow_queries_openapi.get('list')
+    def list(self, request: Request) -> Response:
+        serializer = SlowQuerySerializer(slow_query_recorder.get_entries(), many=True)
+        return Response(status=status.HTTP_200_OK, data=serializer.data)
+
+    @slow_queries_openapi.get('clear')
+    def clear(self, request: Request) -> Response:
+        slow_query_recorder.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PasswordHashingPoolViewSet(ViewSet):
+    """API для просмотра состояния пула хэширования паролей"""
+
+    permission_classes = (IsAdminUser, )
+
+    @password_hashing_openapi.get('retrieve')
+    def retrieve(self, request: Request) -> Response:
+        serializer = PasswordHashingPoolStatsSerializer(password_hashing_pool.get_stats())
+        return Response(status=status.HTTP_200_OK, data=serializer.data)
@@ -27,4 +27,5 @@ urlpatterns = [
     path('users/', include('api.v1.users.urls')),
     path('arts/', include('api.v1.arts.urls')),
     path("chats/", include("api.v1.chats.urls")),
+    path('monitoring/', include('api.v1.monitoring.urls')),
 ]
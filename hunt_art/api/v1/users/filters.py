@@ -1,18 +1,52 @@
-from django.db.models import QuerySet
+from django.db.models import (
+    Q,
+    Case,
+    When,
+    Value,
+    QuerySet,
+    IntegerField,
+)
+from django.contrib.postgres.search import TrigramSimilarity
 from django_filters import rest_framework as filters
 
 from apps.users.models import User
 
 
 class UsersFilterSet(filters.FilterSet):
-    username = filters.CharFilter(field_name='username', lookup_expr='startswith')
+    username = filters.CharFilter(method='search_by_username')
 
     class Meta:
         model = User
         fields = ('username', )
 
+    def search_by_username(self, queryset: QuerySet[User], name: str, value: str) -> QuerySet[User]:
+        """
+        Поиск пользователей по началу имени и по похожести имени.
+
+        Выборка ранжируется так: сначала полное совпадение, затем совпадение
+        по началу имени, затем остальные по убыванию похожести. При равенстве
+        выше идут пользователи с большим количеством подписчиков.
+        """
+
+        return (
+            queryset
+            .filter(Q(username__startswith=value) | Q(username__trigram_similar=value))
+            .annotate(
+                match_rank=Case(
+                    When(username=value, then=Value(0)),
+                    When(username__startswith=value, then=Value(1)),
+                    default=Value(2),
+                    output_field=IntegerField(),
+                ),
+                similarity=TrigramSimilarity('username', value),
+            )
+            .order_by('match_rank', '-similarity', '-followers_count', 'username')
+        )
+
     def filter_queryset(self, queryset: QuerySet[User]) -> QuerySet[User]:
-        # Фильтруем по возрастанию имени. Т.к. начало у всех будет одинаковое
-        # благодаря `startswith`, фильтрация будет идти по длине имени.
-        # В начале будет идти имя, полностью совпадающее с запросом.
-        return super().filter_queryset(queryset).order_by('username')
+        queryset = super().filter_queryset(queryset)
+        # Без поиска по имени у выборки не будет сортировки. Она нужна для пагинации.
+        if not queryset.ordered:
+            queryset = queryset.order_by('username')
+
+        return queryset
@@ -12,6 +12,7 @@ from utils.drf_spectacular import (
     OpenAPIDetailWithCodeSerializer,
     OpenAPIBadRequestSerializerFactory,
     get_pagination_schema,
+    get_cursor_pagination_schema,
 )
 
 from . import serializers
@@ -42,6 +43,42 @@ users_pagination_query_params = [
 ]
 
 
+subscriptions_pagination_query_params = [
+    OpenApiParameter(
+        name='cursor',
+        type=OpenApiTypes.STR,
+        location='query',
+        description=_(
+            'Курсор страницы.<br><br>'
+            'Берется из ссылок `next` и `previous` предыдущего ответа.<br><br>'
+            'По умолчанию выбирает первую страницу: самые новые подписки.<br>'
+        ),
+    ),
+    OpenApiParameter(
+        name='page_size',
+        description=_(
+            'Указание размера страницы.<br><br>'
+            'По умолчанию значение равно `30` пользователей на страницу.<br><br>'
+            'Максимальный размер страницы: `100`.<br>'
+        ),
+        type=OpenApiTypes.INT,
+        location='query',
+    ),
+]
+
+
+preview_query_param = OpenApiParameter(
+    name='preview',
+    type=OpenApiTypes.INT,
+    location='query',
+    description=_(
+        'Количество последних подписчиков и подписок, которые нужно вернуть в превью.<br><br>'
+        'По умолчанию `0`: превью не возвращается, поля `followers_preview` и `subscriptions_preview` равны `null`.<br><br>'
+        'Максимальное значение: `10`. Полные списки доступны через `/users/{id}/followers` и `/users/{id}/subscriptions`.<br>'
+    ),
+)
+
+
 users_openapi = {
     'list': extend_schema(
         operation_id='list_users',
@@ -66,8 +103,12 @@ users_openapi = {
             'Позволяет искать пользователей по `username`.<br><br>'
             'Поддерживает пагинацию по следующим параметрам: `page`, `page_size`.<br><br>'
             'Поддерживает поиск по следующим полям: `username`.<br><br>'
-            'Выборка будет отсортирована по "возрастанию" имен пользователей.<br><br>'
-            'Пример. Поиск идет по `svetla`. Тогда выборка может быть такой: `svetla`, `svetlan`, `svetlana`.<br>'
+            'Находит пользователей, чей `username` начинается с указанного значения или похож на него.<br><br>'
+            'Выборка ранжируется так: сначала полное совпадение, затем совпадение по началу имени, '
+            'затем остальные по убыванию похожести. При равенстве выше идут пользователи с большим количеством подписчиков.<br><br>'
+            'Пример. Поиск идет по `svetla`. Тогда выборка может быть такой: `svetla`, `svetlana`, `svetlan`, `asvetlana`.<br><br>'
+            'Поля `is_your_follower` и `is_your_subscription` доступны только тогда, '
+            'когда запрос делает авторизированный пользователь.<br>'
         ),
         parameters=[
             *users_pagination_query_params,
@@ -76,14 +117,14 @@ users_openapi = {
                 type=OpenApiTypes.STR,
                 location='query',
                 required=True,
-                description=_('Поиск пользователей по `username`. Ищет пользователей, чей `username` начинается с указанного значения.<br>')
+                description=_('Поиск пользователей по `username`: по началу имени и по похожести имени.<br>')
             ),
         ],
         request=None,
         responses={
             status.HTTP_200_OK: get_pagination_schema(
                 name='PaginationSearchUsersSerializer',
-                child_schema=serializers.ShortRetrieveUserSerializer,
+                child_schema=serializers.ShortRetrieveUserForAuthorizedUserSerializer,
             ),
             status.HTTP_404_NOT_FOUND: OpenAPIDetailSerializer,
         }
@@ -101,6 +142,7 @@ users_openapi = {
                 name='BadRequestCreateUserSerializer',
                 fields=('username', 'password'),
             ),
+            status.HTTP_429_TOO_MANY_REQUESTS: OpenAPIDetailSerializer,
         },
     ),
     'retrieve': extend_schema(
@@ -112,6 +154,7 @@ users_openapi = {
             'Поля `is_your_follower` и `is_your_subscription` доступны только тогда, '
             'когда запрос делает авторизированный пользователь. Иначе они просто отсутствуют.'
         ),
+        parameters=[preview_query_param],
         auth=(),
         request=serializers.RetrieveUserForAuthorizedUserSerializer,
         responses={
@@ -119,11 +162,54 @@ users_openapi = {
             status.HTTP_404_NOT_FOUND: OpenAPIDetailSerializer,
         },
     ),
+    'followers': extend_schema(
+        operation_id='list_user_followers',
+        methods=('get', ),
+        summary=_('Подписчики пользователя'),
+        description=_(
+            'Получение подписчиков пользователя в порядке подписки: от новых к старым.<br><br>'
+            'Поддерживает курсорную пагинацию по следующим параметрам: `cursor`, `page_size`.<br><br>'
+            'Поля `is_your_follower` и `is_your_subscription` доступны только тогда, '
+            'когда запрос делает авторизированный пользователь.<br>'
+        ),
+        parameters=subscriptions_pagination_query_params,
+        auth=(),
+        request=None,
+        responses={
+            status.HTTP_200_OK: get_cursor_pagination_schema(
+                name='PaginationUserFollowersSerializer',
+                child_schema=serializers.ShortRetrieveUserForAuthorizedUserSerializer,
+            ),
+            status.HTTP_404_NOT_FOUND: OpenAPIDetailSerializer,
+        },
+    ),
+    'subscriptions': extend_schema(
+        operation_id='list_user_subscriptions',
+        methods=('get', ),
+        summary=_('Подписки пользователя'),
+        description=_(
+            'Получение пользователей, на которых подписан пользователь, в порядке подписки: от новых к старым.<br><br>'
+            'Поддерживает курсорную пагинацию по следующим параметрам: `cursor`, `page_size`.<br><br>'
+            'Поля `is_your_follower` и `is_your_subscription` доступны только тогда, '
+            'когда запрос делает авторизированный пользователь.<br>'
+        ),
+        parameters=subscriptions_pagination_query_params,
+        auth=(),
+        request=None,
+        responses={
+            status.HTTP_200_OK: get_cursor_pagination_schema(
+                name='PaginationUserSubscriptionsSerializer',
+                child_schema=serializers.ShortRetrieveUserForAuthorizedUserSerializer,
+            ),
+            status.HTTP_404_NOT_FOUND: OpenAPIDetailSerializer,
+        },
+    ),
     'current_user': extend_schema(
         operation_id="retrieve_current_user",
         methods=('get', ),
         summary=_("Получение информации о текущем пользователе"),
         description=_("Получение информации об авторизированном текущем пользователе."),
+        parameters=[preview_query_param],
         request=serializers.RetrieveUserSerializer,
         responses={
             status.HTTP_200_OK: serializers.RetrieveUserSerializer,
@@ -157,6 +243,46 @@ users_openapi = {
             status.HTTP_404_NOT_FOUND: OpenAPIDetailSerializer,
         },
     ),
+    'follow_suggestions': extend_schema(
+        operation_id='list_follow_suggestions',
+        methods=('get', ),
+        summary=_('Рекомендации подписок'),
+        description=_(
+            'Позволяет текущему авторизованному пользователю получить пользователей, '
+            'на которых ему стоит подписаться: подписки его подписок и авторов артов, '
+            'которые лайкают его подписки.<br><br>'
+            'Рекомендации рассчитываются заранее и отсортированы от наиболее подходящих.<br>'
+        ),
+        request=None,
+        responses={
+            status.HTTP_200_OK: get_pagination_schema(
+                name='PaginationFollowSuggestionsSerializer',
+                child_schema=serializers.ShortRetrieveUserForAuthorizedUserSerializer,
+            ),
+            status.HTTP_401_UNAUTHORIZED: OpenAPIDetailSerializer,
+        },
+    ),
+    'subscribe_to_users': extend_schema(
+        operation_id='subscribe_to_users',
+        methods=('post', ),
+        summary=_('Подписка сразу на нескольких пользователей'),
+        description=_(
+            'Позволяет текущему авторизованному пользователю подписаться сразу на нескольких '
+            f'пользователей (не больше {serializers.SubscribeToUsersSerializer.max_users_count}).<br><br>'
+            'Несуществующие пользователи, сам пользователь и уже существующие подписки пропускаются, '
+            'поэтому запрос можно безопасно повторять.<br><br>'
+            'В ответе `subscribed_user_ids` - пользователи, на которых подписка была создана этим запросом.<br>'
+        ),
+        request=serializers.SubscribeToUsersSerializer,
+        responses={
+            status.HTTP_200_OK: serializers.SubscribeToUsersResultSerializer,
+            status.HTTP_400_BAD_REQUEST: OpenAPIBadRequestSerializerFactory.create(
+                name='BadRequestSubscribeToUsersSerializer',
+                fields=('user_ids', ),
+            ),
+            status.HTTP_401_UNAUTHORIZED: OpenAPIDetailSerializer,
+        },
+    ),
     'unsubscribe_from_user': extend_schema(
         operation_id='unsubscribe_from_user',
         methods=('delete', ),
@@ -189,7 +315,10 @@ auth_openapi = {
         operation_id='get_jwt_token',
         methods=('post', ),
         summary=_('Аутентификация'),
-        description=_('Позволяет аутентифицироваться на основе логина и пароля и получить `access` и `refresh` токены.'),
+        description=_(
+            'Позволяет аутентифицироваться на основе логина и пароля и получить `access` и `refresh` токены.<br><br>'
+            'Если очередь на проверку паролей переполнена, вернется ошибка 429.<br>'
+        ),
         request=TokenObtainPairSerializer,
         responses={
             status.HTTP_200_OK: TokenObtainPairSerializer,
@@ -198,6 +327,7 @@ auth_openapi = {
                 fields=('username', 'password'),
             ),
             status.HTTP_401_UNAUTHORIZED: OpenAPIDetailSerializer,
+            status.HTTP_429_TOO_MANY_REQUESTS: OpenAPIDetailSerializer,
         },
     ),
     'token_refresh': extend_schema(
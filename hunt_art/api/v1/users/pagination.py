@@ -1,7 +1,24 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import (
+    CursorPagination,
+    PageNumberPagination,
+)
 
 
 class UsersPagination(PageNumberPagination):
     page_size = 30
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+class UserSubscriptionsPagination(CursorPagination):
+    """
+    Пагинация подписчиков и подписок пользователя.
+
+    Идет по записям таблицы подписок от новых к старым. `id` подписки монотонно растет
+    вместе со временем подписки и покрыт индексами вместе с пользователем.
+    """
+
+    page_size = 30
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
@@ -1,11 +1,19 @@
-from typing import Any, Type
+from typing import Any, Iterable, Type
+from urllib.parse import urlsplit
 
 from rest_framework import exceptions
 from rest_framework import serializers
 from rest_framework.request import Request
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from django.db import transaction
+from django.db.models import (
+    Manager,
+    QuerySet,
+)
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth.base_user import AbstractBaseUser
+from django.utils import timezone
 
 from drf_spectacular.utils import extend_schema_field
 from drf_spectacular.types import OpenApiTypes
@@ -13,6 +21,16 @@ from drf_spectacular.types import OpenApiTypes
 from apps.users.models import (
     User,
     UserProfile,
+    UserSubscription,
+)
+from apps.users.services.relationships import (
+    UserRelationship,
+    UserRelationshipsResolver,
+)
+from apps.users.services.last_login import last_login_flusher
+from apps.users.services.user_cards import (
+    UserCard,
+    user_cards_cache,
 )
 
 
@@ -28,21 +46,131 @@ class CreateUserSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
 
+def build_absolute_media_uri(context: dict[str, Any], url: str) -> str:
+    """
+    Получение абсолютного URL файла.
+
+    Базовый адрес вычисляется по запросу один раз и сохраняется в контексте сериализатора.
+    """
+
+    if urlsplit(url).netloc:
+        return url
+
+    base_uri: str | None = context.get('base_uri')
+    if base_uri is None:
+        base_uri = context['request'].build_absolute_uri('/').rstrip('/')
+        context['base_uri'] = base_uri
+
+    return f'{base_uri}{url}'
+
+
+class PrefetchingListSerializer(serializers.ListSerializer):
+    """
+    Сериализатор списка, который перед сериализацией дает дочернему сериализатору
+    подгрузить данные сразу для всех объектов списка (метод `prefetch` дочернего сериализатора).
+    """
+
+    def to_representation(self, data: Iterable[Any]) -> list[dict[str, Any]]:
+        instances = list(data.all() if isinstance(data, Manager) else data)
+        self.child.prefetch(instances)
+        return super().to_representation(instances)
+
+
 class ShortRetrieveUserSerializer(serializers.ModelSerializer):
-    """Сериализатор с короткой информацией о пользователе"""
+    """
+    Сериализатор с короткой информацией о пользователе.
+
+    Имя и аватарка берутся из кэша карточек пользователей (см. `UserCardsCache`),
+    поэтому профиль пользователя подгружать не нужно. Карточки хранятся в контексте
+    сериализатора под ключом `user_cards`.
+    """
 
+    username = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ('id', 'username', 'avatar')
+        list_serializer_class = PrefetchingListSerializer
+
+    def prefetch(self, users: list[User]) -> None:
+        self.prefetch_cards([user.pk for user in users])
+
+    def prefetch_cards(self, user_pks: Iterable[Any]) -> None:
+        # Пользователя могли удалить после выборки, тогда карточки нет. Запоминаем это как `None`,
+        # чтобы не обращаться за ней повторно.
+        cards: dict[Any, UserCard | None] = self.context.setdefault('user_cards', {})
+        user_pks = set(user_pks) - cards.keys()
+        if len(user_pks) > 0:
+            loaded_cards = user_cards_cache.get_many(user_pks)
+            cards.update({pk: loaded_cards.get(pk) for pk in user_pks})
+
+    def get_username(self, obj: User) -> str | None:
+        card = self._get_card(obj)
+        if card is None:
+            return
+        return card.username
 
     def get_avatar(self, obj: User) -> str | None:
-        request = self.context['request']
-        avatar = str(obj.profile.avatar)
-        if not avatar:
+        card = self._get_card(obj)
+        if card is None or card.avatar_url is None:
             return
-        return request.build_absolute_uri(obj.profile.avatar.url)
+        return build_absolute_media_uri(self.context, card.avatar_url)
+
+    def _get_card(self, obj: User) -> UserCard | None:
+        self.prefetch_cards([obj.pk])
+        return self.context['user_cards'][obj.pk]
+
+
+class UserRelationshipsMixin(serializers.Serializer):
+    """
+    Добавляет поля `is_your_follower` и `is_your_subscription`, позволяющие определить,
+    является ли пользователь подписчиком или подпиской для авторизованного пользователя
+    (который делает запрос).
+
+    Отношения хранятся в контексте сериализатора под ключом `relationships`.
+    """
+
+    is_your_follower = serializers.SerializerMethodField()
+    is_your_subscription = serializers.SerializerMethodField()
+
+    @staticmethod
+    def resolve_relationships(context: dict[str, Any], user_pks: Iterable[Any]) -> None:
+        relationships: dict[Any, UserRelationship] = context.setdefault('relationships', {})
+        user_pks = set(user_pks) - relationships.keys()
+        if len(user_pks) > 0:
+            resolver = UserRelationshipsResolver(context['request'].user)
+            relationships.update(resolver.resolve(user_pks))
+
+    @extend_schema_field(OpenApiTypes.BOOL)
+    def get_is_your_follower(self, obj: User) -> bool:
+        return self._get_relationship(obj).is_follower
+
+    @extend_schema_field(OpenApiTypes.BOOL)
+    def get_is_your_subscription(self, obj: User) -> bool:
+        return self._get_relationship(obj).is_subscription
+
+    def _get_relationship(self, obj: User) -> UserRelationship:
+        self.resolve_relationships(self.context, [obj.pk])
+        return self.context['relationships'][obj.pk]
+
+
+class ShortRetrieveUserForAuthorizedUserSerializer(UserRelationshipsMixin, ShortRetrieveUserSerializer):
+    """
+    Сериализатор с короткой информацией о пользователе, если текущий пользователь
+    является авторизованным.
+    """
+
+    class Meta(ShortRetrieveUserSerializer.Meta):
+        fields = tuple([
+            *ShortRetrieveUserSerializer.Meta.fields,
+            'is_your_follower',
+            'is_your_subscription',
+        ])
+
+    def prefetch(self, users: list[User]) -> None:
+        super().prefetch(users)
+        self.resolve_relationships(self.context, [user.pk for user in users])
 
 
 class RetrieveUserSerializer(serializers.ModelSerializer):
@@ -54,10 +182,9 @@ class RetrieveUserSerializer(serializers.ModelSerializer):
             fields = '__all__'
 
     profile = _UserProfileSerializer()
-    followers = ShortRetrieveUserSerializer(many=True)
-    followers_count = serializers.SerializerMethodField()
-    subscriptions = ShortRetrieveUserSerializer(many=True)
-    subscriptions_count = serializers.SerializerMethodField()
+    last_login = serializers.SerializerMethodField()
+    followers_preview = serializers.SerializerMethodField()
+    subscriptions_preview = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -67,35 +194,68 @@ class RetrieveUserSerializer(serializers.ModelSerializer):
             'is_active',
             'last_login',
             'profile',
-            'followers',
             'followers_count',
-            'subscriptions',
+            'followers_preview',
             'subscriptions_count',
+            'subscriptions_preview',
         )
 
-    @extend_schema_field(OpenApiTypes.INT)
-    def get_followers_count(self, obj: User) -> int:
-        return len(obj.followers.all())
-    
-    @extend_schema_field(OpenApiTypes.INT)
-    def get_subscriptions_count(self, obj: User) -> int:
-        return len(obj.subscriptions.all())
+    @extend_schema_field(serializers.DateTimeField(allow_null=True))
+    def get_last_login(self, obj: User) -> str | None:
+        # Время входа записывается в БД отложенно, поэтому сначала смотрим еще не записанное.
+        last_login = last_login_flusher.get(obj.pk, obj.last_login)
+        if last_login is None:
+            return None
+        return serializers.DateTimeField().to_representation(last_login)
+
+    @extend_schema_field(ShortRetrieveUserSerializer(many=True, allow_null=True))
+    def get_followers_preview(self, obj: User) -> list[dict[str, Any]] | None:
+        return self._get_preview(
+            UserSubscription.objects.filter(to_user_id=obj.pk),
+            user_field_name='from_user',
+        )
 
-    
+    @extend_schema_field(ShortRetrieveUserSerializer(many=True, allow_null=True))
+    def get_subscriptions_preview(self, obj: User) -> list[dict[str, Any]] | None:
+        return self._get_preview(
+            UserSubscription.objects.filter(from_user_id=obj.pk),
+            user_field_name='to_user',
+        )
+
+    def _get_preview(
+        self,
+        subscriptions: QuerySet[UserSubscription],
+        user_field_name: str,
+    ) -> list[dict[str, Any]] | None:
+        """
+        Получение нескольких последних подписчиков или подписок.
+
+        Размер превью передается через контекст в `preview_size`.
+        Если превью не запрашивали, вернется `None`.
+        """
+
+        preview_size: int = self.context.get('preview_size', 0)
+        if preview_size == 0:
+            return None
+
+        subscriptions = (
+            subscriptions
+            .select_related(user_field_name)
+            .order_by('-id')[:preview_size]
+        )
+        users = [getattr(subscription, user_field_name) for subscription in subscriptions]
 
-class RetrieveUserForAuthorizedUserSerializer(RetrieveUserSerializer):
+        return ShortRetrieveUserSerializer(users, many=True, context=self.context).data
+
+
+class RetrieveUserForAuthorizedUserSerializer(UserRelationshipsMixin, RetrieveUserSerializer):
     """
     Сериализатор для получения данных о пользователе, если текущий пользователь
     является авторизованным.
 
-    Кроме основной информации добавляются поля `is_your_follower` и `is_your_subscription`,
-    позволяющие определить, является ли запрашиваемый пользователь подписчиком или подпиской
-    для авторизованного пользователя (который делает запрос).
+    Кроме основной информации добавляются поля `is_your_follower` и `is_your_subscription`.
     """
 
-    is_your_follower = serializers.SerializerMethodField()
-    is_your_subscription = serializers.SerializerMethodField()
-
     class Meta(RetrieveUserSerializer.Meta):
         fields = tuple([
             *RetrieveUserSerializer.Meta.fields,
@@ -103,26 +263,6 @@ class RetrieveUserForAuthorizedUserSerializer(RetrieveUserSerializer):
             'is_your_subscription',
         ])
 
-    @extend_schema_field(OpenApiTypes.BOOL)
-    def get_is_your_follower(self, obj: User) -> bool:
-        current_authorized_user = self.context['request'].user
-        if current_authorized_user.pk == obj.pk:
-            return False
-        
-        result = obj.subscriptions.filter(pk=current_authorized_user.pk).exists()
-
-        return result
-
-    @extend_schema_field(OpenApiTypes.BOOL)
-    def get_is_your_subscription(self, obj: User) -> bool:
-        current_authorized_user = self.context['request'].user
-        if current_authorized_user.pk == obj.pk:
-            return False
-        
-        result = current_authorized_user.subscriptions.filter(pk=obj.pk).exists()
-
-        return result
-
 
 class UpdateUserSerializer(serializers.Serializer):
     """Сериализатор при обновлении данных пользователя"""
@@ -178,4 +318,40 @@ class UpdateUserSerializer(serializers.Serializer):
                 setattr(instance.profile, field_name, field_value)
             instance.profile.save()
 
+        # Имя и аватарка входят в карточку пользователя, поэтому ее нужно сбросить.
+        if 'username' in user_data or 'avatar' in profile_data:
+            transaction.on_commit(lambda: user_cards_cache.invalidate(instance.pk))
+
         return instance
+
+
+class SubscribeToUsersSerializer(serializers.Serializer):
+    """Сериализатор для подписки сразу на нескольких пользователей"""
+
+    # Максимальное количество пользователей в одном запросе.
+    max_users_count = 100
+
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=max_users_count,
+    )
+
+
+class SubscribeToUsersResultSerializer(serializers.Serializer):
+    """Сериализатор результата подписки сразу на нескольких пользователей"""
+
+    subscribed_user_ids = serializers.ListField(child=serializers.IntegerField())
+
+
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Сериализатор получения пары токенов.
+
+    Время последнего входа не пишется в БД сразу, а копится в `LastLoginFlusher`.
+    """
+
+    def validate(self, attrs: dict[str, Any]) -> dict[str, str]:
+        data = super().validate(attrs)
+        last_login_flusher.add(self.user.pk, timezone.now())
+        return data
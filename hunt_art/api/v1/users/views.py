@@ -2,6 +2,7 @@ import logging
 import traceback
 import contextlib
 from typing import (
+    Any,
     Type,
     Collection,
 )
@@ -28,22 +29,35 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
 )
 
-from apps.users.models import User
+from apps.users.models import (
+    User,
+    UserSubscription,
+    FollowSuggestion,
+)
 from apps.users.services.subscriptions.exceptions import (
+    UserDoesNotExist,
     UserIsNotFollower,
     UserIsAlreadyFollower,
 )
 from apps.users.services.subscriptions import UserSubscriptionsService
+from apps.users.services.password_hashing.exceptions import PasswordHashingPoolOverloaded
 
 from .serializers import (
     CreateUserSerializer,
     UpdateUserSerializer,
+    CustomTokenObtainPairSerializer,
+    SubscribeToUsersSerializer,
+    SubscribeToUsersResultSerializer,
     RetrieveUserSerializer,
     RetrieveUserForAuthorizedUserSerializer,
     ShortRetrieveUserSerializer,
+    ShortRetrieveUserForAuthorizedUserSerializer,
 )
 from .openapi import users_openapi, auth_openapi
-from .pagination import UsersPagination
+from .pagination import (
+    UsersPagination,
+    UserSubscriptionsPagination,
+)
 from .filters import UsersFilterSet
 
 
@@ -64,10 +78,15 @@ class UserViewSet(
         'retrieve': (),
         'list': (),
         'search_users': (),
+        'followers': (),
+        'subscriptions': (),
     }
     pagination_class = UsersPagination
     filterset_class = UsersFilterSet
 
+    # Максимальное количество подписчиков и подписок в превью профиля.
+    max_preview_size = 10
+
     def get_permissions(self) -> Collection[BasePermission]:
         return self.permissions_map.get(
             self.action,
@@ -86,22 +105,40 @@ class UserViewSet(
                 return RetrieveUserSerializer
             case 'update_current_user':
                 return UpdateUserSerializer
-            case 'list' | 'search_users':
-                return ShortRetrieveUserSerializer
+            case 'subscribe_to_users':
+                return SubscribeToUsersSerializer
+            case 'list' | 'search_users' | 'followers' | 'subscriptions':
+                if isinstance(self.request.user, AnonymousUser):
+                    return ShortRetrieveUserSerializer
+                return ShortRetrieveUserForAuthorizedUserSerializer
+            case 'follow_suggestions':
+                return ShortRetrieveUserForAuthorizedUserSerializer
 
     def get_queryset(self) -> QuerySet[User]:
         queryset = User.objects.all()
         match self.action:
-            case 'retrieve' | 'current_user':
-                queryset = (
-                    queryset
-                    .select_related('profile')
-                    .prefetch_related('followers', 'subscriptions')
-                )
-            case 'update_current_user' | 'search_users' | 'list':
+            case 'retrieve' | 'current_user' | 'update_current_user':
                 queryset = queryset.select_related('profile')
 
         return queryset
+
+    def get_serializer_context(self) -> dict[str, Any]:
+        context = super().get_serializer_context()
+        if self.action in ('retrieve', 'current_user'):
+            context['preview_size'] = self._get_preview_size()
+
+        return context
+
+    def _get_preview_size(self) -> int:
+        raw_preview_size = self.request.query_params.get('preview', '0')
+        try:
+            preview_size = int(raw_preview_size)
+        except ValueError:
+            raise exceptions.ValidationError(
+                detail={'preview': 'Размер превью должен быть целым числом.'},
+            )
+
+        return max(0, min(preview_size, self.max_preview_size))
     
     def perform_authentication(self, request: Request) -> None:
         # Эти эндпоинты являются открытыми и в аутентификации не нуждаются.
@@ -109,7 +146,7 @@ class UserViewSet(
         # с протухшими токенами. Хоть API и открытые, все равно будет попытка произвести
         # аутентификацию. И в этом случае будет ошибка 401. Хотя API открытое. Чтобы этого
         # избежать, для этих эндпоинтов будем игнорировать ошибку аутентификации.
-        if self.action in ('create', 'retrieve', 'list'):
+        if self.action in ('create', 'retrieve', 'list', 'followers', 'subscriptions'):
             with contextlib.suppress(exceptions.AuthenticationFailed):
                 return super().perform_authentication(request)
         else:
@@ -117,7 +154,10 @@ class UserViewSet(
 
     @users_openapi.get('create')
     def create(self, request: Request, *args, **kwargs) -> Response:
-        return super().create(request, *args, **kwargs)
+        try:
+            return super().create(request, *args, **kwargs)
+        except PasswordHashingPoolOverloaded as e:
+            raise exceptions.Throttled(detail=e.message)
     
     @users_openapi.get('retrieve')
     def retrieve(self, request: Request, *args, **kwargs) -> Response:
@@ -137,6 +177,63 @@ class UserViewSet(
     def search_users(self, request: Request, *args, **kwargs) -> Response:
         return self.list(request, *args, **kwargs)
 
+    @users_openapi.get('followers')
+    @action(
+        methods=('get', ),
+        detail=True,
+        url_path='followers',
+        pagination_class=UserSubscriptionsPagination,
+    )
+    def followers(self, request: Request, pk: int) -> Response:
+        """Подписчики пользователя от новых к старым"""
+
+        user = self.get_object()
+        return self._get_list_related_users(
+            UserSubscription.objects.filter(to_user_id=user.pk),
+            user_field_name='from_user',
+        )
+
+    @users_openapi.get('subscriptions')
+    @action(
+        methods=('get', ),
+        detail=True,
+        url_path='subscriptions',
+        pagination_class=UserSubscriptionsPagination,
+    )
+    def subscriptions(self, request: Request, pk: int) -> Response:
+        """Подписки пользователя от новых к старым"""
+
+        user = self.get_object()
+        return self._get_list_related_users(
+            UserSubscription.objects.filter(from_user_id=user.pk),
+            user_field_name='to_user',
+        )
+
+    @users_openapi.get('follow_suggestions')
+    @action(methods=('get', ), detail=False, url_path='suggestions')
+    def follow_suggestions(self, request: Request) -> Response:
+        """Рекомендации подписок текущего пользователя"""
+
+        # Рекомендации пересчитываются отложенно, поэтому тех, на кого пользователь
+        # уже успел подписаться, убираем при чтении.
+        suggestions = (
+            FollowSuggestion.objects
+            .filter(user_id=request.user.pk)
+            .exclude(suggested_user_id__in=User.objects.get_subscriptions_pks(request.user.pk))
+            .order_by('-score', 'suggested_user_id')
+        )
+        return self._get_list_related_users(suggestions, user_field_name='suggested_user')
+
+    def _get_list_related_users(self, queryset: QuerySet, user_field_name: str) -> Response:
+        """Постраничный вывод пользователей, на которых ссылаются записи `queryset`"""
+
+        queryset = queryset.select_related(user_field_name)
+        page = self.paginate_queryset(queryset)
+        users = [getattr(obj, user_field_name) for obj in page]
+        serializer = self.get_serializer(users, many=True)
+
+        return self.get_paginated_response(serializer.data)
+
     @users_openapi.get('current_user')
     @action(methods=('get', ), detail=False, url_path='im')
     def current_user(self, request: Request) -> Response:
@@ -174,20 +271,42 @@ class UserViewSet(
             raise exceptions.ValidationError(detail=f'Пользователь не может подписаться сам на себя.')
 
         try:
-            other_user = User.objects.get(pk=pk)
-            UserSubscriptionsService(request.user).subscribe_to_user(other_user)
-        except User.DoesNotExist:
-            raise exceptions.NotFound(detail=f'Пользователя с id={pk} не существует.')
+            UserSubscriptionsService(request.user).subscribe_to_user(int(pk))
+        except UserDoesNotExist as e:
+            raise exceptions.NotFound(detail=e.message)
         except UserIsAlreadyFollower as e:
             raise exceptions.PermissionDenied(detail=e.message)
         except Exception:
             logger.error(
-                f'Ошибка при подписке пользователя {request.user} на пользователя {other_user}. '
+                f'Ошибка при подписке пользователя {request.user} на пользователя с id={pk}. '
                 f'Ошибка:\n{traceback.format_exc()}'
             )
             raise exceptions.APIException()
 
         return Response(status=status.HTTP_200_OK)
+
+    @users_openapi.get('subscribe_to_users')
+    @action(methods=('post', ), detail=False, url_path='subscribe')
+    def subscribe_to_users(self, request: Request) -> Response:
+        """API подписки сразу на нескольких пользователей"""
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = set(serializer.validated_data['user_ids']) - {request.user.pk}
+
+        try:
+            subscribed_user_ids = UserSubscriptionsService(request.user).subscribe_to_users(user_ids)
+        except Exception:
+            logger.error(
+                f'Ошибка при подписке пользователя {request.user} на пользователей {user_ids}. '
+                f'Ошибка:\n{traceback.format_exc()}'
+            )
+            raise exceptions.APIException()
+
+        return Response(
+            status=status.HTTP_200_OK,
+            data=SubscribeToUsersResultSerializer({'subscribed_user_ids': subscribed_user_ids}).data,
+        )
     
     @users_openapi.get('unsubscribe_from_user')
     @action(methods=('delete', ), detail=True, url_path='unsubscribe')
@@ -198,15 +317,14 @@ class UserViewSet(
             raise exceptions.ValidationError(detail=f'Пользователь не может отписаться сам от себя.')
 
         try:
-            other_user = User.objects.get(pk=pk)
-            UserSubscriptionsService(self.request.user).unsubscribe_from_user(other_user)
-        except User.DoesNotExist:
-            raise exceptions.NotFound(detail=f'Пользователя с id={pk} не существует.')
+            UserSubscriptionsService(self.request.user).unsubscribe_from_user(int(pk))
+        except UserDoesNotExist as e:
+            raise exceptions.NotFound(detail=e.message)
         except UserIsNotFollower as e:
             raise exceptions.PermissionDenied(detail=e.message)
         except Exception:
             logger.error(
-                f'Ошибка при отписке пользователя {request.user} от пользователя {other_user}. '
+                f'Ошибка при отписке пользователя {request.user} от пользователя с id={pk}. '
                 f'Ошибка:\n{traceback.format_exc()}'
             )
             raise exceptions.APIException()
@@ -222,15 +340,14 @@ class UserViewSet(
             raise exceptions.ValidationError(detail=f'Пользователь не является своим подписчиком.')
 
         try:
-            other_user = User.objects.get(pk=pk)
-            UserSubscriptionsService(self.request.user).remove_from_subscribers(other_user)
-        except User.DoesNotExist:
-            raise exceptions.NotFound(detail=f'Пользователя с id={pk} не существует.')
+            UserSubscriptionsService(self.request.user).remove_from_subscribers(int(pk))
+        except UserDoesNotExist as e:
+            raise exceptions.NotFound(detail=e.message)
         except UserIsNotFollower as e:
             raise exceptions.PermissionDenied(detail=e.message)
         except Exception:
             logger.error(
-                f'Ошибка при удалении пользователя {other_user} из подписчиков '
+                f'Ошибка при удалении пользователя с id={pk} из подписчиков '
                 f'пользователя {request.user}. Ошибка:\n{traceback.format_exc()}'
             )
             raise exceptions.APIException()
@@ -241,15 +358,21 @@ class UserViewSet(
     @action(methods=('post', ), detail=False, url_path='generate-users')
     def generate(self, request: Request) -> Response:
         count = 1000
-        users = [User(username=f'username_{i}', password='1234567') for i in range(count)]
-        User.objects.bulk_create(users)
+        User.objects.bulk_create_users(
+            (f'username_{i}', '1234567') for i in range(count)
+        )
         return Response(status=200)
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
+    serializer_class = CustomTokenObtainPairSerializer
+
     @auth_openapi.get('token')
     def post(self, request: Request, *args, **kwargs) -> Response:
-        return super().post(request, *args, **kwargs)
+        try:
+            return super().post(request, *args, **kwargs)
+        except PasswordHashingPoolOverloaded as e:
+            raise exceptions.Throttled(detail=e.message)
 
 
 class CustomTokenRefreshView(TokenRefreshView):
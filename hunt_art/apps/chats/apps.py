@@ -6,3 +6,8 @@ class ChatsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.chats"
     verbose_name = _("Чаты")
+
+    def ready(self) -> None:
+        from .services.chat_messages import check_write_behind_settings
+
+        check_write_behind_settings()
@@ -0,0 +1,251 @@
+from typing import Iterable
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.db import (
+    IntegrityError,
+    connections,
+    transaction,
+)
+from django.db.models import (
+    Manager,
+    QuerySet,
+)
+
+from apps.chats import models
+
+
+class ChatManager(Manager):
+    """
+    Менеджер чатов.
+
+    Персональный чат между двумя пользователями ищется по канонической паре
+    `(user_low, user_high)` из `PersonalChatData`, на которую есть уникальный индекс.
+    """
+
+    @staticmethod
+    def get_personal_chat_users_pair(user_pk: int, other_user_pk: int) -> tuple[int, int]:
+        """Каноническая пара пользователей персонального чата: меньший id идет первым"""
+        return (user_pk, other_user_pk) if user_pk < other_user_pk else (other_user_pk, user_pk)
+
+    def filter_personal_chat(self, user_pk: int, other_user_pk: int) -> QuerySet['models.Chat']:
+        """Выборка персонального чата между двумя пользователями (не больше одной записи)"""
+
+        user_low_pk, user_high_pk = self.get_personal_chat_users_pair(user_pk, other_user_pk)
+        return self.filter(
+            personal_chat_data__user_low_id=user_low_pk,
+            personal_chat_data__user_high_id=user_high_pk,
+        )
+
+    def get_personal_chat(self, user_pk: int, other_user_pk: int) -> 'models.Chat | None':
+        return self.filter_personal_chat(user_pk, other_user_pk).first()
+
+    async def aget_personal_chat(self, user_pk: int, other_user_pk: int) -> 'models.Chat | None':
+        return await self.filter_personal_chat(user_pk, other_user_pk).afirst()
+
+    def get_or_create_personal_chat(
+        self,
+        user_pk: int,
+        other_user_pk: int,
+    ) -> tuple['models.Chat', bool]:
+        """
+        Получение или создание персонального чата между двумя пользователями.
+
+        Возвращает чат и флаг, был ли он создан. Если чат параллельно создал
+        другой запрос, уникальный индекс по паре пользователей не даст создать
+        дубликат, и будет возвращен уже существующий чат.
+        """
+        chat = self.get_personal_chat(user_pk, other_user_pk)
+        if chat is not None:
+            return chat, False
+
+        user_low_pk, user_high_pk = self.get_personal_chat_users_pair(user_pk, other_user_pk)
+        try:
+            with transaction.atomic(using=self.db):
+                chat = self.create(chat_type=models.Chat.ChatType.PERSONAL)
+                models.PersonalChatData.objects.create(
+                    chat=chat,
+                    user_low_id=user_low_pk,
+                    user_high_id=user_high_pk,
+                )
+                models.ChatMember.objects.bulk_create([
+                    models.ChatMember(chat=chat, user_id=user_low_pk),
+                    models.ChatMember(chat=chat, user_id=user_high_pk),
+                ])
+        except IntegrityError:
+            chat = self.get_personal_chat(user_pk, other_user_pk)
+            if chat is None:
+                raise
+            return chat, False
+
+        return chat, True
+
+    def update_last_messages(self, messages: Iterable['models.ChatMessage']) -> int:
+        """
+        Запись последнего сообщения в чаты одним запросом.
+
+        Из пачки для каждого чата берется самое свежее сообщение. Более старое сообщение
+        не перетирает более новое, записанное другим процессом. Возвращает количество
+        обновленных чатов.
+        """
+        last_messages: dict[int, 'models.ChatMessage'] = {}
+        for message in messages:
+            last_message = last_messages.get(message.chat_id)
+            if last_message is None or (message.created_at, message.pk) > (last_message.created_at, last_message.pk):
+                last_messages[message.chat_id] = message
+
+        if not last_messages:
+            return 0
+
+        quote_name = connections[self.db].ops.quote_name
+        meta = models.Chat._meta
+        table = quote_name(meta.db_table)
+        pk_column = quote_name(meta.pk.column)
+        last_message_column = quote_name(meta.get_field('last_message').column)
+        last_message_at_column = quote_name(meta.get_field('last_message_at').column)
+        preview_column = quote_name(meta.get_field('last_message_preview').column)
+        values_sql = ', '.join(['(%s, %s, %s::timestamptz, %s)'] * len(last_messages))
+        params = [
+            value
+            for message in last_messages.values()
+            for value in (
+                message.chat_id,
+                message.pk,
+                message.created_at,
+                message.text[:models.Chat.LAST_MESSAGE_PREVIEW_LENGTH],
+            )
+        ]
+
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} AS c SET '
+                f'{last_message_column} = v.message_id, '
+                f'{last_message_at_column} = v.created_at, '
+                f'{preview_column} = v.preview '
+                f'FROM (VALUES {values_sql}) AS v(id, message_id, created_at, preview) '
+                f'WHERE c.{pk_column} = v.id AND ('
+                f'c.{last_message_column} IS NULL '
+                f'OR c.{last_message_at_column} < v.created_at '
+                f'OR (c.{last_message_at_column} = v.created_at AND c.{last_message_column} < v.message_id)'
+                f')',
+                params,
+            )
+            return cursor.rowcount
+
+    async def aupdate_last_messages(self, messages: Iterable['models.ChatMessage']) -> int:
+        return await sync_to_async(self.update_last_messages)(list(messages))
+
+    async def aget_or_create_personal_chat(
+        self,
+        user_pk: int,
+        other_user_pk: int,
+    ) -> tuple['models.Chat', bool]:
+        # Существующий чат находится одним асинхронным запросом по индексу.
+        # В поток уходит только создание, т.к. ему нужна транзакция.
+        chat = await self.aget_personal_chat(user_pk, other_user_pk)
+        if chat is not None:
+            return chat, False
+
+        return await sync_to_async(self.get_or_create_personal_chat)(user_pk, other_user_pk)
+
+
+class ChatMemberManager(Manager):
+    """
+    Менеджер участников чатов.
+
+    Хранит денормализованный счетчик непрочитанных сообщений `unread_count`:
+    он увеличивается у получателей при записи сообщения и пересчитывается,
+    когда участник продвигает `read_before`.
+    """
+
+    def increment_unread_counts(self, messages: Iterable['models.ChatMessage']) -> int:
+        """
+        Увеличение счетчиков непрочитанных у получателей пачки сообщений одним запросом.
+
+        Сообщение не учитывается у автора и у участников, которые уже дочитали
+        чат дальше него (при отложенной записи отметка о прочтении может попасть
+        в БД раньше самого сообщения). Возвращает количество обновленных участников.
+        """
+        values = [(message.chat_id, message.user_id, message.created_at) for message in messages]
+        if not values:
+            return 0
+
+        names = self._get_sql_names()
+        values_sql = ', '.join(['(%s, %s, %s::timestamptz)'] * len(values))
+        params = [value for row in values for value in row]
+
+        with connections[self.db].cursor() as cursor:
+            # Участник может получить несколько сообщений пачки, поэтому прибавки
+            # сначала суммируются: `UPDATE ... FROM` применяет к строке только одно совпадение.
+            cursor.execute(
+                f'UPDATE {names["table"]} AS m SET {names["unread_count"]} = m.{names["unread_count"]} + i.count '
+                f'FROM ('
+                f'SELECT r.{names["pk"]} AS id, COUNT(*) AS count '
+                f'FROM (VALUES {values_sql}) AS v(chat_id, user_id, created_at) '
+                f'JOIN {names["table"]} AS r ON r.{names["chat"]} = v.chat_id AND r.{names["user"]} <> v.user_id '
+                f'WHERE r.{names["read_before"]} IS NULL OR r.{names["read_before"]} < v.created_at '
+                f'GROUP BY r.{names["pk"]}'
+                f') AS i '
+                f'WHERE m.{names["pk"]} = i.id',
+                params,
+            )
+            return cursor.rowcount
+
+    async def aincrement_unread_counts(self, messages: Iterable['models.ChatMessage']) -> int:
+        return await sync_to_async(self.increment_unread_counts)(list(messages))
+
+    def update_read_progress(self, read_befores: dict[int, datetime]) -> int:
+        """
+        Продвижение `read_before` у участников одним запросом (ключи - id участников).
+
+        Более ранняя отметка не перетирает более позднюю, а `unread_count` пересчитывается
+        по сообщениям других участников после новой отметки. Подсчет идет по индексу
+        `(chat, created_at, id)` и затрагивает только еще не прочитанный хвост чата.
+        Возвращает количество обновленных участников.
+        """
+        if not read_befores:
+            return 0
+
+        names = self._get_sql_names()
+        values_sql = ', '.join(['(%s, %s::timestamptz)'] * len(read_befores))
+        params = [value for item in read_befores.items() for value in item]
+
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {names["table"]} AS m SET '
+                f'{names["read_before"]} = v.read_before, '
+                f'{names["unread_count"]} = ('
+                f'SELECT COUNT(*) FROM {names["message_table"]} AS msg '
+                f'WHERE msg.{names["message_chat"]} = m.{names["chat"]} '
+                f'AND msg.{names["message_created_at"]} > v.read_before '
+                f'AND msg.{names["message_user"]} <> m.{names["user"]}'
+                f') '
+                f'FROM (VALUES {values_sql}) AS v(id, read_before) '
+                f'WHERE m.{names["pk"]} = v.id '
+                f'AND (m.{names["read_before"]} IS NULL OR m.{names["read_before"]} < v.read_before)',
+                params,
+            )
+            return cursor.rowcount
+
+    async def aupdate_read_progress(self, read_befores: dict[int, datetime]) -> int:
+        return await sync_to_async(self.update_read_progress)(dict(read_befores))
+
+    def _get_sql_names(self) -> dict[str, str]:
+        """Экранированные имена таблиц и колонок для запросов по счетчикам"""
+
+        quote_name = connections[self.db].ops.quote_name
+        member_meta = models.ChatMember._meta
+        message_meta = models.ChatMessage._meta
+
+        return {
+            'table': quote_name(member_meta.db_table),
+            'pk': quote_name(member_meta.pk.column),
+            'chat': quote_name(member_meta.get_field('chat').column),
+            'user': quote_name(member_meta.get_field('user').column),
+            'read_before': quote_name(member_meta.get_field('read_before').column),
+            'unread_count': quote_name(member_meta.get_field('unread_count').column),
+            'message_table': quote_name(message_meta.db_table),
+            'message_chat': quote_name(message_meta.get_field('chat').column),
+            'message_user': quote_name(message_meta.get_field('user').column),
+            'message_created_at': quote_name(message_meta.get_field('created_at').column),
+        }
@@ -0,0 +1,60 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def fill_personal_chat_users_pair(apps, schema_editor):
+    """
+    Заполнение канонической пары пользователей у персональных чатов.
+
+    Раньше поиск чата шел через пересечение чатов двух пользователей, и при гонке
+    между ними могло появиться несколько персональных чатов. Такие дубликаты
+    сливаются в чат с наименьшим id: сообщения переносятся, лишние чаты удаляются.
+    """
+    Chat = apps.get_model("chats", "Chat")
+    ChatMember = apps.get_model("chats", "ChatMember")
+    ChatMessage = apps.get_model("chats", "ChatMessage")
+    PersonalChatData = apps.get_model("chats", "PersonalChatData")
+
+    users_by_chat_pk: dict[int, list[int]] = defaultdict(list)
+    members = (
+        ChatMember.objects
+        .filter(chat__chat_type="personal")
+        .values_list("chat_id", "user_id")
+        .iterator()
+    )
+    for chat_pk, user_pk in members:
+        users_by_chat_pk[chat_pk].append(user_pk)
+
+    chat_pks_by_pair: dict[tuple[int, int], list[int]] = defaultdict(list)
+    for chat_pk, user_pks in users_by_chat_pk.items():
+        if len(user_pks) != 2 or user_pks[0] == user_pks[1]:
+            continue
+        chat_pks_by_pair[tuple(sorted(user_pks))].append(chat_pk)
+
+    canonical_chat_pks = set()
+    for (user_low_pk, user_high_pk), chat_pks in chat_pks_by_pair.items():
+        chat_pk, *duplicate_chat_pks = sorted(chat_pks)
+        canonical_chat_pks.add(chat_pk)
+        if duplicate_chat_pks:
+            ChatMessage.objects.filter(chat_id__in=duplicate_chat_pks).update(chat_id=chat_pk)
+            Chat.objects.filter(pk__in=duplicate_chat_pks).delete()
+
+        PersonalChatData.objects.update_or_create(
+            chat_id=chat_pk,
+            defaults={"user_low_id": user_low_pk, "user_high_id": user_high_pk},
+        )
+
+    # Данные чатов без корректной пары участников заполнить нечем.
+    PersonalChatData.objects.exclude(chat_id__in=canonical_chat_pks).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0003_personal_chat_users_pair"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_personal_chat_users_pair, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0004_fill_personal_chat_users_pair"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="personalchatdata",
+            name="user_low",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Участник с меньшим id",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="personalchatdata",
+            name="user_high",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Участник с большим id",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="personalchatdata",
+            constraint=models.UniqueConstraint(
+                fields=("user_low", "user_high"),
+                name="personalchatdata_users_unique",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="personalchatdata",
+            constraint=models.CheckConstraint(
+                check=models.Q(("user_low__lt", models.F("user_high"))),
+                name="personalchatdata_users_ordered",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0005_personal_chat_users_pair_constraints"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chatmessage",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                verbose_name="Дата создания сообщения",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0006_chatmessage_created_at_default"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["chat", "created_at", "id"],
+                name="chatmessage_chat_created_idx",
+            ),
+        ),
+    ]
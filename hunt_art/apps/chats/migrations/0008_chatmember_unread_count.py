@@ -0,0 +1,50 @@
+# Generated by Django 5.0.2 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+def fill_unread_counts(apps, schema_editor):
+    """Подсчет непрочитанных сообщений других участников после `read_before`"""
+    ChatMember = apps.get_model("chats", "ChatMember")
+    ChatMessage = apps.get_model("chats", "ChatMessage")
+
+    quote_name = schema_editor.connection.ops.quote_name
+    member_meta = ChatMember._meta
+    message_meta = ChatMessage._meta
+    member_table = quote_name(member_meta.db_table)
+    member_chat = quote_name(member_meta.get_field("chat").column)
+    member_user = quote_name(member_meta.get_field("user").column)
+    read_before = quote_name(member_meta.get_field("read_before").column)
+    unread_count = quote_name(member_meta.get_field("unread_count").column)
+    message_table = quote_name(message_meta.db_table)
+    message_chat = quote_name(message_meta.get_field("chat").column)
+    message_user = quote_name(message_meta.get_field("user").column)
+    created_at = quote_name(message_meta.get_field("created_at").column)
+
+    schema_editor.execute(
+        f"UPDATE {member_table} AS m SET {unread_count} = ("
+        f"SELECT COUNT(*) FROM {message_table} AS msg "
+        f"WHERE msg.{message_chat} = m.{member_chat} "
+        f"AND msg.{message_user} <> m.{member_user} "
+        f"AND (m.{read_before} IS NULL OR msg.{created_at} > m.{read_before})"
+        f")"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0007_chatmessage_chat_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmember",
+            name="unread_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                verbose_name="Количество непрочитанных сообщений",
+            ),
+        ),
+        migrations.RunPython(fill_unread_counts, migrations.RunPython.noop),
+    ]
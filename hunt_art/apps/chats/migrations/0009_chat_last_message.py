@@ -0,0 +1,52 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0008_chatmember_unread_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chat",
+            name="last_message",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="chats.chatmessage",
+                verbose_name="Последнее сообщение",
+            ),
+        ),
+        migrations.AddField(
+            model_name="chat",
+            name="last_message_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                verbose_name="Дата и время последнего сообщения",
+            ),
+        ),
+        migrations.AddField(
+            model_name="chat",
+            name="last_message_preview",
+            field=models.CharField(
+                blank=True,
+                default="",
+                max_length=100,
+                verbose_name="Начало текста последнего сообщения",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(
+                fields=["-last_message_at", "-id"],
+                name="chat_last_message_at_idx",
+            ),
+        ),
+    ]
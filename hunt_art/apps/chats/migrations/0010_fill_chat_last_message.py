@@ -0,0 +1,55 @@
+from django.db import migrations
+
+
+# Длина превью на момент миграции (см. `Chat.LAST_MESSAGE_PREVIEW_LENGTH`).
+LAST_MESSAGE_PREVIEW_LENGTH = 100
+
+
+def fill_chat_last_message(apps, schema_editor):
+    """
+    Заполнение последнего сообщения у существующих чатов.
+
+    Чаты без сообщений сохраняют время, выставленное при добавлении поля.
+    """
+    Chat = apps.get_model("chats", "Chat")
+    ChatMessage = apps.get_model("chats", "ChatMessage")
+
+    quote_name = schema_editor.connection.ops.quote_name
+    chat_meta = Chat._meta
+    message_meta = ChatMessage._meta
+    chat_table = quote_name(chat_meta.db_table)
+    chat_pk = quote_name(chat_meta.pk.column)
+    last_message = quote_name(chat_meta.get_field("last_message").column)
+    last_message_at = quote_name(chat_meta.get_field("last_message_at").column)
+    last_message_preview = quote_name(chat_meta.get_field("last_message_preview").column)
+    message_table = quote_name(message_meta.db_table)
+    message_pk = quote_name(message_meta.pk.column)
+    message_chat = quote_name(message_meta.get_field("chat").column)
+    created_at = quote_name(message_meta.get_field("created_at").column)
+    text = quote_name(message_meta.get_field("text").column)
+
+    schema_editor.execute(
+        f"UPDATE {chat_table} AS c SET "
+        f"{last_message} = m.id, "
+        f"{last_message_at} = m.created_at, "
+        f"{last_message_preview} = LEFT(m.text, %s) "
+        f"FROM ("
+        f"SELECT DISTINCT ON ({message_chat}) "
+        f"{message_pk} AS id, {message_chat} AS chat_id, {created_at} AS created_at, {text} AS text "
+        f"FROM {message_table} "
+        f"ORDER BY {message_chat}, {created_at} DESC, {message_pk} DESC"
+        f") AS m "
+        f"WHERE c.{chat_pk} = m.chat_id",
+        (LAST_MESSAGE_PREVIEW_LENGTH, ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0009_chat_last_message"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_chat_last_message, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,17 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .managers import ChatManager, ChatMemberManager
+
 
 UserModel = get_user_model()
 
 
 class Chat(models.Model):
+    LAST_MESSAGE_PREVIEW_LENGTH = 100
+
     class ChatType(models.TextChoices):
         GROUP = "group", _("Групповой чат")
         PERSONAL = "personal", _("Личный чат")
@@ -24,9 +29,39 @@ class Chat(models.Model):
         verbose_name=_("Участники чата"),
     )
 
+    # Последнее сообщение денормализовано в чат, чтобы список чатов
+    # сортировался по активности одним запросом по индексу.
+    last_message = models.ForeignKey(
+        to="ChatMessage",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name=_("Последнее сообщение"),
+    )
+    # У чата без сообщений - время создания.
+    last_message_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_("Дата и время последнего сообщения"),
+    )
+    last_message_preview = models.CharField(
+        max_length=LAST_MESSAGE_PREVIEW_LENGTH,
+        blank=True,
+        default="",
+        verbose_name=_("Начало текста последнего сообщения"),
+    )
+
+    objects = ChatManager()
+
     class Meta:
         verbose_name = _("Чат")
         verbose_name_plural = _("Чаты")
+        indexes = (
+            models.Index(
+                fields=("-last_message_at", "-id"),
+                name="chat_last_message_at_idx",
+            ),
+        )
 
 
 class GroupChatData(models.Model):
@@ -66,6 +101,33 @@ class PersonalChatData(models.Model):
         related_query_name="personal_chat_data",
         verbose_name=_("Чат"),
     )
+    # Участники чата в каноническом порядке (`user_low_id < user_high_id`).
+    # Уникальный индекс по паре позволяет найти чат двух пользователей одним запросом
+    # и не дает создать второй персональный чат между ними.
+    user_low = models.ForeignKey(
+        to=UserModel,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("Участник с меньшим id"),
+    )
+    user_high = models.ForeignKey(
+        to=UserModel,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("Участник с большим id"),
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user_low", "user_high"),
+                name="personalchatdata_users_unique",
+            ),
+            models.CheckConstraint(
+                check=models.Q(user_low__lt=models.F("user_high")),
+                name="personalchatdata_users_ordered",
+            ),
+        )
 
 
 class ChatMember(models.Model):
@@ -100,6 +162,14 @@ class ChatMember(models.Model):
         blank=True,
         verbose_name=_("Дата и время, до куда пользователь дочитал историю чата"),
     )
+    # Денормализованный счетчик сообщений других участников после `read_before`,
+    # чтобы список чатов не считал непрочитанные запросом на каждый чат.
+    unread_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Количество непрочитанных сообщений"),
+    )
+
+    objects = ChatMemberManager()
 
     class Meta:
         verbose_name = _("Участник чата")
@@ -133,11 +203,20 @@ class ChatMessage(models.Model):
         null=False,
         verbose_name=_("Текст сообщения"),
     )
+    # Время задается при создании объекта, а не при записи в БД:
+    # при отложенной записи сообщение рассылается раньше, чем сохраняется.
     created_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         verbose_name=_("Дата создания сообщения"),
     )
 
     class Meta:
         verbose_name = _("Сообщение чата")
         verbose_name_plural = _("Сообщения чатов")
+        indexes = (
+            # История чата листается по курсору `(created_at, id)`.
+            models.Index(
+                fields=("chat", "created_at", "id"),
+                name="chatmessage_chat_created_idx",
+            ),
+        )
@@ -0,0 +1,4 @@
+from .service import (
+    ChatMembersCache,
+    chat_members_cache,
+)
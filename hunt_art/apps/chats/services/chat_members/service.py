@@ -0,0 +1,67 @@
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.local_cache import LocalTTLCache
+
+from apps.chats.models import ChatMember
+
+
+class ChatMembersCache:
+    """
+    Двухуровневый кэш участников чатов: id чата -> id участников.
+
+    Нужен для рассылки сообщений по персональным группам пользователей
+    без запроса в БД на каждое сообщение. Первый уровень - LRU в памяти процесса
+    с коротким временем жизни, второй - общий кэш Django.
+
+    NOTE: При изменении состава чата нужно вызвать `invalidate`. Персональные чаты
+    свой состав не меняют.
+    """
+
+    def __init__(self, local_max_size: int, local_timeout: float, shared_timeout: int) -> None:
+        self._local_timeout = local_timeout
+        self._shared_timeout = shared_timeout
+        self._local_members: LocalTTLCache[int, tuple[int, ...]] = LocalTTLCache(local_max_size)
+
+    async def aget(self, chat_pk: int) -> tuple[int, ...]:
+        member_pks = self._local_members.get(chat_pk)
+        if member_pks is not None:
+            return member_pks
+
+        member_pks = await cache.aget(self._get_cache_key(chat_pk))
+        if member_pks is None:
+            member_pks = tuple([
+                user_pk
+                async for user_pk in (
+                    ChatMember.objects
+                    .filter(chat_id=chat_pk)
+                    .values_list('user_id', flat=True)
+                )
+            ])
+            await cache.aset(self._get_cache_key(chat_pk), member_pks, self._shared_timeout)
+
+        self._local_members.set(chat_pk, member_pks, self._local_timeout)
+        return member_pks
+
+    async def aset(self, chat_pk: int, member_pks: Iterable[int]) -> None:
+        """Сохранение заранее известного состава чата (например, сразу после создания)"""
+
+        member_pks = tuple(member_pks)
+        await cache.aset(self._get_cache_key(chat_pk), member_pks, self._shared_timeout)
+        self._local_members.set(chat_pk, member_pks, self._local_timeout)
+
+    def invalidate(self, chat_pk: int) -> None:
+        self._local_members.delete(chat_pk)
+        cache.delete(self._get_cache_key(chat_pk))
+
+    def _get_cache_key(self, chat_pk: int) -> str:
+        return f'chats:members:{chat_pk}'
+
+
+chat_members_cache = ChatMembersCache(
+    local_max_size=settings.CHAT_MEMBERS_LOCAL_CACHE_SIZE,
+    local_timeout=settings.CHAT_MEMBERS_LOCAL_CACHE_TIMEOUT,
+    shared_timeout=settings.CHAT_MEMBERS_CACHE_TIMEOUT,
+)
@@ -0,0 +1,14 @@
+from .service import (
+    ChatMessagesFlusher,
+    chat_messages_flusher,
+    get_chat_message_ids,
+    get_chat_message_created_at,
+    get_worker_id_lease,
+    check_write_behind_settings,
+)
+from .worker_ids import WorkerIdLease
+from .exceptions import (
+    NoFreeWorkerId,
+    WorkerIdLeaseLost,
+    ChatMessageIdConflict,
+)
@@ -0,0 +1,25 @@
+class NoFreeWorkerId(Exception):
+    def __init__(self, worker_ids_count: int) -> None:
+        self.message = (
+            f'Все номера воркеров генератора id сообщений ({worker_ids_count} шт.) заняты '
+            f'другими процессами. Уменьшите количество процессов или задайте номер вручную.'
+        )
+        super().__init__(self.message)
+
+
+class WorkerIdLeaseLost(Exception):
+    def __init__(self, worker_id: int) -> None:
+        self.message = (
+            f'Аренда номера воркера {worker_id} генератора id сообщений потеряна. '
+            f'Выдавать id с этим номером небезопасно.'
+        )
+        super().__init__(self.message)
+
+
+class ChatMessageIdConflict(Exception):
+    def __init__(self, message_id: int) -> None:
+        self.message = (
+            f'Id {message_id} уже занят другим сообщением. Номер воркера генератора id '
+            f'используется несколькими процессами одновременно.'
+        )
+        super().__init__(self.message)
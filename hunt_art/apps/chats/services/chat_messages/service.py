@@ -0,0 +1,194 @@
+import logging
+import functools
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+
+from apps.chats.models import Chat, ChatMember, ChatMessage
+from utils.batch_flusher import BackgroundBatchFlusher
+from utils.snowflake import SnowflakeGenerator, get_snowflake_timestamp_ms
+
+from .worker_ids import WorkerIdLease
+from .exceptions import ChatMessageIdConflict
+
+
+logger = logging.getLogger(__name__)
+
+
+WORKER_ID_LEASE_CACHE_KEY_PREFIX = 'chats:message_id_worker'
+# Бэкенды кэша, которые видны только текущему процессу. Арендовать номер воркера в них нельзя:
+# каждый процесс займет номер 0, и id сообщений разных процессов совпадут.
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class ChatMessagesFlusher(BackgroundBatchFlusher[int, ChatMessage]):
+    """
+    Отложенная (write-behind) запись сообщений чатов.
+
+    Сообщения получают id и время создания еще до записи, рассылаются сразу,
+    а в БД попадают пачками через `bulk_create`. В буфере держится не больше
+    `max_buffered` сообщений, включая пачку, которая записывается сейчас: это верхняя
+    граница того, что может потеряться при аварийном завершении процесса. Если буфер
+    заполнен, `offer` вернет `False`, и сообщение нужно записать сразу.
+
+    Сообщение, id которого уже занят другим сообщением, не выбрасывается: оно остается
+    в буфере, а о конфликте пишется критическая ошибка.
+    """
+
+    def __init__(self, name: str, interval: float, max_pending: int, max_buffered: int) -> None:
+        super().__init__(name=name, interval=interval, max_pending=max_pending)
+        self.max_buffered = max_buffered
+
+    def offer(self, message: ChatMessage) -> bool:
+        """Постановка сообщения в очередь на запись, если в буфере есть место"""
+
+        # Неудачно записанная пачка возвращается в буфер, поэтому она тоже занимает место.
+        if self.buffered_count >= self.max_buffered:
+            return False
+
+        self.add(message.pk, message)
+        return True
+
+    def flush_batch(self, batch: dict[int, ChatMessage]) -> None:
+        messages = list(batch.values())
+        try:
+            self._save_messages(messages)
+        except IntegrityError:
+            # Одно битое сообщение (например, от удаленного пользователя или с повторным id)
+            # не должно блокировать запись всей пачки.
+            self._flush_one_by_one(messages)
+
+    def _save_messages(self, messages: list[ChatMessage]) -> None:
+        # Сообщения, счетчики непрочитанных получателей и последние сообщения чатов
+        # пишутся в одной транзакции, чтобы повторная запись пачки не увеличила счетчики дважды.
+        with transaction.atomic():
+            ChatMessage.objects.bulk_create(messages)
+            ChatMember.objects.increment_unread_counts(messages)
+            Chat.objects.update_last_messages(messages)
+
+    def _flush_one_by_one(self, messages: list[ChatMessage]) -> None:
+        for message in messages:
+            try:
+                self._save_messages([message])
+            except IntegrityError:
+                self._handle_failed_message(message)
+
+    def _handle_failed_message(self, message: ChatMessage) -> None:
+        stored_message = (
+            ChatMessage.objects
+            .filter(pk=message.pk)
+            .values('chat_id', 'user_id', 'text')
+            .first()
+        )
+        if stored_message is None:
+            logger.exception(f'Сообщение {message.pk} из чата {message.chat_id} не удалось записать.')
+            return
+
+        if stored_message == {'chat_id': message.chat_id, 'user_id': message.user_id, 'text': message.text}:
+            # Сообщение уже записано прошлой попыткой, у которой не дошел ответ от БД.
+            return
+
+        # Сообщение уже разослано, поэтому выбросить его нельзя. Оставляем его в буфере
+        # (оно по-прежнему отдается через `get`) и громко сообщаем о конфликте.
+        logger.critical(
+            f'Сообщение из чата {message.chat_id} от пользователя {message.user_id} '
+            f'с текстом {message.text!r} не записано.',
+            exc_info=ChatMessageIdConflict(message.pk),
+        )
+        self._requeue({message.pk: message})
+
+
+chat_messages_flusher = ChatMessagesFlusher(
+    name='chat-messages-flusher',
+    interval=settings.CHAT_MESSAGES_FLUSH_INTERVAL,
+    max_pending=settings.CHAT_MESSAGES_FLUSH_BATCH_SIZE,
+    max_buffered=settings.CHAT_MESSAGES_MAX_BUFFERED,
+)
+
+# Раскладка id сообщений укладывается в 53 бита (41 + 6 + 6), чтобы id без потерь
+# читались в JavaScript: до 64 воркеров и до 64 сообщений в миллисекунду на воркер.
+CHAT_MESSAGE_ID_WORKER_BITS = 6
+CHAT_MESSAGE_ID_SEQUENCE_BITS = 6
+
+
+def check_write_behind_settings() -> None:
+    """
+    Проверка настроек отложенной записи сообщений при запуске.
+
+    Номер воркера генератора id должен быть либо задан явно, либо арендоваться
+    в общем для всех процессов кэше.
+    """
+    if not settings.CHAT_MESSAGES_WRITE_BEHIND or settings.CHAT_MESSAGES_SNOWFLAKE_WORKER_ID >= 0:
+        return
+
+    cache_backend = settings.CACHES['default']['BACKEND']
+    if cache_backend in PROCESS_LOCAL_CACHE_BACKENDS:
+        raise ImproperlyConfigured(
+            f'Отложенная запись сообщений (CHAT_MESSAGES_WRITE_BEHIND) требует общий кэш '
+            f'для аренды номера воркера генератора id, а сейчас используется {cache_backend}. '
+            f'Настройте REDIS_DSN или задайте CHAT_MESSAGES_SNOWFLAKE_WORKER_ID.'
+        )
+
+
+@functools.cache
+def get_worker_id_lease() -> WorkerIdLease | None:
+    """
+    Аренда номера воркера генератора id сообщений текущего процесса.
+
+    Если номер задан в настройках, за его уникальность отвечает окружение, и аренды нет.
+    """
+    if settings.CHAT_MESSAGES_SNOWFLAKE_WORKER_ID >= 0:
+        return None
+
+    lease = WorkerIdLease(
+        key_prefix=WORKER_ID_LEASE_CACHE_KEY_PREFIX,
+        worker_ids_count=1 << CHAT_MESSAGE_ID_WORKER_BITS,
+        ttl=settings.CHAT_MESSAGES_WORKER_ID_LEASE_TTL,
+    )
+    lease.acquire()
+    return lease
+
+
+@functools.cache
+def _get_generator(worker_id: int) -> SnowflakeGenerator:
+    return SnowflakeGenerator(
+        worker_id=worker_id,
+        epoch_ms=settings.CHAT_MESSAGES_SNOWFLAKE_EPOCH_MS,
+        worker_id_bits=CHAT_MESSAGE_ID_WORKER_BITS,
+        sequence_bits=CHAT_MESSAGE_ID_SEQUENCE_BITS,
+    )
+
+
+def get_chat_message_ids() -> SnowflakeGenerator:
+    """
+    Генератор id сообщений текущего процесса (создается при первом обращении).
+
+    Кидает `NoFreeWorkerId`, если свободных номеров воркеров нет,
+    и `WorkerIdLeaseLost`, если аренда номера потеряна.
+    """
+    lease = get_worker_id_lease()
+    if lease is None:
+        return _get_generator(settings.CHAT_MESSAGES_SNOWFLAKE_WORKER_ID)
+
+    lease.ensure_held()
+    return _get_generator(lease.worker_id)
+
+
+def get_chat_message_created_at(message_id: int) -> datetime:
+    """
+    Время создания сообщения, зашитое в его id.
+
+    Имеет смысл только для id из `get_chat_message_ids`, то есть при отложенной записи.
+    """
+    timestamp_ms = get_snowflake_timestamp_ms(
+        message_id,
+        epoch_ms=settings.CHAT_MESSAGES_SNOWFLAKE_EPOCH_MS,
+        worker_id_bits=CHAT_MESSAGE_ID_WORKER_BITS,
+        sequence_bits=CHAT_MESSAGE_ID_SEQUENCE_BITS,
+    )
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
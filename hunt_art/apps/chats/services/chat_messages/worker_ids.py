@@ -0,0 +1,97 @@
+import atexit
+import uuid
+import logging
+import threading
+
+from django.core.cache import cache
+
+from .exceptions import NoFreeWorkerId, WorkerIdLeaseLost
+
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerIdLease:
+    """
+    Аренда номера воркера для генератора id в общем кэше.
+
+    Номер занимается через `cache.add` с временем жизни, поэтому у живого процесса
+    он эксклюзивный. Фоновый поток продлевает аренду каждую треть `ttl`.
+    Если аренду продлить не удалось и номер занял другой процесс, аренда считается
+    потерянной, и `ensure_held` кидает исключение: выдавать id с чужим номером нельзя.
+    При завершении процесса номер освобождается.
+
+    NOTE: Проверка владельца и продление - два отдельных обращения к кэшу. Это безопасно,
+    пока процесс продлевает аренду заметно раньше, чем она истекает.
+    """
+
+    def __init__(self, key_prefix: str, worker_ids_count: int, ttl: int) -> None:
+        self.key_prefix = key_prefix
+        self.worker_ids_count = worker_ids_count
+        self.ttl = ttl
+        self.worker_id: int | None = None
+        self._token = uuid.uuid4().hex
+        self._lost = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def acquire(self) -> int:
+        """Занятие первого свободного номера и запуск продления аренды"""
+
+        for worker_id in range(self.worker_ids_count):
+            if cache.add(self._get_cache_key(worker_id), self._token, timeout=self.ttl):
+                self.worker_id = worker_id
+                break
+        else:
+            raise NoFreeWorkerId(self.worker_ids_count)
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f'{self.key_prefix}-lease',
+            daemon=True,
+        )
+        self._thread.start()
+        atexit.register(self.release)
+        return self.worker_id
+
+    def ensure_held(self) -> None:
+        if self._lost.is_set():
+            raise WorkerIdLeaseLost(self.worker_id)
+
+    def release(self) -> None:
+        self._stopped.set()
+        if self.worker_id is None or self._lost.is_set():
+            return
+
+        key = self._get_cache_key(self.worker_id)
+        if cache.get(key) == self._token:
+            cache.delete(key)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.ttl / 3):
+            try:
+                self._refresh()
+            except Exception:
+                # Кэш может быть временно недоступен. Аренда еще жива, попробуем на следующем шаге.
+                logger.exception(f'Не удалось продлить аренду номера воркера {self.worker_id}.')
+
+            if self._lost.is_set():
+                return
+
+    def _refresh(self) -> None:
+        key = self._get_cache_key(self.worker_id)
+        owner = cache.get(key)
+        if owner == self._token:
+            cache.touch(key, self.ttl)
+            return
+
+        # Аренда истекла (например, процесс надолго завис). Номер можно вернуть,
+        # только если его еще никто не занял.
+        if owner is None and cache.add(key, self._token, timeout=self.ttl):
+            return
+
+        self._lost.set()
+        logger.error(f'Аренда номера воркера {self.worker_id} потеряна, выдача id сообщений остановлена.')
+
+    def _get_cache_key(self, worker_id: int) -> str:
+        return f'{self.key_prefix}:{worker_id}'
@@ -0,0 +1,4 @@
+from .service import (
+    ReadProgressFlusher,
+    read_progress_flusher,
+)
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from django.conf import settings
+
+from apps.chats.models import ChatMember
+from utils.batch_flusher import BackgroundBatchFlusher
+
+
+class ReadProgressFlusher(BackgroundBatchFlusher[int, datetime]):
+    """
+    Отложенная запись прогресса чтения чатов.
+
+    Для каждого участника чата (ключ - id `ChatMember`) в памяти процесса хранится
+    самая поздняя отметка `read_before`. Отметки всех участников записываются одним
+    запросом `UPDATE ... FROM (VALUES ...)` на пачку, вместе с пересчетом `unread_count`
+    (см. `ChatMemberManager.update_read_progress`). Один флашер обслуживает все
+    соединения процесса, поэтому фоновых задач на каждое соединение нет.
+    """
+
+    def merge(self, old_value: datetime, new_value: datetime) -> datetime:
+        return max(old_value, new_value)
+
+    def flush_batch(self, batch: dict[int, datetime]) -> None:
+        ChatMember.objects.update_read_progress(batch)
+
+
+read_progress_flusher = ReadProgressFlusher(
+    name='chat-read-progress-flusher',
+    interval=settings.CHAT_READ_PROGRESS_FLUSH_INTERVAL,
+    max_pending=settings.CHAT_READ_PROGRESS_MAX_PENDING,
+)
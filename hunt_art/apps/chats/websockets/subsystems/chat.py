@@ -1,15 +1,24 @@
-import json
 from typing import Any
+from functools import partial
 from enum import Enum, auto
 
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from asgiref.sync import sync_to_async
 
+from apps.websockets.groups import get_user_group_name
 from apps.websockets.subsystems import BaseWebSocketSubsystem
 from apps.users.models import User
 
-from .message_reader import ChatMessageReader
+from .typing import typing_indicators
+
+from ...services.chat_members import chat_members_cache
+from ...services.chat_messages import (
+    chat_messages_flusher,
+    get_chat_message_ids,
+    get_chat_message_created_at,
+)
+from ...services.read_progress import read_progress_flusher
 
 from ...models import (
     Chat,
@@ -31,35 +40,23 @@ class ChatWebSocketSubsystem(BaseWebSocketSubsystem):
 
     def __init__(self, consumer: AsyncJsonWebsocketConsumer) -> None:
         super().__init__(consumer)
-        self._message_reader = ChatMessageReader(consumer)
+        # Пары (пользователь, собеседник), у которых есть персональный чат. Проверяются
+        # один раз на соединение, а не на каждое нажатие клавиши. Пользователь в ключе,
+        # т.к. соединение может переаутентифицироваться под другим пользователем.
+        self._typing_pairs: set[tuple[int, int]] = set()
 
     @classmethod
     def get_subsystem_name(cls) -> str:
         return "chat"
     
-    @classmethod
-    def needs_to_reconnect_when_user_auth(cls) -> bool:
-        return True
-    
     async def handle_connect(self) -> None:
-        if self.consumer.user is None:
-            return
-        
-        async for chat in self.consumer.user.chats.all():
-            await self.consumer.channel_layer.group_add(
-                f'chat_pk_{chat.pk}',
-                self.consumer.channel_name,
-            )
+        # Отдельно вступать в группы чатов не нужно: соединение уже состоит
+        # в группе своего пользователя (см. `ConnectionRegistry`), а сообщения
+        # чатов рассылаются по группам участников (см. `_send_message_to_channel_layer`).
+        pass
     
     async def handle_disconnect(self) -> None:
-        if self.consumer.user is None:
-            return
-        
-        async for chat in self.consumer.user.chats.all():
-            await self.consumer.channel_layer.group_discard(
-                f'chat_pk_{chat.pk}',
-                self.consumer.channel_name,
-            )
+        pass
 
     async def receive_message(self, content: dict[str, Any]) -> None:
         """
@@ -107,7 +104,7 @@ class ChatWebSocketSubsystem(BaseWebSocketSubsystem):
         data: dict[str, Any] = content["data"]
 
         # TODO: При ненахождении юзера кидать норм ошибку.
-        other_user: User = await User.objects.select_related('websocket_data').filter(pk=data['user_id']).aget()
+        other_user: User = await User.objects.filter(pk=data['user_id']).aget()
 
         # TODO: Перенести это в какой-то обработчик, который требует аутентифицированного
         # юзера перед выполнением метода.
@@ -119,89 +116,146 @@ class ChatWebSocketSubsystem(BaseWebSocketSubsystem):
         if other_user.pk == current_user.pk:
             raise ValueError("Нельзя отправить сообщение самому себе.")
 
-        personal_chat = await self._get_personal_chat_by_users(current_user, other_user)
-        if personal_chat is None:
-            personal_chat = await self._create_new_personal_chat(current_user, other_user)
+        personal_chat, created = await Chat.objects.aget_or_create_personal_chat(current_user.pk, other_user.pk)
+        if created:
+            await chat_members_cache.aset(personal_chat.pk, (current_user.pk, other_user.pk))
 
-        new_message = await ChatMessage.objects.acreate(
-            chat=personal_chat,
-            user=current_user,
-            text=content['data']['message_text'],
-        )
+        new_message = await self._save_message(personal_chat, current_user, content['data']['message_text'])
 
         # TODO: Сделать проверку разрешений:
         #   1. Пользователь не в бане у другого пользователя.
         
         await self._send_message_to_channel_layer(personal_chat, current_user, new_message)
+        # Сообщение отправлено, значит пользователь больше не печатает. Получатель
+        # поймет это по самому сообщению, отдельно уведомлять не нужно.
+        await typing_indicators.stop((current_user.pk, other_user.pk))
 
     async def _send_to_chat(self, content: dict[str, Any]) -> None:
         # TODO: Реализовать в будущем.
         raise NotImplementedError()
 
-    # NOTE: Синхронная функция используется только из-за intersection. Его нет в асинхронном варианте.
-    @sync_to_async
-    def _get_personal_chat_by_users(self, current_user: User, other_user: User) -> User | None:
-        # У двух пользователей может быть только один ОБЩИЙ персональный чат.
-        # Т.е. персональный чат с одним и тем же ID у двух пользователей.
-        personal_chats: list[Chat] = list(
-            current_user.chats
-            .filter(chat_type=Chat.ChatType.PERSONAL)
-            .intersection(
-                other_user.chats
-                .filter(chat_type=Chat.ChatType.PERSONAL)
-            )
-        )
-        if len(personal_chats) == 0:
-            return
-        elif len(personal_chats) > 1:
-            # TODO: Сделать норм исключение.
-            raise ValueError("У двух пользователей может быть только один общий персональный чат.")
-        
-        return personal_chats[0]
-    
-    async def _create_new_personal_chat(self, current_user: User, other_user: User) -> Chat:
-        new_chat = await Chat.objects.acreate(chat_type=Chat.ChatType.PERSONAL)
-        await ChatMember.objects.abulk_create([
-            ChatMember(chat=new_chat, user=current_user),
-            ChatMember(chat=new_chat, user=other_user),
-        ])
-
-        # Добавим каналы двух юзеров в одну группу (в этот чат). Нужно, чтобы текущее (первое)
-        # сообщение пришло обоим пользователям.
-        await self.consumer.channel_layer.group_add(
-            f'chat_pk_{new_chat.pk}',
-            current_user.websocket_data.channel_name,
-        )
-        await self.consumer.channel_layer.group_add(
-            f'chat_pk_{new_chat.pk}',
-            other_user.websocket_data.channel_name,
+    async def _save_message(self, chat: Chat, current_user: User, text: str) -> ChatMessage:
+        if not settings.CHAT_MESSAGES_WRITE_BEHIND:
+            new_message = await ChatMessage.objects.acreate(chat=chat, user=current_user, text=text)
+            await self._update_chat_after_message(new_message)
+            return new_message
+
+        # При отложенной записи id и время создания выдаются сразу, сообщение
+        # рассылается до записи в БД. Если буфер заполнен, пишем синхронно.
+        # Денормализованные данные чата в этом случае обновляет сам флашер.
+        # Время берется из id, чтобы курсор истории чата можно было восстановить
+        # по одному id, пока сообщения еще нет в БД (см. `ChatMessagePagination`).
+        message_id = get_chat_message_ids().generate()
+        new_message = ChatMessage(
+            id=message_id,
+            chat=chat,
+            user=current_user,
+            text=text,
+            created_at=get_chat_message_created_at(message_id),
         )
+        if not chat_messages_flusher.offer(new_message):
+            await new_message.asave(force_insert=True)
+            await self._update_chat_after_message(new_message)
+
+        return new_message
+
+    async def _update_chat_after_message(self, message: ChatMessage) -> None:
+        """Обновление счетчиков непрочитанных и последнего сообщения чата"""
+        await ChatMember.objects.aincrement_unread_counts([message])
+        await Chat.objects.aupdate_last_messages([message])
+
+    async def _get_message(self, message_id: int) -> ChatMessage:
+        # Сообщение может быть еще не записано в БД, если включена отложенная запись.
+        message = chat_messages_flusher.get(message_id)
+        if message is not None:
+            return message
+
+        return await ChatMessage.objects.aget(pk=message_id)
 
-        return new_chat
-    
     async def _send_message_to_channel_layer(self, chat: Chat, current_user: User, message: ChatMessage) -> None:
-        await self.consumer.channel_layer.group_send(
-            group=f"chat_pk_{chat.pk}",
-            message={
-                "type": "websocket.receive",
-                "text": json.dumps({
-                    "subsystem": self.get_subsystem_name(),
-                    "action": "new_message",
-                    "data": {
-                        "message_id": message.pk,
-                        "message_text": message.text,
-                        "created_at": message.created_at.isoformat(),
-                        "author": {
-                            "id": current_user.pk,
-                            "username": current_user.username,
-                        },
+        member_pks = await chat_members_cache.aget(chat.pk)
+        await self.consumer.group_send_content(
+            [get_user_group_name(member_pk) for member_pk in member_pks],
+            {
+                "subsystem": self.get_subsystem_name(),
+                "action": "new_message",
+                "data": {
+                    "message_id": message.pk,
+                    "message_text": message.text,
+                    "created_at": message.created_at.isoformat(),
+                    "author": {
+                        "id": current_user.pk,
+                        "username": current_user.username,
                     },
-                }),
+                },
             },
         )
 
-    async def new_message(self, content: dict[str, Any]) -> None:
-        await self.consumer.send_json(content)
+    async def typing(self, content: dict[str, Any]) -> None:
+        """
+        Пользователь набирает сообщение.
+
+        ```
+        content = {
+            'subsystem': 'chat',
+            'action': 'typing',
+            'data': {
+                'user_id': 3,
+                # `false`, если пользователь стер текст и перестал печатать.
+                'is_typing': true,
+            },
+        }
+        ```
+
+        Собеседник получит сообщение с тем же действием, где `user_id` - id печатающего.
+        Рассылка троттлится (см. `TypingIndicators`). Уведомлять можно только собеседника
+        по существующему персональному чату, иначе придет сообщение с действием `error`.
+        """
+        data: dict[str, Any] = content["data"]
+        if data.get("chat_id") is not None:
+            await self.send_error("group_chats_not_supported", "Групповые чаты пока не поддерживаются.")
+            return
+
+        if not await self.ensure_authenticated():
+            return
+
+        current_user: User = self.consumer.user
+        other_user_pk = int(data["user_id"])
+        if not await self._is_typing_peer(current_user.pk, other_user_pk):
+            await self.send_error("chat_not_found", "Персональный чат с этим пользователем не найден.")
+            return
+
+        key = (current_user.pk, other_user_pk)
+
+        async def send_typing(is_typing: bool) -> None:
+            await self.consumer.group_send_content(
+                [get_user_group_name(other_user_pk)],
+                {
+                    "subsystem": self.get_subsystem_name(),
+                    "action": "typing",
+                    "data": {
+                        "user_id": current_user.pk,
+                        "is_typing": is_typing,
+                    },
+                },
+            )
+
+        send_started = partial(send_typing, True)
+        send_stopped = partial(send_typing, False)
+        if data.get("is_typing", True):
+            await typing_indicators.start(key, send_started, send_stopped)
+        else:
+            await typing_indicators.stop(key, send_stopped)
+
+    async def _is_typing_peer(self, user_pk: int, other_user_pk: int) -> bool:
+        if (user_pk, other_user_pk) in self._typing_pairs:
+            return True
+
+        if not await Chat.objects.filter_personal_chat(user_pk, other_user_pk).aexists():
+            return False
+
+        self._typing_pairs.add((user_pk, other_user_pk))
+        return True
 
     async def read_message(self, content: dict[str, Any]) -> None:
         """
@@ -222,7 +276,7 @@ class ChatWebSocketSubsystem(BaseWebSocketSubsystem):
         ```
         """
         # TODO: При ненахождении юзера кидать норм ошибку.
-        other_user: User = await User.objects.select_related('websocket_data').filter(pk=content["data"]['user_id']).aget()
+        other_user: User = await User.objects.filter(pk=content["data"]['user_id']).aget()
 
         # TODO: Перенести это в какой-то обработчик, который требует аутентифицированного
         # юзера перед выполнением метода.
@@ -234,11 +288,19 @@ class ChatWebSocketSubsystem(BaseWebSocketSubsystem):
         if other_user.pk == current_user.pk:
             raise ValueError("Нельзя отправить сообщение самому себе.")
         
-        chat = await self._get_personal_chat_by_users(current_user, other_user)
-
         message_id = content["data"]["message_id"]
-        message = await ChatMessage.objects.aget(pk=message_id)
+        message = await self._get_message(message_id)
 
-        current_chat_member = await ChatMember.objects.filter(chat=chat, user=current_user).afirst()
+        # Участник ищется по чату самого сообщения: это заодно проверка, что пользователь в нем состоит.
+        current_chat_member_pk = await (
+            ChatMember.objects
+            .filter(chat_id=message.chat_id, user=current_user)
+            .values_list("pk", flat=True)
+            .afirst()
+        )
+        # TODO: Сделать норм ошибку.
+        if current_chat_member_pk is None:
+            raise ValueError("Пользователь не состоит в чате сообщения.")
 
-        self._message_reader.read_message(message, current_chat_member)
+        # Отметка запишется в БД общим флашером процесса (см. `ReadProgressFlusher`).
+        read_progress_flusher.add(current_chat_member_pk, message.created_at)
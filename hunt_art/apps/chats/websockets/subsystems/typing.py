@@ -0,0 +1,86 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+from django.conf import settings
+
+
+class TypingIndicators:
+    """
+    Индикаторы набора текста с серверным троттлингом.
+
+    Клиент может слать `typing` хоть на каждое нажатие клавиши, но рассылка
+    "печатает" уходит не чаще раза в `broadcast_interval` секунд на пару
+    (пользователь, чат). Если от пользователя `timeout` секунд не было новых
+    `typing`, автоматически рассылается "перестал печатать".
+
+    Состояние живет в памяти процесса, БД не используется.
+    """
+
+    def __init__(self, broadcast_interval: float, timeout: float) -> None:
+        self.broadcast_interval = broadcast_interval
+        self.timeout = timeout
+        self._last_broadcast_at: dict[Hashable, float] = {}
+        self._stop_timers: dict[Hashable, asyncio.TimerHandle] = {}
+        # Запущенные по таймеру рассылки "перестал печатать". Цикл событий хранит
+        # только слабые ссылки на задачи, поэтому держим их до завершения.
+        self._stop_tasks: set[asyncio.Task] = set()
+
+    async def start(
+        self,
+        key: Hashable,
+        send_started: Callable[[], Awaitable],
+        send_stopped: Callable[[], Awaitable],
+    ) -> None:
+        """Пользователь печатает. `key` - пара (пользователь, чат)."""
+
+        now = time.monotonic()
+        last_broadcast_at = self._last_broadcast_at.get(key)
+        should_broadcast = last_broadcast_at is None or now - last_broadcast_at >= self.broadcast_interval
+
+        self._schedule_stop(key, send_stopped)
+        if should_broadcast:
+            self._last_broadcast_at[key] = now
+            await send_started()
+
+    async def stop(self, key: Hashable, send_stopped: Callable[[], Awaitable] | None = None) -> None:
+        """
+        Пользователь перестал печатать.
+
+        Без `send_stopped` состояние просто сбрасывается (например, когда пришло
+        само сообщение и отдельное уведомление не нужно).
+        """
+        timer = self._stop_timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        was_typing = self._last_broadcast_at.pop(key, None) is not None
+        if was_typing and send_stopped is not None:
+            await send_stopped()
+
+    def _schedule_stop(self, key: Hashable, send_stopped: Callable[[], Awaitable]) -> None:
+        timer = self._stop_timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        loop = asyncio.get_running_loop()
+        self._stop_timers[key] = loop.call_later(
+            self.timeout,
+            lambda: self._run_stop(loop, key, send_stopped),
+        )
+
+    def _run_stop(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        key: Hashable,
+        send_stopped: Callable[[], Awaitable],
+    ) -> None:
+        task = loop.create_task(self.stop(key, send_stopped))
+        self._stop_tasks.add(task)
+        task.add_done_callback(self._stop_tasks.discard)
+
+
+typing_indicators = TypingIndicators(
+    broadcast_interval=settings.CHAT_TYPING_BROADCAST_INTERVAL,
+    timeout=settings.CHAT_TYPING_TIMEOUT,
+)
@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.monitoring"
+    verbose_name = _("Мониторинг")
+
+    def ready(self) -> None:
+        from django.db.backends.signals import connection_created
+
+        from .slow_queries import install_slow_query_recorder
+
+        # Обертка над выполнением запросов живет на уровне соединения,
+        # поэтому устанавливаем ее на каждое новое соединение с БД.
+        connection_created.connect(install_slow_query_recorder)
@@ -0,0 +1,38 @@
+from typing import Any, Callable
+
+from django.http import HttpRequest, HttpResponse
+
+from .slow_queries import query_source
+
+
+class SlowQueryMiddleware:
+    """
+    Запоминает вью и экшен текущего запроса, чтобы медленные SQL-запросы
+    можно было связать с местом, откуда они пришли.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        query_source.set(None)
+        return self.get_response(request)
+
+    def process_view(
+        self,
+        request: HttpRequest,
+        view_func: Callable,
+        view_args: tuple[Any, ...],
+        view_kwargs: dict[str, Any],
+    ) -> None:
+        query_source.set(self._get_view_name(request, view_func))
+
+    def _get_view_name(self, request: HttpRequest, view_func: Callable) -> str:
+        # DRF сохраняет класс вью в `cls`, а вьюсеты - еще и маппинг методов на экшены.
+        view_class = getattr(view_func, "cls", None)
+        if view_class is None:
+            return f"{view_func.__module__}.{view_func.__qualname__}"
+
+        actions: dict[str, str] = getattr(view_func, "actions", None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f"{view_class.__name__}.{action}"
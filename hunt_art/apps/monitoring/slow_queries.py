@@ -0,0 +1,173 @@
+import time
+import random
+import logging
+import threading
+import contextvars
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+# Источник запросов: вью и экшен HTTP-запроса либо подсистема и экшен веб-сокета.
+# Выставляется в `SlowQueryMiddleware` и в веб-сокетном консьюмере.
+query_source: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "query_source",
+    default=None,
+)
+
+# Флаг, что в текущем контексте выполняется EXPLAIN. Нужен, чтобы EXPLAIN
+# сам не попадал в обертку и не анализировался повторно.
+_is_explaining: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "is_explaining",
+    default=False,
+)
+
+
+@dataclass(frozen=True)
+class SlowQuery:
+    """Данные о медленном запросе"""
+
+    sql: str
+    duration_ms: float
+    source: str | None
+    database: str
+    captured_at: Any = field(default_factory=timezone.now)
+    plan: str | None = None
+
+
+class SlowQueryRecorder:
+    """
+    Обертка над выполнением SQL-запросов (см. `connection.execute_wrapper`).
+
+    Логирует запросы, которые выполнялись дольше порога, вместе с источником запроса.
+    Для выборочной доли медленных SELECT-запросов снимает план через
+    `EXPLAIN (ANALYZE, BUFFERS)` и складывает его в кольцевой буфер,
+    который можно посмотреть через API администратора.
+
+    NOTE: Буфер живет в памяти процесса. При нескольких воркерах у каждого свой буфер.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float,
+        explain_sample_rate: float,
+        buffer_size: int,
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self._entries: deque[SlowQuery] = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    def __call__(
+        self,
+        execute: Callable,
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any],
+    ) -> Any:
+        if _is_explaining.get():
+            return execute(sql, params, many, context)
+
+        started_at = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - started_at) * 1000
+
+        if duration_ms >= self.threshold_ms:
+            self._handle_slow_query(sql, params, many, duration_ms, context["connection"])
+
+        return result
+
+    def get_entries(self) -> list[SlowQuery]:
+        """Получение записей буфера от новых к старым"""
+
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _handle_slow_query(
+        self,
+        sql: str,
+        params: Any,
+        many: bool,
+        duration_ms: float,
+        connection: BaseDatabaseWrapper,
+    ) -> None:
+        source = query_source.get()
+        logger.warning(
+            f'Медленный запрос ({duration_ms:.1f} мс, источник: {source or "неизвестен"}): {sql}'
+        )
+
+        if many or not self._should_explain(sql, connection):
+            return
+
+        plan = self._explain(sql, params, connection)
+        if plan is None:
+            return
+
+        with self._lock:
+            self._entries.append(
+                SlowQuery(
+                    sql=sql,
+                    duration_ms=duration_ms,
+                    source=source,
+                    database=connection.alias,
+                    plan=plan,
+                )
+            )
+
+    def _should_explain(self, sql: str, connection: BaseDatabaseWrapper) -> bool:
+        if connection.vendor != "postgresql":
+            return False
+
+        # ANALYZE реально выполняет запрос, поэтому анализируем только чтение
+        # и только без блокировок строк.
+        normalized_sql = sql.lstrip().upper()
+        if not normalized_sql.startswith("SELECT") or "FOR UPDATE" in normalized_sql:
+            return False
+
+        return random.random() < self.explain_sample_rate
+
+    def _explain(self, sql: str, params: Any, connection: BaseDatabaseWrapper) -> str | None:
+        token = _is_explaining.set(True)
+        try:
+            # Точка сохранения нужна, чтобы ошибка EXPLAIN не сломала внешнюю транзакцию.
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+                    return "\n".join(row[0] for row in cursor.fetchall())
+        except Exception:
+            logger.exception(f"Не удалось получить план медленного запроса: {sql}")
+            return None
+        finally:
+            _is_explaining.reset(token)
+
+
+slow_query_recorder = SlowQueryRecorder(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    buffer_size=settings.SLOW_QUERY_BUFFER_SIZE,
+)
+
+
+def install_slow_query_recorder(sender: Any, connection: BaseDatabaseWrapper, **kwargs) -> None:
+    """Установка обертки на новое соединение с БД (обработчик `connection_created`)"""
+
+    if not settings.SLOW_QUERY_LOG_ENABLED:
+        return
+
+    # При переподключении используется тот же объект соединения,
+    # поэтому повторно обертку не добавляем.
+    if slow_query_recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_recorder)
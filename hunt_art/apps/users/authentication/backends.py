@@ -0,0 +1,32 @@
+from functools import partial
+
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.authentication import (
+    AuthUser,
+    JWTAuthentication,
+)
+
+from apps.users.services.authenticated_users import authenticated_users_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Аутентификация по JWT с кэшированием пользователя.
+
+    Пользователь загружается из БД при первом запросе с токеном, дальше он берется
+    из `AuthenticatedUsersCache`.
+    """
+
+    def get_user(self, validated_token: Token) -> AuthUser:
+        return authenticated_users_cache.get_or_load(
+            validated_token,
+            partial(super().get_user, validated_token),
+        )
+
+
+class CachedJWTAuthenticationScheme(SimpleJWTScheme):
+    """Описание схемы аутентификации для документации API"""
+
+    target_class = CachedJWTAuthentication
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from apps.users.models import User
+from apps.users.services.follow_suggestions import FollowSuggestionsBuilder
+
+
+class Command(BaseCommand):
+    help = (
+        'Расчет рекомендаций подписок. По умолчанию пересчитываются только пользователи, '
+        'у которых изменились подписки.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать рекомендации всех активных пользователей.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество пользователей, рассчитываемых за один запрос.',
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=settings.FOLLOW_SUGGESTIONS_TOP_K,
+            help='Количество рекомендаций для одного пользователя.',
+        )
+
+    def handle(self, *args, all: bool, batch_size: int, top_k: int, **options) -> None:
+        builder = FollowSuggestionsBuilder(top_k=top_k)
+        # Изменения подписок и лайков превращаются во флаги устаревших рекомендаций
+        # подписчиков здесь, а не в запросах пользователей.
+        builder.apply_input_changes()
+        users = User.objects.filter(is_active=True)
+        if not all:
+            users = users.filter(follow_suggestions_stale=True)
+
+        # Идем пачками по возрастанию id, чтобы не держать долгих транзакций.
+        last_pk = 0
+        users_count = 0
+        suggestions_count = 0
+        while user_pks := list(
+            users
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        ):
+            users_count += len(user_pks)
+            suggestions_count += builder.build_for(user_pks)
+            last_pk = user_pks[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Рекомендации пересчитаны для {users_count} пользователей, '
+                f'сохранено рекомендаций: {suggestions_count}.'
+            )
+        )
@@ -0,0 +1,41 @@
+import csv
+from typing import Iterator
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Массовое создание пользователей из CSV-файла с колонками `username` и `password`. '
+        'Пользователи с уже занятыми юзернеймами пропускаются.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            'path',
+            type=str,
+            help='Путь к CSV-файлу с заголовком.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество пользователей, создаваемых в одной транзакции.',
+        )
+
+    def handle(self, *args, path: str, batch_size: int, **options) -> None:
+        with open(path, newline='', encoding='utf-8') as file:
+            created_users = User.objects.bulk_create_users(
+                self._read_users_data(file),
+                batch_size=batch_size,
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Создано пользователей: {len(created_users)}.')
+        )
+
+    def _read_users_data(self, file) -> Iterator[tuple[str, str | None]]:
+        for row in csv.DictReader(file):
+            yield row['username'], row.get('password') or None
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models import Max
+
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка денормализованных счетчиков `followers_count` и `subscriptions_count` '
+        'с реальными данными о подписках.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Количество пользователей, пересчитываемых за один запрос.',
+        )
+
+    def handle(self, *args, batch_size: int, **options) -> None:
+        # Пересчитываем диапазонами id, чтобы не держать долгую блокировку на всей таблице.
+        max_pk = User.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+        updated_count = 0
+        for start_pk in range(0, max_pk + 1, batch_size):
+            updated_count += User.objects.recalculate_subscriptions_counts(
+                User.objects.filter(pk__gte=start_pk, pk__lt=start_pk + batch_size),
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Счетчики подписок пересчитаны для {updated_count} пользователей.')
+        )
@@ -1,26 +1,54 @@
+import enum
+from itertools import islice
 from typing import (
     Any,
+    Iterable,
     Optional,
 )
 
 from django.apps import apps
-from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (
+    router,
+    connections,
+    transaction,
+    IntegrityError,
+)
+from django.db.models import (
+    Count,
+    OuterRef,
+    Subquery,
+    QuerySet,
+)
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import UserManager as DefaultUserManager
 
 from apps.websockets.models import WebsocketData
 from apps.users import models
+from apps.users.services.password_hashing import password_hashing_pool
+
+
+class SubscriptionChangeResult(enum.Enum):
+    """Результат подписки или отписки"""
+
+    # Подписка создана или удалена.
+    CHANGED = 'changed'
+    # Подписка уже была (при подписке) или ее не было (при отписке).
+    UNCHANGED = 'unchanged'
+    USER_NOT_FOUND = 'user_not_found'
 
 
 class UserManager(DefaultUserManager):
     """Класс для управления пользователями"""
 
-    def _create_user(
+    def _build_user(
         self,
         username: str,
-        password: str,
+        password: str | None,
         **extra_fields,
     ) -> 'models.User':
-        """Создание пользователя с юзернеймом и паролем"""
+        """Создание объекта пользователя с юзернеймом и паролем без сохранения в БД"""
 
         if not username:
             raise ValueError("The given username must be set")
@@ -33,16 +61,42 @@ class UserManager(DefaultUserManager):
         )
         username = GlobalUserModel.normalize_username(username)
         user = self.model(username=username, **extra_fields)
-        user.password = make_password(password)
-        user.save(using=self._db)
+        user.set_password(password)
+
+        return user
+
+    def _create_user(
+        self,
+        username: str,
+        password: str | None,
+        with_profile: bool = True,
+        **extra_fields,
+    ) -> 'models.User':
+        """
+        Создание пользователя с юзернеймом и паролем вместе со связанными записями.
+
+        Все записи создаются в одной транзакции, чтобы не оставалось пользователей
+        без профиля или данных о веб-сокете.
+        """
+
+        # Хэширование пароля долгое, поэтому выполняется до начала транзакции.
+        user = self._build_user(username, password, **extra_fields)
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)
+            self._create_related_rows_for([user], with_profile)
 
         return user
-    
-    def _create_profile_for(self, user: 'models.User') -> 'models.UserProfile':
-        return models.UserProfile.objects.create(user=user)
-    
-    def _create_websocket_data_for(self, user: 'models.User') -> 'models.UserProfile':
-        return WebsocketData.objects.create(user=user)
+
+    def _create_related_rows_for(self, users: list['models.User'], with_profile: bool) -> None:
+        """Создание связанных записей пользователей: по одному запросу на каждую таблицу"""
+
+        WebsocketData.objects.using(self._db).bulk_create(
+            [WebsocketData(user=user) for user in users],
+        )
+        if with_profile:
+            models.UserProfile.objects.using(self._db).bulk_create(
+                [models.UserProfile(user=user) for user in users],
+            )
 
     def create_user(
         self,
@@ -54,12 +108,81 @@ class UserManager(DefaultUserManager):
         extra_fields.setdefault("is_staff", False)
         extra_fields.setdefault("is_superuser", False)
 
-        user = self._create_user(username, password, **extra_fields)
-        self._create_websocket_data_for(user)
-        if with_profile:
-            self._create_profile_for(user)
+        return self._create_user(username, password, with_profile, **extra_fields)
 
-        return user
+    def bulk_create_users(
+        self,
+        users_data: Iterable[tuple[str, str | None]],
+        batch_size: int = 1000,
+        with_profile: bool = True,
+    ) -> list['models.User']:
+        """
+        Массовое создание пользователей по парам (юзернейм, пароль), например, при импорте.
+
+        Пароли каждой пачки хэшируются параллельно в пуле процессов. Пользователи и связанные
+        с ними записи создаются через `bulk_create` пачками по `batch_size`, каждая пачка -
+        в своей транзакции. Пользователи с уже занятыми юзернеймами пропускаются, в том числе
+        с юзернеймами, которые заняли, пока хэшировались пароли.
+
+        Возвращает созданных пользователей.
+        """
+
+        GlobalUserModel = apps.get_model(
+            self.model._meta.app_label, self.model._meta.object_name
+        )
+        users_data = iter(users_data)
+        created_users: list['models.User'] = []
+        while batch := list(islice(users_data, batch_size)):
+            passwords_by_username: dict[str, str | None] = {}
+            for username, password in batch:
+                if not username:
+                    raise ValueError("The given username must be set")
+                passwords_by_username.setdefault(GlobalUserModel.normalize_username(username), password)
+
+            existing_usernames = self._get_existing_usernames(passwords_by_username.keys())
+            usernames = [
+                username
+                for username in passwords_by_username
+                if username not in existing_usernames
+            ]
+            if len(usernames) == 0:
+                continue
+
+            encoded_passwords = password_hashing_pool.make_passwords(
+                [passwords_by_username[username] for username in usernames],
+            )
+            users = [
+                self.model(username=username, password=encoded_password)
+                for username, encoded_password in zip(usernames, encoded_passwords)
+            ]
+            while len(users) > 0:
+                try:
+                    with transaction.atomic(using=self._db):
+                        # На PostgreSQL `bulk_create` возвращает id созданных записей,
+                        # поэтому связанные записи можно создать сразу.
+                        users = self.using(self._db).bulk_create(users)
+                        self._create_related_rows_for(users, with_profile)
+                    break
+                except IntegrityError:
+                    # Юзернейм могли занять, пока хэшировались пароли. Убираем занятые
+                    # и повторяем пачку, пароли заново не хэшируются.
+                    taken_usernames = self._get_existing_usernames(user.username for user in users)
+                    if len(taken_usernames) == 0:
+                        raise
+                    users = [user for user in users if user.username not in taken_usernames]
+                    for user in users:
+                        user.pk = None
+
+            created_users.extend(users)
+
+        return created_users
+
+    def _get_existing_usernames(self, usernames: Iterable[str]) -> set[str]:
+        return set(
+            self.using(self._db)
+            .filter(username__in=list(usernames))
+            .values_list('username', flat=True)
+        )
 
     def create_superuser(
         self,
@@ -87,21 +210,233 @@ class UserManager(DefaultUserManager):
     def exists(self, pk: Any) -> bool:
         return models.User.objects.filter(pk=pk).exists()
     
-    def add_subscription(self, subscriber_pk: Any, other_user_pk: Any) -> None:
-        model_name = models.User._meta.model_name
-        new_subscription_data = {
-            f'from_{model_name}_id': subscriber_pk,
-            f'to_{model_name}_id': other_user_pk,
+    def add_subscription(self, subscriber_pk: Any, other_user_pk: Any) -> 'SubscriptionChangeResult':
+        """Подписка одного пользователя на другого одним запросом"""
+
+        created_by_pk = self.add_subscriptions(subscriber_pk, [other_user_pk])
+        if other_user_pk not in created_by_pk:
+            return SubscriptionChangeResult.USER_NOT_FOUND
+        if not created_by_pk[other_user_pk]:
+            return SubscriptionChangeResult.UNCHANGED
+        return SubscriptionChangeResult.CHANGED
+
+    def add_subscriptions(self, subscriber_pk: Any, other_user_pks: Iterable[Any]) -> dict[Any, bool]:
+        """
+        Подписка пользователя сразу на несколько пользователей.
+
+        Подписки, счетчики и флаг устаревших рекомендаций подписчика обновляются
+        одним запросом. Уже существующие подписки
+        пропускаются (`ON CONFLICT DO NOTHING`), поэтому повторный вызов безопасен.
+
+        Возвращает для каждого существующего пользователя из `other_user_pks` признак того,
+        что подписка была создана этим вызовом. Несуществующих пользователей в ответе нет.
+        """
+
+        other_user_pks = list(set(other_user_pks) - {subscriber_pk})
+        if len(other_user_pks) == 0:
+            return {}
+
+        names = self._get_subscriptions_sql_names()
+        with connections[self._get_write_db()].cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH targets AS (
+                    SELECT {names['user_pk']} AS id FROM {names['user_table']}
+                    WHERE {names['user_pk']} = ANY(%(other_user_pks)s)
+                ),
+                inserted AS (
+                    INSERT INTO {names['subscriptions_table']} ({names['from_user']}, {names['to_user']})
+                    SELECT %(subscriber_pk)s, id FROM targets
+                    ON CONFLICT ({names['from_user']}, {names['to_user']}) DO NOTHING
+                    RETURNING {names['to_user']} AS id
+                ),
+                updated_followers AS (
+                    UPDATE {names['user_table']}
+                    SET {names['followers_count']} = {names['followers_count']} + 1
+                    WHERE {names['user_pk']} IN (SELECT id FROM inserted)
+                ),
+                updated_subscriber AS (
+                    UPDATE {names['user_table']}
+                    SET
+                        {names['subscriptions_count']} = {names['subscriptions_count']} + (SELECT COUNT(*) FROM inserted),
+                        {names['follow_suggestions_stale']} = TRUE
+                    WHERE {names['user_pk']} = %(subscriber_pk)s AND EXISTS (SELECT 1 FROM inserted)
+                ),
+                -- Подписки подписчика - это друзья друзей для его собственных подписчиков.
+                -- Их рекомендации помечаются устаревшими уже в фоновом пересчете.
+                logged_change AS (
+                    INSERT INTO {names['input_changes_table']} ({names['input_change_user']})
+                    SELECT %(subscriber_pk)s WHERE EXISTS (SELECT 1 FROM inserted)
+                )
+                SELECT targets.id, inserted.id IS NOT NULL
+                FROM targets LEFT JOIN inserted ON inserted.id = targets.id
+                """,
+                {'subscriber_pk': subscriber_pk, 'other_user_pks': other_user_pks},
+            )
+            created_by_pk = dict(cursor.fetchall())
+
+        if any(created_by_pk.values()):
+            self._invalidate_subscriptions_pks_cache_on_commit(subscriber_pk)
+
+        return created_by_pk
+
+    def remove_subscription(self, subscriber_pk: Any, other_user_pk: Any) -> 'SubscriptionChangeResult':
+        """
+        Отписка одного пользователя от другого.
+
+        Подписка и счетчики обновляются одним запросом. Если подписки не было, ничего не меняется.
+        Если хотя бы одного из пользователей не существует, вернется `USER_NOT_FOUND`.
+        """
+
+        names = self._get_subscriptions_sql_names()
+        with connections[self._get_write_db()].cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH deleted AS (
+                    DELETE FROM {names['subscriptions_table']}
+                    WHERE {names['from_user']} = %(subscriber_pk)s AND {names['to_user']} = %(other_user_pk)s
+                    RETURNING 1
+                ),
+                updated_users AS (
+                    UPDATE {names['user_table']}
+                    SET
+                        {names['followers_count']} = GREATEST(
+                            {names['followers_count']}
+                            - CASE WHEN {names['user_pk']} = %(other_user_pk)s THEN 1 ELSE 0 END,
+                            0
+                        ),
+                        {names['subscriptions_count']} = GREATEST(
+                            {names['subscriptions_count']}
+                            - CASE WHEN {names['user_pk']} = %(subscriber_pk)s THEN 1 ELSE 0 END,
+                            0
+                        ),
+                        {names['follow_suggestions_stale']} = (
+                            {names['follow_suggestions_stale']} OR {names['user_pk']} = %(subscriber_pk)s
+                        )
+                    WHERE {names['user_pk']} IN (%(subscriber_pk)s, %(other_user_pk)s)
+                        AND EXISTS (SELECT 1 FROM deleted)
+                ),
+                -- Подписки подписчика - это друзья друзей для его собственных подписчиков.
+                -- Их рекомендации помечаются устаревшими уже в фоновом пересчете.
+                logged_change AS (
+                    INSERT INTO {names['input_changes_table']} ({names['input_change_user']})
+                    SELECT %(subscriber_pk)s WHERE EXISTS (SELECT 1 FROM deleted)
+                )
+                SELECT
+                    (
+                        SELECT COUNT(*) FROM {names['user_table']}
+                        WHERE {names['user_pk']} IN (%(subscriber_pk)s, %(other_user_pk)s)
+                    ) = 2,
+                    EXISTS (SELECT 1 FROM deleted)
+                """,
+                {'subscriber_pk': subscriber_pk, 'other_user_pk': other_user_pk},
+            )
+            users_exist, is_deleted = cursor.fetchone()
+
+        if not users_exist:
+            return SubscriptionChangeResult.USER_NOT_FOUND
+        if not is_deleted:
+            return SubscriptionChangeResult.UNCHANGED
+
+        self._invalidate_subscriptions_pks_cache_on_commit(subscriber_pk)
+        return SubscriptionChangeResult.CHANGED
+
+    def log_follow_suggestions_input_change(self, user_pk: Any) -> None:
+        """
+        Запись о том, что изменилось то, из чего строятся рекомендации подписчиков пользователя,
+        например его лайки.
+
+        Сами подписчики помечаются устаревшими в фоновом пересчете
+        (см. `FollowSuggestionsBuilder.apply_input_changes`), а не в запросе.
+        """
+
+        models.FollowSuggestionsInputChange.objects.create(user_id=user_pk)
+
+    def _get_write_db(self) -> str:
+        return self._db or router.db_for_write(self.model)
+
+    def _get_subscriptions_sql_names(self) -> dict[str, str]:
+        """Экранированные имена таблиц и колонок для запросов подписок"""
+
+        quote_name = connections[self._get_write_db()].ops.quote_name
+        user_meta = models.User._meta
+        subscription_meta = models.UserSubscription._meta
+        input_change_meta = models.FollowSuggestionsInputChange._meta
+
+        return {
+            'user_table': quote_name(user_meta.db_table),
+            'user_pk': quote_name(user_meta.pk.column),
+            'followers_count': quote_name(user_meta.get_field('followers_count').column),
+            'subscriptions_count': quote_name(user_meta.get_field('subscriptions_count').column),
+            'follow_suggestions_stale': quote_name(user_meta.get_field('follow_suggestions_stale').column),
+            'subscriptions_table': quote_name(subscription_meta.db_table),
+            'from_user': quote_name(subscription_meta.get_field('from_user').column),
+            'to_user': quote_name(subscription_meta.get_field('to_user').column),
+            'input_changes_table': quote_name(input_change_meta.db_table),
+            'input_change_user': quote_name(input_change_meta.get_field('user').column),
         }
-        models.User.subscriptions.through.objects.create(**new_subscription_data)
 
-    def remove_subscription(self, subscriber_pk: Any, other_user_pk: Any) -> None:        
+    def get_subscriptions_pks(self, user_pk: Any) -> frozenset[Any]:
+        """
+        Получение id всех пользователей, на которых подписан пользователь.
+
+        Множество кэшируется на `USER_SUBSCRIPTIONS_CACHE_TIMEOUT` секунд
+        и сбрасывается при подписке и отписке.
+        """
+
+        cache_key = self._get_subscriptions_pks_cache_key(user_pk)
+        subscriptions_pks: frozenset[Any] | None = cache.get(cache_key)
+        if subscriptions_pks is None:
+            model_name = models.User._meta.model_name
+            subscriptions_pks = frozenset(
+                models.User.subscriptions.through.objects
+                .filter(**{f'from_{model_name}_id': user_pk})
+                .values_list(f'to_{model_name}_id', flat=True)
+            )
+            cache.set(cache_key, subscriptions_pks, settings.USER_SUBSCRIPTIONS_CACHE_TIMEOUT)
+
+        return subscriptions_pks
+
+    def _get_subscriptions_pks_cache_key(self, user_pk: Any) -> str:
+        return f'users:subscriptions_pks:{user_pk}'
+
+    def _invalidate_subscriptions_pks_cache_on_commit(self, user_pk: Any) -> None:
+        cache_key = self._get_subscriptions_pks_cache_key(user_pk)
+        transaction.on_commit(lambda: cache.delete(cache_key), using=self._db)
+
+    def recalculate_subscriptions_counts(self, queryset: QuerySet['models.User'] | None = None) -> int:
+        """
+        Пересчет денормализованных счетчиков подписок и подписчиков
+        по реальным данным из таблицы подписок.
+
+        Возвращает количество обновленных пользователей.
+        """
+
+        if queryset is None:
+            queryset = models.User.objects.all()
+
         model_name = models.User._meta.model_name
-        subscription_info = {
-            f'from_{model_name}_id': subscriber_pk,
-            f'to_{model_name}_id': other_user_pk,
-        }
-        models.User.subscriptions.through.objects.filter(**subscription_info).delete()
+        subscriber_field_name = f'from_{model_name}_id'
+        subscription_field_name = f'to_{model_name}_id'
+        subscriptions_model = models.User.subscriptions.through
+
+        def count_subquery(field_name: str) -> Coalesce:
+            return Coalesce(
+                Subquery(
+                    subscriptions_model.objects
+                    .filter(**{field_name: OuterRef('pk')})
+                    .order_by()
+                    .values(field_name)
+                    .annotate(count=Count('*'))
+                    .values('count')
+                ),
+                0,
+            )
+
+        return queryset.update(
+            followers_count=count_subquery(subscription_field_name),
+            subscriptions_count=count_subquery(subscriber_field_name),
+        )
 
     def user_is_follower_other_user(self, user_pk: Any, other_user_pk: Any) -> bool:
         model_name = models.User._meta.model_name
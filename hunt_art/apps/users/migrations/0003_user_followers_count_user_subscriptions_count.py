@@ -0,0 +1,49 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_subscriptions_counts(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscription = User.subscriptions.through
+
+    def count_subquery(field_name):
+        return Coalesce(
+            Subquery(
+                Subscription.objects
+                .filter(**{field_name: OuterRef('pk')})
+                .order_by()
+                .values(field_name)
+                .annotate(count=Count('*'))
+                .values('count')
+            ),
+            0,
+        )
+
+    User.objects.update(
+        followers_count=count_subquery('to_user_id'),
+        subscriptions_count=count_subquery('from_user_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_userprofile_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscriptions_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество подписок'),
+        ),
+        migrations.RunPython(fill_subscriptions_counts, migrations.RunPython.noop),
+    ]
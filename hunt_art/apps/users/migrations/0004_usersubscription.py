@@ -0,0 +1,48 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_followers_count_user_subscriptions_count'),
+    ]
+
+    operations = [
+        # Явная промежуточная модель использует уже существующую таблицу автоматической
+        # модели с теми же колонками, уникальностью и индексами, поэтому меняется только состояние.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='UserSubscription',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('from_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_subscriptions', related_query_name='outgoing_subscription', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+                        ('to_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_subscriptions', related_query_name='incoming_subscription', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь, на которого подписались')),
+                    ],
+                    options={
+                        'verbose_name': 'Подписка',
+                        'verbose_name_plural': 'Подписки',
+                        'db_table': 'users_user_subscriptions',
+                        'unique_together': {('from_user', 'to_user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='subscriptions',
+                    field=models.ManyToManyField(blank=True, related_name='followers', related_query_name='subscription', through='users.UserSubscription', through_fields=('from_user', 'to_user'), to=settings.AUTH_USER_MODEL, verbose_name='Подписки'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['to_user', '-id'], name='users_subscription_to_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['from_user', '-id'], name='users_subscription_from_id_idx'),
+        ),
+    ]
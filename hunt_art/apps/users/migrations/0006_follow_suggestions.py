@@ -0,0 +1,56 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0005_user_username_trgm_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Вес рекомендации')),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время расчета')),
+            ],
+            options={
+                'verbose_name': 'Рекомендация подписки',
+                'verbose_name_plural': 'Рекомендации подписок',
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='follow_suggestions_stale',
+            field=models.BooleanField(default=True, verbose_name='Рекомендации устарели'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('follow_suggestions_stale', True)), fields=['id'], name='users_user_sugg_stale_idx'),
+        ),
+        migrations.AddField(
+            model_name='followsuggestion',
+            name='suggested_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Рекомендуемый пользователь'),
+        ),
+        migrations.AddField(
+            model_name='followsuggestion',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follow_suggestions', related_query_name='follow_suggestion', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='followsuggestion',
+            index=models.Index(fields=['user', '-score'], name='users_suggestion_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='followsuggestion',
+            constraint=models.UniqueConstraint(fields=('user', 'suggested_user'), name='unique_follow_suggestion'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-19 15:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_follow_suggestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowSuggestionsInputChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение для рекомендаций подписок',
+                'verbose_name_plural': 'Изменения для рекомендаций подписок',
+            },
+        ),
+    ]
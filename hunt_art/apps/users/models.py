@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres import indexes as pg_indexes
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -7,6 +8,8 @@ from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 
 import apps.users.managers as managers
+from apps.users.services.password_hashing import password_hashing_pool
+from apps.users.services.authenticated_users import authenticated_users_cache
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -42,11 +45,32 @@ class User(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(_('date joined'), default=timezone.now)
     subscriptions = models.ManyToManyField(
         to='User',
+        through='UserSubscription',
+        through_fields=('from_user', 'to_user'),
         blank=True,
         related_name='followers',
         related_query_name='subscription',
         verbose_name=_('Подписки'),
     )
+    # Денормализованные счетчики подписок. Обновляются в `UserManager.add_subscription`
+    # и `UserManager.remove_subscription`. Сверить с реальными данными можно командой
+    # `python manage.py recalculate_subscriptions_counts`.
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Количество подписчиков'),
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Количество подписок'),
+    )
+    # Рекомендации пользователя нужно пересчитать: изменились его подписки,
+    # подписки или лайки его подписок. Выставляется при подписке и отписке,
+    # для подписчиков - при разборе `FollowSuggestionsInputChange`. Сбрасывается командой
+    # `python manage.py compute_follow_suggestions`.
+    follow_suggestions_stale = models.BooleanField(
+        default=True,
+        verbose_name=_('Рекомендации устарели'),
+    )
 
     objects: managers.UserManager = managers.UserManager()
 
@@ -57,6 +81,152 @@ class User(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        indexes = (
+            # Нечеткий поиск по имени. Поиск по началу имени обслуживает индекс
+            # `varchar_pattern_ops`, который Django создает для уникального `username`.
+            pg_indexes.GinIndex(
+                fields=('username', ),
+                opclasses=('gin_trgm_ops', ),
+                name='users_user_username_trgm_idx',
+            ),
+            # Пользователей с устаревшими рекомендациями немного, поэтому индекс частичный.
+            models.Index(
+                fields=('id', ),
+                condition=models.Q(follow_suggestions_stale=True),
+                name='users_user_sugg_stale_idx',
+            ),
+        )
+
+    def save(self, *args, **kwargs) -> None:
+        # Сменившийся пароль или деактивация должны сразу действовать для уже выданных токенов.
+        # `_password` выставляется в `set_password` и сбрасывается при сохранении.
+        must_invalidate_auth = self.pk is not None and (self._password is not None or not self.is_active)
+        super().save(*args, **kwargs)
+        if must_invalidate_auth:
+            transaction.on_commit(lambda: authenticated_users_cache.invalidate(self.pk))
+
+    def set_password(self, raw_password: str | None) -> None:
+        # Хэширование выполняется в пуле процессов, чтобы не занимать поток воркера.
+        self.password = password_hashing_pool.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password: str | None) -> bool:
+        is_correct, must_update = password_hashing_pool.verify_password(raw_password, self.password)
+        # Хэш, посчитанный устаревшим алгоритмом или с меньшим числом итераций, пересчитываем.
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return is_correct
+
+
+class UserSubscription(models.Model):
+    """
+    m2m модель подписок пользователей друг на друга.
+
+    Таблица осталась той же, что Django создал для автоматической промежуточной модели.
+    Явная модель нужна ради индексов для постраничного вывода подписчиков и подписок.
+    Порядок подписок определяется по `id`: он монотонно растет вместе со временем подписки.
+    """
+
+    from_user = models.ForeignKey(
+        to='User',
+        on_delete=models.CASCADE,
+        related_name='outgoing_subscriptions',
+        related_query_name='outgoing_subscription',
+        verbose_name=_('Подписчик'),
+    )
+    to_user = models.ForeignKey(
+        to='User',
+        on_delete=models.CASCADE,
+        related_name='incoming_subscriptions',
+        related_query_name='incoming_subscription',
+        verbose_name=_('Пользователь, на которого подписались'),
+    )
+
+    class Meta:
+        db_table = 'users_user_subscriptions'
+        verbose_name = _('Подписка')
+        verbose_name_plural = _('Подписки')
+        unique_together = (
+            ('from_user', 'to_user'),
+        )
+        indexes = (
+            models.Index(fields=('to_user', '-id'), name='users_subscription_to_id_idx'),
+            models.Index(fields=('from_user', '-id'), name='users_subscription_from_id_idx'),
+        )
+
+    def __str__(self) -> str:
+        return f'Subscription User#{self.from_user_id} -> User#{self.to_user_id}'
+
+
+class FollowSuggestion(models.Model):
+    """
+    Рекомендация подписаться на пользователя.
+
+    Рекомендации заранее рассчитываются по графу подписок и лайкам
+    (см. `FollowSuggestionsBuilder`) и только читаются при запросах.
+    """
+
+    user = models.ForeignKey(
+        to='User',
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        related_query_name='follow_suggestion',
+        verbose_name=_('Пользователь'),
+    )
+    suggested_user = models.ForeignKey(
+        to='User',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Рекомендуемый пользователь'),
+    )
+    score = models.FloatField(verbose_name=_('Вес рекомендации'))
+    computed_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_('Время расчета'),
+    )
+
+    class Meta:
+        verbose_name = _('Рекомендация подписки')
+        verbose_name_plural = _('Рекомендации подписок')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'suggested_user'),
+                name='unique_follow_suggestion',
+            ),
+        )
+        indexes = (
+            models.Index(fields=('user', '-score'), name='users_suggestion_score_idx'),
+        )
+
+    def __str__(self) -> str:
+        return f'Suggestion User#{self.suggested_user_id} for User#{self.user_id}'
+
+
+class FollowSuggestionsInputChange(models.Model):
+    """
+    Изменение входных данных рекомендаций подписчиков пользователя: его подписок или лайков.
+
+    В запросах записи только добавляются. Фоновый пересчет помечает устаревшими
+    рекомендации подписчиков этих пользователей и удаляет обработанные записи
+    (см. `FollowSuggestionsBuilder.apply_input_changes`).
+    """
+
+    user = models.ForeignKey(
+        to='User',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Пользователь'),
+    )
+
+    class Meta:
+        verbose_name = _('Изменение для рекомендаций подписок')
+        verbose_name_plural = _('Изменения для рекомендаций подписок')
+
+    def __str__(self) -> str:
+        return f'Suggestions input change of User#{self.user_id}'
 
 
 class UserProfile(models.Model):
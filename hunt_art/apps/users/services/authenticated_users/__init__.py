@@ -0,0 +1,4 @@
+from .service import (
+    AuthenticatedUsersCache,
+    authenticated_users_cache,
+)
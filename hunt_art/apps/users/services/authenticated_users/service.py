@@ -0,0 +1,114 @@
+import copy
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Awaitable,
+)
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework_simplejwt.settings import api_settings
+
+from utils.local_cache import LocalTTLCache
+
+if TYPE_CHECKING:
+    from rest_framework_simplejwt.tokens import Token
+
+    from apps.users.models import User
+
+
+class AuthenticatedUsersCache:
+    """
+    Кэш пользователей, прошедших аутентификацию по JWT.
+
+    Пользователь хранится в памяти процесса по паре (id токена, id пользователя)
+    не дольше `timeout` секунд и не дольше, чем живет сам токен.
+
+    Чтобы смена пароля или деактивация действовали сразу во всех процессах, у пользователя
+    есть версия в общем кэше Django. Она меняется в `invalidate`, и записи, сохраненные
+    с другой версией, считаются недействительными.
+
+    NOTE: Каждый запрос получает свою копию пользователя, поэтому изменения объекта
+    в одном запросе не видны в других.
+    """
+
+    def __init__(self, max_size: int, timeout: float) -> None:
+        self.timeout = timeout
+        self._users: LocalTTLCache[tuple[Any, Any], tuple['User', Any]] = LocalTTLCache(max_size)
+
+    def get_or_load(self, validated_token: 'Token', load_user: Callable[[], 'User']) -> 'User':
+        key = self._get_key(validated_token)
+        if key is None:
+            return load_user()
+
+        version = cache.get(self._get_version_cache_key(key[1]))
+        user = self._get_local(key, version)
+        if user is None:
+            user = load_user()
+            self._set_local(key, user, version, validated_token)
+
+        return copy.copy(user)
+
+    async def aget_or_load(
+        self,
+        validated_token: 'Token',
+        load_user: Callable[[], Awaitable['User']],
+    ) -> 'User':
+        key = self._get_key(validated_token)
+        if key is None:
+            return await load_user()
+
+        version = await cache.aget(self._get_version_cache_key(key[1]))
+        user = self._get_local(key, version)
+        if user is None:
+            user = await load_user()
+            self._set_local(key, user, version, validated_token)
+
+        return copy.copy(user)
+
+    def invalidate(self, user_pk: Any) -> None:
+        """Сброс пользователя во всех процессах через смену его версии"""
+
+        cache.set(self._get_version_cache_key(user_pk), time.time_ns(), self.timeout)
+
+    def _get_local(self, key: tuple[Any, Any], version: Any) -> 'User | None':
+        item = self._users.get(key)
+        if item is None:
+            return None
+
+        user, cached_version = item
+        if cached_version != version:
+            self._users.delete(key)
+            return None
+
+        return user
+
+    def _set_local(
+        self,
+        key: tuple[Any, Any],
+        user: 'User',
+        version: Any,
+        validated_token: 'Token',
+    ) -> None:
+        # Пользователя не держим дольше, чем живет токен.
+        timeout = min(self.timeout, validated_token.get('exp', 0) - time.time())
+        self._users.set(key, (user, version), timeout)
+
+    def _get_key(self, validated_token: 'Token') -> tuple[Any, Any] | None:
+        token_id = validated_token.get(api_settings.JTI_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if token_id is None or user_id is None:
+            return None
+        return token_id, user_id
+
+    def _get_version_cache_key(self, user_pk: Any) -> str:
+        return f'users:auth_version:{user_pk}'
+
+
+authenticated_users_cache = AuthenticatedUsersCache(
+    max_size=settings.JWT_USER_CACHE_SIZE,
+    timeout=settings.JWT_USER_CACHE_TIMEOUT,
+)
@@ -0,0 +1,182 @@
+from typing import Any, Iterable
+
+from django.db import (
+    connection,
+    transaction,
+)
+
+from apps.arts.models import (
+    Art,
+    ArtLike,
+)
+from apps.users.models import (
+    User,
+    UserSubscription,
+    FollowSuggestion,
+    FollowSuggestionsInputChange,
+)
+
+
+class FollowSuggestionsBuilder:
+    """
+    Расчет рекомендаций подписок.
+
+    Кандидаты для пользователя берутся из двух источников:
+    - подписки его подписок (друзья друзей);
+    - авторы артов, которые лайкали его подписки.
+
+    Вес кандидата - взвешенное количество путей до него. Для каждого пользователя
+    сохраняются `top_k` кандидатов с наибольшим весом, кроме тех, на кого он уже подписан.
+    Рекомендации пачки пользователей считаются одним запросом и заменяют старые.
+    """
+
+    subscription_path_weight = 1.0
+    like_path_weight = 0.5
+
+    def __init__(self, top_k: int) -> None:
+        self.top_k = top_k
+
+    def build_for(self, user_pks: Iterable[Any]) -> int:
+        """
+        Пересчет рекомендаций для пользователей.
+
+        Возвращает количество сохраненных рекомендаций.
+        """
+
+        user_pks = list(user_pks)
+        if len(user_pks) == 0:
+            return 0
+
+        with transaction.atomic():
+            # Флаг сбрасываем до расчета: подписка, сделанная во время расчета,
+            # дождется конца транзакции и снова выставит флаг.
+            User.objects.filter(pk__in=user_pks).update(follow_suggestions_stale=False)
+            FollowSuggestion.objects.filter(user_id__in=user_pks).delete()
+            with connection.cursor() as cursor:
+                cursor.execute(self._get_insert_sql(), self._get_insert_params(user_pks))
+                created_count = cursor.rowcount
+
+        return created_count
+
+    def apply_input_changes(self) -> int:
+        """
+        Пометка устаревшими рекомендаций подписчиков пользователей,
+        у которых изменились подписки или лайки (см. `FollowSuggestionsInputChange`).
+
+        Вызывается перед пересчетом. Обработанные записи удаляются, а записи, добавленные
+        во время вызова, дождутся следующего запуска. Возвращает количество помеченных пользователей.
+        """
+
+        names = self._get_sql_names()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH changes AS (
+                    DELETE FROM {names['input_changes']}
+                    RETURNING {names['input_change_user']} AS user_id
+                )
+                UPDATE {names['users']}
+                SET {names['user_suggestions_stale']} = TRUE
+                WHERE {names['user_pk']} IN (
+                    SELECT s.{names['from_user']} FROM {names['subscriptions']} AS s
+                    WHERE s.{names['to_user']} IN (SELECT user_id FROM changes)
+                )
+                    AND NOT {names['user_suggestions_stale']}
+                """
+            )
+            return cursor.rowcount
+
+    def _get_insert_params(self, user_pks: list[Any]) -> dict[str, Any]:
+        return {
+            'user_pks': user_pks,
+            'subscription_path_weight': self.subscription_path_weight,
+            'like_path_weight': self.like_path_weight,
+            'top_k': self.top_k,
+        }
+
+    def _get_insert_sql(self) -> str:
+        names = self._get_sql_names()
+
+        return f"""
+            WITH candidates AS (
+                SELECT
+                    s1.{names['from_user']} AS user_id,
+                    s2.{names['to_user']} AS suggested_user_id,
+                    %(subscription_path_weight)s AS score
+                FROM {names['subscriptions']} AS s1
+                JOIN {names['subscriptions']} AS s2 ON s2.{names['from_user']} = s1.{names['to_user']}
+                WHERE s1.{names['from_user']} = ANY(%(user_pks)s)
+
+                UNION ALL
+
+                SELECT
+                    s1.{names['from_user']} AS user_id,
+                    a.{names['art_author']} AS suggested_user_id,
+                    %(like_path_weight)s AS score
+                FROM {names['subscriptions']} AS s1
+                JOIN {names['likes']} AS l ON l.{names['like_user']} = s1.{names['to_user']}
+                JOIN {names['arts']} AS a ON a.{names['art_pk']} = l.{names['like_art']}
+                WHERE s1.{names['from_user']} = ANY(%(user_pks)s)
+            ),
+            scored AS (
+                SELECT
+                    c.user_id,
+                    c.suggested_user_id,
+                    SUM(c.score) AS score,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY c.user_id
+                        ORDER BY SUM(c.score) DESC, c.suggested_user_id
+                    ) AS position
+                FROM candidates AS c
+                JOIN {names['users']} AS u ON u.{names['user_pk']} = c.suggested_user_id AND u.{names['user_is_active']}
+                WHERE c.suggested_user_id <> c.user_id
+                    AND NOT EXISTS (
+                        SELECT 1 FROM {names['subscriptions']} AS s
+                        WHERE s.{names['from_user']} = c.user_id AND s.{names['to_user']} = c.suggested_user_id
+                    )
+                GROUP BY c.user_id, c.suggested_user_id
+            )
+            INSERT INTO {names['suggestions']} (
+                {names['suggestion_user']},
+                {names['suggestion_suggested_user']},
+                {names['suggestion_score']},
+                {names['suggestion_computed_at']}
+            )
+            SELECT user_id, suggested_user_id, score, NOW()
+            FROM scored
+            WHERE position <= %(top_k)s
+        """
+
+    def _get_sql_names(self) -> dict[str, str]:
+        """Экранированные имена таблиц и колонок для запроса рекомендаций"""
+
+        quote_name = connection.ops.quote_name
+        user_meta = User._meta
+        subscription_meta = UserSubscription._meta
+        suggestion_meta = FollowSuggestion._meta
+        like_meta = ArtLike._meta
+        art_meta = Art._meta
+        input_change_meta = FollowSuggestionsInputChange._meta
+
+        return {
+            'users': quote_name(user_meta.db_table),
+            'user_pk': quote_name(user_meta.pk.column),
+            'user_is_active': quote_name(user_meta.get_field('is_active').column),
+            'user_suggestions_stale': quote_name(user_meta.get_field('follow_suggestions_stale').column),
+            'subscriptions': quote_name(subscription_meta.db_table),
+            'from_user': quote_name(subscription_meta.get_field('from_user').column),
+            'to_user': quote_name(subscription_meta.get_field('to_user').column),
+            'suggestions': quote_name(suggestion_meta.db_table),
+            'suggestion_user': quote_name(suggestion_meta.get_field('user').column),
+            'suggestion_suggested_user': quote_name(suggestion_meta.get_field('suggested_user').column),
+            'suggestion_score': quote_name(suggestion_meta.get_field('score').column),
+            'suggestion_computed_at': quote_name(suggestion_meta.get_field('computed_at').column),
+            'likes': quote_name(like_meta.db_table),
+            'like_user': quote_name(like_meta.get_field('user').column),
+            'like_art': quote_name(like_meta.get_field('art').column),
+            'arts': quote_name(art_meta.db_table),
+            'art_pk': quote_name(art_meta.pk.column),
+            'art_author': quote_name(art_meta.get_field('author').column),
+            'input_changes': quote_name(input_change_meta.db_table),
+            'input_change_user': quote_name(input_change_meta.get_field('user').column),
+        }
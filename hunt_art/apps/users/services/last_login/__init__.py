@@ -0,0 +1,4 @@
+from .service import (
+    LastLoginFlusher,
+    last_login_flusher,
+)
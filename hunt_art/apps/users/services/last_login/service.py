@@ -0,0 +1,45 @@
+from typing import Any
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+
+from apps.users.models import User
+from utils.batch_flusher import BackgroundBatchFlusher
+
+
+class LastLoginFlusher(BackgroundBatchFlusher[Any, datetime]):
+    """
+    Отложенное обновление времени последнего входа пользователей.
+
+    Время входа копится в памяти процесса и записывается одним запросом
+    `UPDATE ... FROM (VALUES ...)` на всю пачку.
+    """
+
+    def merge(self, old_value: datetime, new_value: datetime) -> datetime:
+        return max(old_value, new_value)
+
+    def flush_batch(self, batch: dict[Any, datetime]) -> None:
+        table = connection.ops.quote_name(User._meta.db_table)
+        pk_column = connection.ops.quote_name(User._meta.pk.column)
+        last_login_column = connection.ops.quote_name(User._meta.get_field('last_login').column)
+        values_sql = ', '.join(['(%s, %s::timestamptz)'] * len(batch))
+        params = [value for item in batch.items() for value in item]
+
+        with connection.cursor() as cursor:
+            # Более раннее время не должно перетирать более позднее,
+            # записанное другим процессом.
+            cursor.execute(
+                f'UPDATE {table} AS u SET {last_login_column} = v.last_login '
+                f'FROM (VALUES {values_sql}) AS v(id, last_login) '
+                f'WHERE u.{pk_column} = v.id '
+                f'AND (u.{last_login_column} IS NULL OR u.{last_login_column} < v.last_login)',
+                params,
+            )
+
+
+last_login_flusher = LastLoginFlusher(
+    name='last-login-flusher',
+    interval=settings.LAST_LOGIN_FLUSH_INTERVAL,
+    max_pending=settings.LAST_LOGIN_MAX_PENDING,
+)
@@ -0,0 +1,5 @@
+from .service import (
+    PasswordHashingPool,
+    PasswordHashingPoolStats,
+    password_hashing_pool,
+)
@@ -0,0 +1,7 @@
+class PasswordHashingPoolOverloaded(Exception):
+    def __init__(self, max_pending: int) -> None:
+        self.message = (
+            f'Очередь на хэширование паролей переполнена ({max_pending} задач). '
+            f'Повторите попытку позже.'
+        )
+        super().__init__(self.message)
@@ -0,0 +1,170 @@
+import logging
+import threading
+import multiprocessing
+from dataclasses import dataclass
+from typing import Any, Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from .exceptions import PasswordHashingPoolOverloaded
+
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker() -> None:
+    """Инициализация процесса пула: хэшерам нужны настройки Django"""
+
+    django.setup()
+
+
+def _make_password(password: str) -> str:
+    return hashers.make_password(password)
+
+
+def _verify_password(password: str, encoded: str) -> tuple[bool, bool]:
+    return hashers.verify_password(password, encoded)
+
+
+@dataclass(frozen=True)
+class PasswordHashingPoolStats:
+    """Состояние пула хэширования паролей"""
+
+    workers: int
+    # Количество задач, которые выполняются или ждут свободного процесса.
+    pending: int
+    max_pending: int
+    # Количество задач, отклоненных из-за переполнения очереди с момента запуска.
+    rejected: int
+
+
+class PasswordHashingPool:
+    """
+    Пул процессов для хэширования и проверки паролей.
+
+    PBKDF2 занимает десятки миллисекунд процессорного времени. Чтобы он не занимал
+    поток воркера (и не держал GIL), хэширование выполняется в отдельных процессах.
+
+    Очередь ограничена: если задач больше `max_pending`, новая задача ждет освобождения
+    места не дольше `queue_timeout` секунд, после чего выбрасывается
+    `PasswordHashingPoolOverloaded`.
+
+    Если `workers` равно 0, хэширование выполняется в текущем потоке.
+    Процессы пула запускаются при первом обращении.
+    """
+
+    def __init__(self, workers: int, max_pending: int, queue_timeout: float) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+
+    def make_password(self, password: str | None) -> str:
+        # Для неиспользуемого пароля хэширования нет, отдавать его в пул незачем.
+        if password is None:
+            return hashers.make_password(password)
+        return self._run(_make_password, password)
+
+    def make_passwords(self, passwords: list[str | None]) -> list[str]:
+        """
+        Хэширование пачки паролей, например, при массовом создании пользователей.
+
+        Пароли хэшируются параллельно всеми процессами пула. Ограничение очереди
+        здесь не применяется: метод предназначен для административных задач, а не для запросов.
+        """
+
+        if self.workers == 0:
+            return [hashers.make_password(password) for password in passwords]
+
+        usable_passwords = [password for password in passwords if password is not None]
+        encoded_passwords = iter(
+            self._get_executor().map(
+                _make_password,
+                usable_passwords,
+                chunksize=max(1, len(usable_passwords) // (self.workers * 4)),
+            )
+        )
+        return [
+            next(encoded_passwords) if password is not None else hashers.make_password(password)
+            for password in passwords
+        ]
+
+    def verify_password(self, password: str | None, encoded: str) -> tuple[bool, bool]:
+        """
+        Проверка пароля.
+
+        Возвращает признак совпадения пароля и признак того,
+        что хэш нужно пересчитать (сменился алгоритм или число итераций).
+        """
+
+        if password is None or not hashers.is_password_usable(encoded):
+            return False, False
+        return self._run(_verify_password, password, encoded)
+
+    def get_stats(self) -> PasswordHashingPoolStats:
+        with self._stats_lock:
+            return PasswordHashingPoolStats(
+                workers=self.workers,
+                pending=self._pending,
+                max_pending=self.max_pending,
+                rejected=self._rejected,
+            )
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, func: Callable, *args: Any) -> Any:
+        if self.workers == 0:
+            return func(*args)
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._stats_lock:
+                self._rejected += 1
+            logger.warning(
+                f'Очередь на хэширование паролей переполнена ({self.max_pending} задач).'
+            )
+            raise PasswordHashingPoolOverloaded(self.max_pending)
+
+        with self._stats_lock:
+            self._pending += 1
+        try:
+            return self._get_executor().submit(func, *args).result()
+        except BrokenProcessPool:
+            # Процесс пула аварийно завершился. Пересоздадим пул при следующем обращении.
+            self.shutdown()
+            raise
+        finally:
+            with self._stats_lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # `spawn` вместо `fork`: форк процесса с потоками и открытыми
+                # соединениями с БД небезопасен.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+
+password_hashing_pool = PasswordHashingPool(
+    workers=settings.PASSWORD_HASHING_WORKERS,
+    max_pending=settings.PASSWORD_HASHING_MAX_PENDING,
+    queue_timeout=settings.PASSWORD_HASHING_QUEUE_TIMEOUT,
+)
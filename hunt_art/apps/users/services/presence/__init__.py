@@ -0,0 +1,10 @@
+from .stores import (
+    BasePresenceStore,
+    InMemoryPresenceStore,
+    RedisPresenceStore,
+)
+from .service import (
+    PresenceTracker,
+    presence_tracker,
+)
+from .exceptions import PresenceSubscriptionsLimitExceeded
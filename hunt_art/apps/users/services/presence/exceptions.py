@@ -0,0 +1,4 @@
+class PresenceSubscriptionsLimitExceeded(Exception):
+    def __init__(self, max_subscriptions: int) -> None:
+        self.message = f'Можно подписаться на статус не больше чем {max_subscriptions} пользователей.'
+        super().__init__(self.message)
@@ -0,0 +1,181 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Iterable,
+)
+
+from django.conf import settings
+
+from .stores import (
+    BasePresenceStore,
+    InMemoryPresenceStore,
+    RedisPresenceStore,
+)
+from .exceptions import PresenceSubscriptionsLimitExceeded
+
+
+logger = logging.getLogger(__name__)
+
+
+PresenceNotifier = Callable[[set[int], set[int]], Awaitable[Any]]
+
+
+@dataclass
+class _Connection:
+    user_pk: int
+    subscriptions: set[int] = field(default_factory=set)
+    notify: PresenceNotifier | None = None
+    # Кто из подписок онлайн по последнему снимку или уведомлению этого соединения.
+    online_pks: set[int] = field(default_factory=set)
+
+
+class PresenceTracker:
+    """
+    Онлайн-статус пользователей по веб-сокетным соединениям процесса.
+
+    Процесс сам отправляет heartbeat'ы за всех пользователей, у которых есть открытые
+    соединения: одной пачкой раз в `heartbeat_interval` секунд. Новые соединения попадают
+    в ближайшую пачку, которая пишется раз в `tick_interval` секунд. Если процесс упал,
+    статус пользователей истечет сам через `ttl` хранилища.
+
+    Соединения могут подписаться на статус ограниченного набора пользователей.
+    Раз в тик статус всех подписок процесса читается из хранилища одним запросом,
+    и каждое соединение получает одно уведомление со всеми изменениями за тик
+    относительно последнего статуса, который оно получило.
+    """
+
+    def __init__(
+        self,
+        store: BasePresenceStore,
+        tick_interval: float,
+        heartbeat_interval: float,
+        max_subscriptions: int,
+    ) -> None:
+        self.store = store
+        self.tick_interval = tick_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.max_subscriptions = max_subscriptions
+        self._connections: dict[str, _Connection] = {}
+        # Пользователи, о подключении которых хранилище еще не знает.
+        self._pending_user_pks: set[int] = set()
+        self._last_heartbeat_at = 0.0
+        self._task: asyncio.Task | None = None
+
+    def connect(self, connection_key: str, user_pk: int) -> None:
+        self._connections[connection_key] = _Connection(user_pk=user_pk)
+        self._pending_user_pks.add(user_pk)
+        self._start_task_if_needed()
+
+    def disconnect(self, connection_key: str) -> None:
+        # Из хранилища пользователя не удаляем: у него могут быть соединения
+        # в других процессах. Статус истечет сам, если heartbeat'ов больше не будет.
+        self._connections.pop(connection_key, None)
+
+    async def subscribe(
+        self,
+        connection_key: str,
+        user_pks: Iterable[int],
+        notify: PresenceNotifier,
+    ) -> set[int]:
+        """
+        Подписка соединения на статус пользователей (заменяет прошлую подписку).
+
+        Возвращает тех из них, кто сейчас онлайн.
+        """
+        connection = self._connections[connection_key]
+        user_pks = set(user_pks)
+        if len(user_pks) > self.max_subscriptions:
+            raise PresenceSubscriptionsLimitExceeded(self.max_subscriptions)
+
+        online_pks = await self.store.get_online(user_pks, time.time())
+        connection.subscriptions = user_pks
+        connection.notify = notify
+        # Подписчик получил актуальный статус, дальше он будет получать изменения
+        # относительно него. Другие соединения этот снимок не затрагивает.
+        connection.online_pks = online_pks
+        return online_pks
+
+    def unsubscribe(self, connection_key: str) -> None:
+        connection = self._connections.get(connection_key)
+        if connection is not None:
+            connection.subscriptions = set()
+            connection.notify = None
+            connection.online_pks = set()
+
+    async def get_online(self, user_pks: Iterable[int]) -> set[int]:
+        return await self.store.get_online(user_pks, time.time())
+
+    def _start_task_if_needed(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            try:
+                await self._tick()
+            except Exception:
+                logger.exception("Не удалось обновить онлайн-статус пользователей.")
+
+    async def _tick(self) -> None:
+        now = time.time()
+        await self._send_heartbeats(now)
+        await self._notify_subscribers(now)
+
+    async def _send_heartbeats(self, now: float) -> None:
+        if now - self._last_heartbeat_at >= self.heartbeat_interval:
+            user_pks = {connection.user_pk for connection in self._connections.values()}
+            self._last_heartbeat_at = now
+        else:
+            user_pks = self._pending_user_pks
+        self._pending_user_pks = set()
+
+        if len(user_pks) > 0:
+            await self.store.touch_many(user_pks, now)
+
+    async def _notify_subscribers(self, now: float) -> None:
+        subscribed_connections = [
+            connection
+            for connection in self._connections.values()
+            if connection.notify is not None and len(connection.subscriptions) > 0
+        ]
+        subscribed_pks = set().union(*(connection.subscriptions for connection in subscribed_connections))
+        if len(subscribed_pks) == 0:
+            return
+
+        online_pks = await self.store.get_online(subscribed_pks, now)
+
+        # Изменения считаются для каждого соединения относительно того, что оно уже знает:
+        # соединения подписываются в разное время и видели разные снимки.
+        notifications = []
+        for connection in subscribed_connections:
+            connection_online_pks = online_pks & connection.subscriptions
+            became_online = connection_online_pks - connection.online_pks
+            became_offline = connection.online_pks - connection_online_pks
+            connection.online_pks = connection_online_pks
+            if became_online or became_offline:
+                notifications.append(connection.notify(became_online, became_offline))
+
+        # Упавшая отправка (например, в уже закрытый сокет) не мешает остальным.
+        await asyncio.gather(*notifications, return_exceptions=True)
+
+
+def _get_presence_store() -> BasePresenceStore:
+    if settings.CHANNEL_LAYER_REDIS_DSN is None:
+        return InMemoryPresenceStore(ttl=settings.PRESENCE_TTL)
+    return RedisPresenceStore(ttl=settings.PRESENCE_TTL, redis_dsn=settings.CHANNEL_LAYER_REDIS_DSN)
+
+
+presence_tracker = PresenceTracker(
+    store=_get_presence_store(),
+    tick_interval=settings.PRESENCE_TICK_INTERVAL,
+    heartbeat_interval=settings.PRESENCE_HEARTBEAT_INTERVAL,
+    max_subscriptions=settings.PRESENCE_MAX_SUBSCRIPTIONS,
+)
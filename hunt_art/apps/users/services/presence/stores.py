@@ -0,0 +1,98 @@
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Iterable
+
+from redis.asyncio import Redis
+
+
+class BasePresenceStore(ABC):
+    """
+    Хранилище времени последнего heartbeat'а пользователей.
+
+    Пользователь онлайн, если heartbeat был не раньше, чем `ttl` секунд назад.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+
+    @abstractmethod
+    async def touch_many(self, user_pks: Iterable[int], timestamp: float) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_last_seen_many(self, user_pks: Iterable[int]) -> dict[int, float]:
+        raise NotImplementedError()
+
+    async def get_online(self, user_pks: Iterable[int], timestamp: float) -> set[int]:
+        last_seen_by_pk = await self.get_last_seen_many(user_pks)
+        return {
+            user_pk
+            for user_pk, last_seen in last_seen_by_pk.items()
+            if last_seen >= timestamp - self.ttl
+        }
+
+
+class InMemoryPresenceStore(BasePresenceStore):
+    """Хранилище в памяти процесса. Для разработки и тестов без Redis."""
+
+    def __init__(self, ttl: float) -> None:
+        super().__init__(ttl)
+        self._last_seen: dict[int, float] = {}
+
+    async def touch_many(self, user_pks: Iterable[int], timestamp: float) -> None:
+        self._last_seen.update(dict.fromkeys(user_pks, timestamp))
+        # Чистим устаревшие записи, чтобы словарь не рос бесконечно.
+        expired_before = timestamp - self.ttl
+        for user_pk in [pk for pk, last_seen in self._last_seen.items() if last_seen < expired_before]:
+            del self._last_seen[user_pk]
+
+    async def get_last_seen_many(self, user_pks: Iterable[int]) -> dict[int, float]:
+        return {
+            user_pk: self._last_seen[user_pk]
+            for user_pk in user_pks
+            if user_pk in self._last_seen
+        }
+
+
+class RedisPresenceStore(BasePresenceStore):
+    """
+    Хранилище в Redis слоя каналов.
+
+    Время последнего heartbeat'а хранится в одном ZSET (id пользователя -> время),
+    поэтому пачка heartbeat'ов - это несколько `ZADD` в одном пайплайне,
+    а проверка статуса пачки пользователей - один `ZMSCORE`.
+    """
+
+    key = "presence:last_seen"
+    batch_size = 1000
+
+    def __init__(self, ttl: float, redis_dsn: str) -> None:
+        super().__init__(ttl)
+        self._redis_dsn = redis_dsn
+        self._redis: Redis | None = None
+
+    async def touch_many(self, user_pks: Iterable[int], timestamp: float) -> None:
+        user_pks = iter(user_pks)
+        pipeline = self._get_redis().pipeline(transaction=False)
+        while batch := list(islice(user_pks, self.batch_size)):
+            pipeline.zadd(self.key, dict.fromkeys(batch, timestamp))
+        pipeline.zremrangebyscore(self.key, "-inf", timestamp - self.ttl)
+        await pipeline.execute()
+
+    async def get_last_seen_many(self, user_pks: Iterable[int]) -> dict[int, float]:
+        user_pks = list(user_pks)
+        if len(user_pks) == 0:
+            return {}
+
+        scores = await self._get_redis().zmscore(self.key, user_pks)
+        return {
+            user_pk: score
+            for user_pk, score in zip(user_pks, scores)
+            if score is not None
+        }
+
+    def _get_redis(self) -> Redis:
+        # Клиент создается лениво, уже внутри цикла событий ASGI-сервера.
+        if self._redis is None:
+            self._redis = Redis.from_url(self._redis_dsn)
+        return self._redis
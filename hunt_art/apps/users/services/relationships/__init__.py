@@ -0,0 +1,4 @@
+from .service import (
+    UserRelationship,
+    UserRelationshipsResolver,
+)
@@ -0,0 +1,52 @@
+from typing import Any, Iterable
+from dataclasses import dataclass
+
+from apps.users.models import (
+    User,
+    UserSubscription,
+)
+
+
+@dataclass(frozen=True)
+class UserRelationship:
+    """Отношения другого пользователя к текущему"""
+
+    # Другой пользователь подписан на текущего.
+    is_follower: bool = False
+    # Текущий пользователь подписан на другого.
+    is_subscription: bool = False
+
+
+class UserRelationshipsResolver:
+    """
+    Определение отношений между текущим пользователем и набором других пользователей.
+
+    Подписки текущего пользователя берутся из кэша (см. `UserManager.get_subscriptions_pks`),
+    а подписчики среди переданных пользователей выбираются одним запросом.
+    """
+
+    def __init__(self, current_user: User) -> None:
+        self.__current_user = current_user
+
+    def resolve(self, user_pks: Iterable[Any]) -> dict[Any, UserRelationship]:
+        user_pks = set(user_pks)
+        other_user_pks = user_pks - {self.__current_user.pk}
+        if len(other_user_pks) == 0:
+            return {pk: UserRelationship() for pk in user_pks}
+
+        subscriptions_pks = User.objects.get_subscriptions_pks(self.__current_user.pk)
+        followers_pks = set(
+            UserSubscription.objects
+            .filter(to_user_id=self.__current_user.pk, from_user_id__in=other_user_pks)
+            .values_list('from_user_id', flat=True)
+        )
+
+        return {
+            pk: UserRelationship(
+                is_follower=pk in followers_pks,
+                is_subscription=pk in subscriptions_pks,
+            )
+            if pk in other_user_pks
+            else UserRelationship()
+            for pk in user_pks
+        }
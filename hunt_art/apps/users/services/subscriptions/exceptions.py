@@ -1,19 +1,25 @@
-from apps.users.models import User
+from typing import Any
+
+
+class UserDoesNotExist(Exception):
+    def __init__(self, user_pk: Any) -> None:
+        self.message = f'Пользователя с id={user_pk} не существует.'
+        super().__init__(self.message)
 
 
 class UserIsAlreadyFollower(Exception):
-    def __init__(self, current_user: User, other_user: User) -> None:
+    def __init__(self, user_pk: Any, other_user_pk: Any) -> None:
         self.message = (
-            f'Пользователь {current_user} уже является подписчиком '
-            f'пользователя {other_user}.'
+            f'Пользователь с id={user_pk} уже является подписчиком '
+            f'пользователя с id={other_user_pk}.'
         )
         super().__init__(self.message)
 
 
 class UserIsNotFollower(Exception):
-    def __init__(self, current_user: User, other_user: User) -> None:
+    def __init__(self, user_pk: Any, other_user_pk: Any) -> None:
         self.message = (
-            f'Пользователь {current_user} не является подписчиком '
-            f'пользователя {other_user}.'
+            f'Пользователь с id={user_pk} не является подписчиком '
+            f'пользователя с id={other_user_pk}.'
         )
         super().__init__(self.message)
@@ -1,44 +1,69 @@
+from typing import Any, Iterable
+
 from apps.users.models import User
+from apps.users.managers import SubscriptionChangeResult
 
 from . import exceptions
 
 
 class UserSubscriptionsService:
+    """
+    Подписки текущего пользователя.
+
+    Каждое действие выполняется одним запросом к БД, который сам проверяет
+    существование пользователя и подписки, поэтому отдельных проверок перед ним нет.
+    """
+
     def __init__(self, current_user: User) -> None:
         self.__current_user = current_user
 
-    def subscribe_to_user(self, other_user: User) -> None:
-        if User.objects.user_is_follower_other_user(
-            user_pk=self.__current_user.pk,
-            other_user_pk=other_user.pk,
-        ):
-            raise exceptions.UserIsAlreadyFollower(self.__current_user, other_user)
-        
-        User.objects.add_subscription(
+    def subscribe_to_user(self, other_user_pk: Any) -> None:
+        result = User.objects.add_subscription(
             subscriber_pk=self.__current_user.pk,
-            other_user_pk=other_user.pk,
+            other_user_pk=other_user_pk,
         )
+        match result:
+            case SubscriptionChangeResult.USER_NOT_FOUND:
+                raise exceptions.UserDoesNotExist(other_user_pk)
+            case SubscriptionChangeResult.UNCHANGED:
+                raise exceptions.UserIsAlreadyFollower(self.__current_user.pk, other_user_pk)
 
-    def unsubscribe_from_user(self, other_user: User) -> None:
-        if not User.objects.user_is_follower_other_user(
-            user_pk=self.__current_user.pk,
-            other_user_pk=other_user.pk,
-        ):
-            raise exceptions.UserIsNotFollower(self.__current_user, other_user)
+    def subscribe_to_users(self, other_user_pks: Iterable[Any]) -> list[Any]:
+        """
+        Подписка сразу на нескольких пользователей.
 
-        User.objects.remove_subscription(
+        Несуществующие пользователи и уже существующие подписки пропускаются.
+        Возвращает id пользователей, на которых подписка была создана.
+        """
+
+        created_by_pk = User.objects.add_subscriptions(
             subscriber_pk=self.__current_user.pk,
-            other_user_pk=other_user.pk,
+            other_user_pks=other_user_pks,
         )
+        return [pk for pk, is_created in created_by_pk.items() if is_created]
 
-    def remove_from_subscribers(self, other_user: User) -> None:
-        if not User.objects.user_is_follower_other_user(
-            user_pk=other_user.pk,
-            other_user_pk=self.__current_user.pk,
-        ):
-            raise exceptions.UserIsNotFollower(other_user, self.__current_user)
+    def unsubscribe_from_user(self, other_user_pk: Any) -> None:
+        self._remove_subscription(
+            subscriber_pk=self.__current_user.pk,
+            other_user_pk=other_user_pk,
+            checked_user_pk=other_user_pk,
+        )
 
-        User.objects.remove_subscription(
-            subscriber_pk=other_user.pk,
+    def remove_from_subscribers(self, other_user_pk: Any) -> None:
+        self._remove_subscription(
+            subscriber_pk=other_user_pk,
             other_user_pk=self.__current_user.pk,
+            checked_user_pk=other_user_pk,
+        )
+
+    def _remove_subscription(self, subscriber_pk: Any, other_user_pk: Any, checked_user_pk: Any) -> None:
+        # Текущий пользователь существует, поэтому `USER_NOT_FOUND` относится к другому пользователю.
+        result = User.objects.remove_subscription(
+            subscriber_pk=subscriber_pk,
+            other_user_pk=other_user_pk,
         )
+        match result:
+            case SubscriptionChangeResult.USER_NOT_FOUND:
+                raise exceptions.UserDoesNotExist(checked_user_pk)
+            case SubscriptionChangeResult.UNCHANGED:
+                raise exceptions.UserIsNotFollower(subscriber_pk, other_user_pk)
@@ -0,0 +1,5 @@
+from .service import (
+    UserCard,
+    UserCardsCache,
+    user_cards_cache,
+)
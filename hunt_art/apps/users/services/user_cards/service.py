@@ -0,0 +1,103 @@
+from typing import Any, Iterable
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.local_cache import LocalTTLCache
+
+from apps.users.models import (
+    User,
+    UserProfile,
+)
+
+
+@dataclass(frozen=True)
+class UserCard:
+    """Короткая информация о пользователе: то, что показывается рядом с артами, комментариями и т.д."""
+
+    id: int
+    username: str
+    # Относительный URL аватарки. Абсолютный строится уже в сериализаторе под конкретный запрос.
+    avatar_url: str | None
+
+
+class UserCardsCache:
+    """
+    Двухуровневый кэш карточек пользователей.
+
+    Первый уровень - LRU в памяти процесса с коротким временем жизни,
+    второй - общий кэш Django. Недостающие карточки загружаются из БД одним запросом.
+
+    NOTE: Сброс карточки очищает локальный LRU только текущего процесса. В других процессах
+    карточка может устареть, но не дольше, чем на время жизни локального кэша.
+    """
+
+    def __init__(self, local_max_size: int, local_timeout: float, shared_timeout: int) -> None:
+        self._local_timeout = local_timeout
+        self._shared_timeout = shared_timeout
+        self._local_cards: LocalTTLCache[Any, UserCard] = LocalTTLCache(local_max_size)
+
+    def get(self, user_pk: Any) -> UserCard | None:
+        return self.get_many([user_pk]).get(user_pk)
+
+    def get_many(self, user_pks: Iterable[Any]) -> dict[Any, UserCard]:
+        user_pks = set(user_pks)
+        cards = self._local_cards.get_many(user_pks)
+
+        missing_pks = user_pks - cards.keys()
+        if len(missing_pks) > 0:
+            shared_cards = self._get_shared_many(missing_pks)
+            self._local_cards.set_many(shared_cards, self._local_timeout)
+            cards.update(shared_cards)
+            missing_pks -= shared_cards.keys()
+
+        if len(missing_pks) > 0:
+            loaded_cards = self._load_many(missing_pks)
+            cache.set_many(
+                {self._get_cache_key(pk): card for pk, card in loaded_cards.items()},
+                self._shared_timeout,
+            )
+            self._local_cards.set_many(loaded_cards, self._local_timeout)
+            cards.update(loaded_cards)
+
+        return cards
+
+    def invalidate(self, user_pk: Any) -> None:
+        self._local_cards.delete(user_pk)
+        cache.delete(self._get_cache_key(user_pk))
+
+    def _get_shared_many(self, user_pks: set[Any]) -> dict[Any, UserCard]:
+        keys_by_pk = {pk: self._get_cache_key(pk) for pk in user_pks}
+        cached = cache.get_many(keys_by_pk.values())
+        return {
+            pk: cached[key]
+            for pk, key in keys_by_pk.items()
+            if key in cached
+        }
+
+    def _load_many(self, user_pks: set[Any]) -> dict[Any, UserCard]:
+        avatar_storage = UserProfile._meta.get_field('avatar').storage
+        rows = (
+            User.objects
+            .filter(pk__in=user_pks)
+            .values_list('pk', 'username', 'profile__avatar')
+        )
+        return {
+            pk: UserCard(
+                id=pk,
+                username=username,
+                avatar_url=avatar_storage.url(avatar) if avatar else None,
+            )
+            for pk, username, avatar in rows
+        }
+
+    def _get_cache_key(self, user_pk: Any) -> str:
+        return f'users:card:{user_pk}'
+
+
+user_cards_cache = UserCardsCache(
+    local_max_size=settings.USER_CARDS_LOCAL_CACHE_SIZE,
+    local_timeout=settings.USER_CARDS_LOCAL_CACHE_TIMEOUT,
+    shared_timeout=settings.USER_CARDS_CACHE_TIMEOUT,
+)
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from functools import partial
 from typing import Any, Optional, TypeVar, Set
 
 from django.contrib.auth import get_user_model
@@ -15,6 +16,7 @@ from rest_framework_simplejwt.utils import get_md5_hash_password
 from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
 
 from ...models import User
+from ...services.authenticated_users import authenticated_users_cache
 
 
 # ==================================================================
@@ -39,7 +41,18 @@ AuthUser = TypeVar("AuthUser", AbstractBaseUser, TokenUser)
 
 class BaseWebSocketAuthentication(ABC):
     @abstractmethod
-    async def authenticate(self, content: dict[str, Any]) -> User:
+    async def authenticate(self, content: dict[str, Any]) -> tuple[User, Token] | None:
+        """
+        Аутентификация по телу сообщения.
+
+        Возвращает пару (пользователь, провалидированный токен) либо `None`,
+        если данные для аутентификации не были предоставлены.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_credentials(self, content: dict[str, Any]) -> Any | None:
+        """Получение из тела сообщения данных, по которым выполняется аутентификация"""
         raise NotImplementedError()
 
 
@@ -57,21 +70,24 @@ class JWTWebSocketAuthentication(BaseWebSocketAuthentication):
     }
     ```
 
-    Если токен был предоставлен и аутентификация прошла успешно, в данных появится поле "user"
-    с объектом пользователя.
+    Если токен был предоставлен и аутентификация прошла успешно, вернется пара
+    из пользователя и провалидированного токена.
     Если токен был предоставлен, но аутентификация закончилась ошибкой, будет ошибка.
-    Если токен не был предоставлен, аутентификации не будет. Поля "user" в данных не будет.
+    Если токен не был предоставлен, аутентификации не будет, вернется `None`.
     """
 
-    queryset = User.objects.select_related("websocket_data")
+    queryset = User.objects.all()
 
-    async def authenticate(self, content: dict[str, Any]) -> User:
+    async def authenticate(self, content: dict[str, Any]) -> tuple[User, Token] | None:
         token = self.get_token_from_headers(content)
         if token is None:
             return None
 
         validated_token = self.get_validated_token(token)
-        return await self.get_user(validated_token)
+        return await self.get_user(validated_token), validated_token
+
+    def get_credentials(self, content: dict[str, Any]) -> str | None:
+        return self.get_token_from_headers(content)
 
     def get_token_from_headers(self, scope: dict[str, Any]) -> str | None:   
         return scope.get("headers", {}).get("jwt_access")
@@ -104,7 +120,15 @@ class JWTWebSocketAuthentication(BaseWebSocketAuthentication):
     async def get_user(self, validated_token: Token) -> AuthUser:
         """
         Attempts to find and return a user using the given validated token.
+
+        Пользователь кэшируется по токену (см. `AuthenticatedUsersCache`).
         """
+        return await authenticated_users_cache.aget_or_load(
+            validated_token,
+            partial(self._load_user, validated_token),
+        )
+
+    async def _load_user(self, validated_token: Token) -> AuthUser:
         try:
             user_id = validated_token[api_settings.USER_ID_CLAIM]
         except KeyError:
@@ -112,7 +136,7 @@ class JWTWebSocketAuthentication(BaseWebSocketAuthentication):
 
         try:
             user = await self.queryset.aget(**{api_settings.USER_ID_FIELD: user_id})
-        except self.user_model.DoesNotExist:
+        except User.DoesNotExist:
             raise AuthenticationFailed(_("User not found"), code="user_not_found")
 
         if not user.is_active:
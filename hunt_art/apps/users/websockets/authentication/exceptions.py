@@ -0,0 +1,4 @@
+class WebSocketAuthenticationFailed(Exception):
+    def __init__(self) -> None:
+        self.message = 'Ошибка аутентификации: токен недействителен или истек.'
+        super().__init__(self.message)
@@ -1,3 +1,5 @@
+import time
+from urllib.parse import parse_qs
 from typing import (
     Any,
 )
@@ -5,27 +7,52 @@ from typing import (
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 
 from apps.websockets.subsystems import BaseWebSocketSubsystem
-from apps.websockets.models import WebsocketData
+from apps.websockets.services.connections import connection_registry
+from apps.users.models import User
 
 from ..authentication.backends import JWTWebSocketAuthentication, BaseWebSocketAuthentication
+from ..authentication.exceptions import WebSocketAuthenticationFailed
 
 
 class AuthWebSocketSubsystem(BaseWebSocketSubsystem):
+    """
+    Подсистема аутентификации веб-сокетного соединения.
+
+    Соединение аутентифицируется один раз: при рукопожатии (токен в query string)
+    либо по первому сообщению с заголовками. Пользователь и время истечения
+    токена хранятся в состоянии консьюмера, повторная проверка выполняется,
+    только если клиент прислал другой токен или текущий истек.
+    """
+
     def __init__(self, consumer: AsyncJsonWebsocketConsumer) -> None:
         super().__init__(consumer)
         self.auth_backends: list[BaseWebSocketAuthentication] = [
             JWTWebSocketAuthentication(),
         ]
+        # Данные, по которым была выполнена текущая аутентификация.
+        self._credentials: tuple[Any, ...] | None = None
 
     @classmethod
     def get_subsystem_name(cls) -> str:
         return "auth"
     
     async def handle_connect(self) -> None:
-        pass
+        # Браузеры не позволяют передать заголовки при рукопожатии,
+        # поэтому токен можно передать в query string: `/ws/?jwt_access=...`.
+        # Вызывается уже после `accept`. При неверном токене кидается
+        # `WebSocketAuthenticationFailed`, и консьюмер закрывает соединение.
+        query_string = self.consumer.scope.get("query_string", b"").decode()
+        jwt_access = parse_qs(query_string).get("jwt_access")
+        if jwt_access:
+            await self.authenticate_if_needed({"headers": {"jwt_access": jwt_access[0]}})
 
     async def handle_disconnect(self) -> None:
-        pass
+        if self.consumer.user is not None:
+            await connection_registry.unregister(
+                self.consumer.channel_layer,
+                self.consumer.user.pk,
+                self.consumer.channel_name,
+            )
 
     async def auth(self, content: dict[str, Any]) -> None:
         """
@@ -39,37 +66,97 @@ class AuthWebSocketSubsystem(BaseWebSocketSubsystem):
         }
         ```
         """
-        is_first_auth = self.consumer.user is None
+        await self.authenticate_if_needed(content)
+
+    async def authenticate_if_needed(self, content: dict[str, Any]) -> None:
+        """
+        Аутентификация по сообщению, если она требуется.
+
+        Вызывается консьюмером для каждого входящего сообщения, но в БД и к токену
+        обращается только при смене токена или после истечения текущего.
+        """
+        if self.consumer.user is not None and self._is_expired():
+            await self._set_user(None)
+
+        credentials = tuple(backend.get_credentials(content) for backend in self.auth_backends)
+        if all(credential is None for credential in credentials):
+            return
+        if self.consumer.user is not None and credentials == self._credentials:
+            return
+
+        await self._authenticate(content, credentials)
 
+    async def _authenticate(self, content: dict[str, Any], credentials: tuple[Any, ...]) -> None:
         auth_error = False
+        auth_result = None
         for backend in self.auth_backends:
             try:
-                user = await backend.authenticate(content)
+                auth_result = await backend.authenticate(content)
             except Exception:
                 # TODO: Сделать норм обработку ошибок.
                 auth_error = True
             else:
                 auth_error = False
-                break
+                if auth_result is not None:
+                    break
 
-        if auth_error:
+        if auth_error or auth_result is None:
             # Если была ошибка, вернем ее, но предварительно обнулим юзера.
-            self.consumer.user = None
-            # TODO: Сделать норм обработку ошибок.
-            raise ValueError("Ошибка аутентификации")
-        
+            await self._set_user(None)
+            raise WebSocketAuthenticationFailed()
+
+        user, validated_token = auth_result
+        await self._set_user(user)
+        self._credentials = credentials
+        self.consumer.auth_expires_at = validated_token.get("exp")
+
+    async def _set_user(self, user: User | None) -> None:
+        """
+        Смена пользователя соединения.
+
+        При смене пользователя подсистемам может понадобиться еще раз выполнить
+        обработку подключения, чтобы инициализироваться с новым юзером.
+        Если пользователь не изменился (например, клиент обновил токен),
+        подсистемы не переподключаются.
+        """
+        previous_user: User | None = self.consumer.user
+        if previous_user is not None and user is not None and previous_user.pk == user.pk:
+            self.consumer.user = user
+            return
+
+        reconnecting_subsystems = [
+            subsystem
+            for subsystem in self.consumer.subsystems_by_name.values()
+            if subsystem.needs_to_reconnect_when_user_auth()
+        ]
+
+        # Отключаем подсистемы от данных предыдущего пользователя.
+        if previous_user is not None:
+            await connection_registry.unregister(
+                self.consumer.channel_layer,
+                previous_user.pk,
+                self.consumer.channel_name,
+            )
+            for subsystem in reconnecting_subsystems:
+                await subsystem.handle_disconnect()
+
         self.consumer.user = user
+        if user is None:
+            self._credentials = None
+            self.consumer.auth_expires_at = None
+            return
+
+        # Зарегистрируем соединение: после этого до него доходят сообщения пользователя.
+        await connection_registry.register(
+            self.consumer.channel_layer,
+            user.pk,
+            self.consumer.channel_name,
+        )
+
+        # Переподключим подсистемы.
+        for subsystem in reconnecting_subsystems:
+            await subsystem.handle_connect()
 
-        # После аутентификации подсистемам может понадобиться еще раз выполнить
-        # обработку подключения, чтобы инициализироваться с аутентифицированным юзером.
-        # Переподключение подсистемы будет производиться только для первой аутентификации юзера.
-        if is_first_auth:
-            # Сохраним в БД для юзера айди его канала.
-            await WebsocketData.objects.filter(user=user).aupdate(channel_name=self.consumer.channel_name)
-
-            # Переподключим подсистемы.
-            for subsystem in self.consumer.subsystems_by_name.values():
-                subsystem: BaseWebSocketSubsystem
-                if not subsystem.needs_to_reconnect_when_user_auth():
-                    continue
-                await subsystem.handle_connect()
+    def _is_expired(self) -> bool:
+        expires_at = self.consumer.auth_expires_at
+        return expires_at is not None and expires_at <= time.time()
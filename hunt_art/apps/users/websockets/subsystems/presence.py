@@ -0,0 +1,90 @@
+from typing import Any
+
+from apps.websockets.subsystems import BaseWebSocketSubsystem
+
+from ...services.presence import (
+    PresenceSubscriptionsLimitExceeded,
+    presence_tracker,
+)
+
+
+class PresenceWebSocketSubsystem(BaseWebSocketSubsystem):
+    """
+    Подсистема онлайн-статусов пользователей.
+
+    Соединение аутентифицированного пользователя отмечает его онлайн.
+    Клиент может подписаться на статус ограниченного набора пользователей:
+    в ответ придет текущий статус, а дальше - уведомления об изменениях,
+    собранные за интервал.
+    """
+
+    @classmethod
+    def get_subsystem_name(cls) -> str:
+        return "presence"
+
+    @classmethod
+    def needs_to_reconnect_when_user_auth(cls) -> bool:
+        return True
+
+    async def handle_connect(self) -> None:
+        if self.consumer.user is None:
+            return
+
+        presence_tracker.connect(self.consumer.channel_name, self.consumer.user.pk)
+
+    async def handle_disconnect(self) -> None:
+        presence_tracker.disconnect(self.consumer.channel_name)
+
+    async def subscribe(self, content: dict[str, Any]) -> None:
+        """
+        Подписка на статус пользователей. Заменяет предыдущую подписку.
+
+        ```
+        content = {
+            "subsystem": "presence",
+            "action": "subscribe",
+            "data": {
+                "user_ids": [3, 5, 8],
+            },
+        }
+        ```
+
+        В ответ придет сообщение с действием `snapshot` и списком тех, кто онлайн,
+        а затем будут приходить сообщения с действием `changed`. Если пользователей
+        больше, чем разрешено, или соединение не аутентифицировано, придет сообщение
+        с действием `error`, а прошлая подписка останется.
+        """
+        if not await self.ensure_authenticated():
+            return
+
+        user_pks = {int(user_pk) for user_pk in content["data"]["user_ids"]}
+        try:
+            online_pks = await presence_tracker.subscribe(
+                self.consumer.channel_name,
+                user_pks,
+                self._send_changes,
+            )
+        except PresenceSubscriptionsLimitExceeded as error:
+            await self.send_error("subscriptions_limit_exceeded", error.message)
+            return
+
+        await self.consumer.send_json({
+            "subsystem": self.get_subsystem_name(),
+            "action": "snapshot",
+            "data": {
+                "online": sorted(online_pks),
+            },
+        })
+
+    async def unsubscribe(self, content: dict[str, Any]) -> None:
+        presence_tracker.unsubscribe(self.consumer.channel_name)
+
+    async def _send_changes(self, online_pks: set[int], offline_pks: set[int]) -> None:
+        await self.consumer.send_json({
+            "subsystem": self.get_subsystem_name(),
+            "action": "changed",
+            "data": {
+                "online": sorted(online_pks),
+                "offline": sorted(offline_pks),
+            },
+        })
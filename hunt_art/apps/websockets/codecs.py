@@ -0,0 +1,70 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any
+
+from django.conf import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class BaseJsonCodec(ABC):
+    """Кодек JSON для веб-сокетных фреймов"""
+
+    @abstractmethod
+    def dumps(self, content: Any) -> str:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def loads(self, data: str | bytes) -> Any:
+        raise NotImplementedError()
+
+
+class StdlibJsonCodec(BaseJsonCodec):
+    def dumps(self, content: Any) -> str:
+        # Без пробелов после разделителей, как и в `orjson`.
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(BaseJsonCodec):
+    def dumps(self, content: Any) -> str:
+        return orjson.dumps(content).decode()
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MessagePackCodec:
+    """Кодек MessagePack для бинарных веб-сокетных фреймов"""
+
+    def dumps(self, content: Any) -> bytes:
+        return msgpack.packb(content)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+def get_json_codec(name: str) -> BaseJsonCodec:
+    match name:
+        case "orjson" if orjson is not None:
+            return OrjsonCodec()
+        case "orjson" | "json":
+            return StdlibJsonCodec()
+        case _:
+            raise ValueError(f'Неизвестный JSON-кодек "{name}".')
+
+
+json_codec = get_json_codec(settings.WEBSOCKET_JSON_CODEC)
+
+# Бинарный режим доступен, только если установлен `msgpack`.
+msgpack_codec = MessagePackCodec() if msgpack is not None else None
@@ -1,5 +1,6 @@
 import json
-from typing import Any, Self, Type, Coroutine, Callable
+import asyncio
+from typing import Any, Self, Type, Coroutine, Callable, Iterable
 
 from channels_redis.core import RedisChannelLayer
 from channels.layers import get_channel_layer
@@ -8,37 +9,121 @@ from channels.generic.websocket import AsyncJsonWebsocketConsumer
 
 from apps.chats.websockets.subsystems.chat import ChatWebSocketSubsystem
 from apps.users.websockets.subsystems.auth import AuthWebSocketSubsystem
+from apps.users.websockets.subsystems.presence import PresenceWebSocketSubsystem
+from apps.users.websockets.authentication.exceptions import WebSocketAuthenticationFailed
 from apps.users.models import User
+from apps.monitoring.slow_queries import query_source
 
+from .codecs import json_codec, msgpack_codec
+from .protocol import FrameFormat, pack_envelope, unpack_envelope
 from .subsystems import BaseWebSocketSubsystem
 
 
+# Код закрытия соединения, если токен из рукопожатия недействителен
+# (диапазон 4000-4999 отведен под коды приложения).
+AUTHENTICATION_FAILED_CLOSE_CODE = 4401
+
+
 class WebSocketConsumer(AsyncJsonWebsocketConsumer):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.subsystems_by_name: dict[str, BaseWebSocketSubsystem] = {
             ChatWebSocketSubsystem.get_subsystem_name(): ChatWebSocketSubsystem(self),
             AuthWebSocketSubsystem.get_subsystem_name(): AuthWebSocketSubsystem(self),
+            PresenceWebSocketSubsystem.get_subsystem_name(): PresenceWebSocketSubsystem(self),
         }
         self.user: User | None = None
+        # Время истечения токена, по которому аутентифицирован пользователь (unix timestamp).
+        self.auth_expires_at: float | None = None
+        self.frame_format = FrameFormat.JSON
 
     async def connect(self) -> None:
-        for subsystem in self.subsystems_by_name.values():
-            await subsystem.handle_connect()
+        # Клиент выбирает формат фреймов подпротоколом (`Sec-WebSocket-Protocol`).
+        # Клиенты без подпротокола работают в JSON, как раньше.
+        requested_subprotocols: list[str] = self.scope.get("subprotocols", [])
+        self.frame_format = FrameFormat.select(requested_subprotocols)
+        subprotocol = self.frame_format.value if self.frame_format.value in requested_subprotocols else None
+        await self.accept(subprotocol=subprotocol)
 
-        await self.accept()
+        # Подсистемы подключаются только после `accept`, чтобы соединение не попало
+        # в группы пользователя раньше, чем рукопожатие завершится.
+        try:
+            for subsystem in self.subsystems_by_name.values():
+                await subsystem.handle_connect()
+        except WebSocketAuthenticationFailed:
+            await self.close(code=AUTHENTICATION_FAILED_CLOSE_CODE)
 
     async def disconnect(self, close_code: int) -> None:
         for subsystem in self.subsystems_by_name.values():
             await subsystem.handle_disconnect()
 
+    async def receive(self, text_data: str | None = None, bytes_data: bytes | None = None, **kwargs) -> None:
+        if self.frame_format is FrameFormat.MSGPACK and bytes_data:
+            await self.receive_json(unpack_envelope(msgpack_codec.loads(bytes_data)))
+            return
+
+        await super().receive(text_data, bytes_data, **kwargs)
+
+    async def send_json(self, content: dict[str, Any], close: bool = False) -> None:
+        if self.frame_format is FrameFormat.MSGPACK:
+            await self.send(bytes_data=msgpack_codec.dumps(pack_envelope(content)), close=close)
+            return
+
+        await super().send_json(content, close)
+
     async def receive_json(self, content: dict[str, Any]) -> None:
         """Прием и маршрутизация сообщений по подсистемам"""
 
         subsystem = self.subsystems_by_name[content["subsystem"]]
         action = content["action"]
+        query_source.set(f"{self.__class__.__name__}.{content['subsystem']}.{action}")
 
-        await AuthWebSocketSubsystem(self).auth(content)
+        # Подсистема аутентификации сама решает, нужна ли повторная проверка:
+        # токен проверяется только при его смене или после истечения.
+        auth_subsystem: AuthWebSocketSubsystem = self.subsystems_by_name[
+            AuthWebSocketSubsystem.get_subsystem_name()
+        ]
+        try:
+            await auth_subsystem.authenticate_if_needed(content)
+        except WebSocketAuthenticationFailed as error:
+            await auth_subsystem.send_error("authentication_failed", error.message)
+            return
 
         handler: Callable[[dict[str, Any]], Coroutine] = getattr(subsystem, action)
         await handler(content)
+
+    async def group_send_content(self, groups: Iterable[str], content: dict[str, Any]) -> None:
+        """
+        Рассылка сообщения всем каналам групп.
+
+        Сообщение кодируется один раз у отправителя (в JSON и, если доступен,
+        в MessagePack), получатели пересылают готовый фрейм в сокет без повторного
+        кодирования (см. `websocket_forward`).
+        """
+        message = {
+            "type": "websocket.forward",
+            "text": json_codec.dumps(content),
+        }
+        if msgpack_codec is not None:
+            message["bytes"] = msgpack_codec.dumps(pack_envelope(content))
+
+        # Отправка в группы идет параллельно, а не по одному запросу в Redis за раз.
+        await asyncio.gather(*(
+            self.channel_layer.group_send(group=group, message=message)
+            for group in groups
+        ))
+
+    async def websocket_forward(self, message: dict[str, Any]) -> None:
+        """Пересылка в сокет уже закодированного сообщения из группы"""
+        if self.frame_format is FrameFormat.MSGPACK:
+            await self.send(bytes_data=message["bytes"])
+        else:
+            await self.send(text_data=message["text"])
+
+    @classmethod
+    async def decode_json(cls, text_data: str) -> Any:
+        return json_codec.loads(text_data)
+
+    @classmethod
+    async def encode_json(cls, content: Any) -> str:
+        return json_codec.dumps(content)
@@ -0,0 +1,8 @@
+def get_user_group_name(user_pk: int) -> str:
+    """
+    Название персональной группы пользователя в слое каналов.
+
+    В группе состоят все веб-сокетные соединения пользователя, через нее
+    рассылаются сообщения всех его чатов.
+    """
+    return f"user_{user_pk}"
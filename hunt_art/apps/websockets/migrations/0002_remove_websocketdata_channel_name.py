@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("websockets", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="websocketdata",
+            name="channel_name",
+        ),
+    ]
@@ -4,16 +4,15 @@ from django.utils.translation import gettext_lazy as _
 
 
 class WebsocketData(models.Model):
+    # NOTE: Каналы открытых соединений здесь не хранятся: у пользователя их может быть
+    #   несколько, и они живут в реестре соединений (см. `ConnectionRegistry`).
+
     user = models.OneToOneField(
         to='users.User',
         on_delete=models.CASCADE,
         related_name="websocket_data",
         related_query_name="websocket_data",
     )
-    channel_name = models.TextField(
-        null=True,
-        blank=True,
-    )
 
     class Meta:
         verbose_name = _("Данные о веб-сокете пользователя")
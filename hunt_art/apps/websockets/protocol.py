@@ -0,0 +1,57 @@
+import enum
+from typing import Any
+
+from .codecs import msgpack_codec
+
+
+class FrameFormat(enum.Enum):
+    """Формат фреймов веб-сокетного соединения, выбирается подпротоколом при подключении"""
+
+    JSON = "hunt-art.json"
+    MSGPACK = "hunt-art.msgpack"
+
+    @classmethod
+    def select(cls, requested_subprotocols: list[str]) -> "FrameFormat":
+        if cls.MSGPACK.value in requested_subprotocols and msgpack_codec is not None:
+            return cls.MSGPACK
+        return cls.JSON
+
+
+# Коды действий компактного (бинарного) конверта.
+# Бинарный фрейм - это массив `[код, data]` либо `[код, data, headers]`.
+# Коды нельзя переиспользовать: старые клиенты продолжат их слать.
+ACTION_CODES: dict[tuple[str, str], int] = {
+    ("auth", "auth"): 1,
+    ("auth", "error"): 2,
+    ("chat", "receive_message"): 10,
+    ("chat", "read_message"): 11,
+    ("chat", "new_message"): 12,
+    ("chat", "typing"): 13,
+    ("chat", "error"): 14,
+    ("presence", "subscribe"): 20,
+    ("presence", "unsubscribe"): 21,
+    ("presence", "snapshot"): 22,
+    ("presence", "changed"): 23,
+    ("presence", "error"): 24,
+}
+ACTIONS_BY_CODE: dict[int, tuple[str, str]] = {code: action for action, code in ACTION_CODES.items()}
+
+
+def pack_envelope(content: dict[str, Any]) -> list[Any]:
+    """Сжатие конверта `subsystem`/`action`/`data`/`headers` в массив для бинарного фрейма"""
+
+    frame = [ACTION_CODES[(content["subsystem"], content["action"])], content.get("data")]
+    if content.get("headers"):
+        frame.append(content["headers"])
+    return frame
+
+
+def unpack_envelope(frame: list[Any]) -> dict[str, Any]:
+    """Разворачивание бинарного фрейма в обычный конверт"""
+
+    code, data, *rest = frame
+    subsystem, action = ACTIONS_BY_CODE[code]
+    content = {"subsystem": subsystem, "action": action, "data": data}
+    if rest:
+        content["headers"] = rest[0]
+    return content
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+
+from channels.layers import BaseChannelLayer
+from django.conf import settings
+
+from apps.websockets.groups import get_user_group_name
+
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionRegistry:
+    """
+    Реестр веб-сокетных соединений пользователей.
+
+    У пользователя может быть несколько соединений (устройств). Каждое из них
+    вступает в персональную группу пользователя в слое каналов, через которую
+    до всех устройств доходят сообщения. Сама группа и есть общий реестр,
+    отдельного хранилища нет. При отключении соединение выходит из группы.
+
+    Слой каналов на Redis исключает участников группы через `group_expiry` секунд
+    после вступления, даже если соединение живо. Поэтому реестр помнит соединения
+    своего процесса и раз в `refresh_interval` секунд повторно добавляет их в группы.
+    """
+
+    def __init__(self, refresh_interval: float) -> None:
+        self.refresh_interval = refresh_interval
+        # Соединения процесса: канал -> (слой каналов, id пользователя).
+        self._connections: dict[str, tuple[BaseChannelLayer, int]] = {}
+        self._task: asyncio.Task | None = None
+
+    async def register(self, channel_layer: BaseChannelLayer, user_pk: int, channel_name: str) -> None:
+        self._connections[channel_name] = (channel_layer, user_pk)
+        await channel_layer.group_add(get_user_group_name(user_pk), channel_name)
+        self._start_task_if_needed()
+
+    async def unregister(self, channel_layer: BaseChannelLayer, user_pk: int, channel_name: str) -> None:
+        self._connections.pop(channel_name, None)
+        await channel_layer.group_discard(get_user_group_name(user_pk), channel_name)
+
+    def _start_task_if_needed(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self._refresh()
+            except Exception:
+                logger.exception("Не удалось продлить членство соединений в группах пользователей.")
+
+    async def _refresh(self) -> None:
+        # `group_add` для уже добавленного канала только обновляет время вступления.
+        await asyncio.gather(*(
+            channel_layer.group_add(get_user_group_name(user_pk), channel_name)
+            for channel_name, (channel_layer, user_pk) in list(self._connections.items())
+        ))
+
+
+connection_registry = ConnectionRegistry(
+    refresh_interval=settings.WEBSOCKET_USER_GROUPS_REFRESH_INTERVAL,
+)
@@ -20,6 +20,43 @@ class BaseWebSocketSubsystem(ABC):
     async def handle_disconnect(self) -> None:
         raise NotImplementedError()
     
+    async def ensure_authenticated(self) -> bool:
+        """
+        Проверка, что соединение аутентифицировано.
+
+        Если нет, клиенту отправляется ошибка `authentication_required`,
+        и обработчик сообщения должен завершиться.
+        """
+        if self.consumer.user is not None:
+            return True
+
+        await self.send_error("authentication_required", "Необходимо аутентифицироваться.")
+        return False
+
+    async def send_error(self, code: str, message: str) -> None:
+        """
+        Отправка клиенту ошибки обработки его сообщения.
+
+        ```
+        content = {
+            'subsystem': 'presence',
+            'action': 'error',
+            'data': {
+                'code': 'subscriptions_limit_exceeded',
+                'message': 'Можно подписаться на статус не больше чем 200 пользователей.',
+            },
+        }
+        ```
+        """
+        await self.consumer.send_json({
+            "subsystem": self.get_subsystem_name(),
+            "action": "error",
+            "data": {
+                "code": code,
+                "message": message,
+            },
+        })
+
     @classmethod
     def needs_to_reconnect_when_user_auth(cls) -> bool:
         return False
@@ -110,6 +110,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Installed apps.
     'debug_toolbar',
@@ -125,6 +126,7 @@ INSTALLED_APPS = [
     'apps.arts',
     'apps.websockets',
     'apps.chats',
+    'apps.monitoring',
 ]
 
 if DEBUG:
@@ -140,6 +142,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.monitoring.middleware.SlowQueryMiddleware',
 ]
 
 TEMPLATES = [
@@ -182,6 +185,20 @@ DATABASES = {
 }
 
 
+# Slow queries monitoring settings.
+
+SLOW_QUERY_LOG_ENABLED = config('SLOW_QUERY_LOG_ENABLED', cast=bool, default=True)
+
+# Порог в миллисекундах, после которого запрос считается медленным.
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', cast=float, default=200.0)
+
+# Доля медленных запросов, для которых снимается `EXPLAIN (ANALYZE, BUFFERS)`.
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = config('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', cast=float, default=0.01)
+
+# Размер кольцевого буфера с планами медленных запросов.
+SLOW_QUERY_BUFFER_SIZE = config('SLOW_QUERY_BUFFER_SIZE', cast=int, default=100)
+
+
 # Password validation settings.
 
 if not DEBUG:
@@ -206,9 +223,20 @@ if not DEBUG:
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=30),
-    "UPDATE_LAST_LOGIN": True,
+    # Время последнего входа обновляется отложенно (см. `LastLoginFlusher`).
+    "UPDATE_LAST_LOGIN": False,
 }
 
+# Интервал в секундах, с которым время последнего входа записывается в БД,
+# и количество пользователей, при котором запись происходит раньше.
+LAST_LOGIN_FLUSH_INTERVAL = config('LAST_LOGIN_FLUSH_INTERVAL', cast=float, default=5)
+LAST_LOGIN_MAX_PENDING = config('LAST_LOGIN_MAX_PENDING', cast=int, default=5_000)
+
+# Кэш пользователей, прошедших аутентификацию по JWT (см. `AuthenticatedUsersCache`).
+# Количество пользователей в памяти процесса и время их жизни в секундах.
+JWT_USER_CACHE_SIZE = config('JWT_USER_CACHE_SIZE', cast=int, default=10_000)
+JWT_USER_CACHE_TIMEOUT = config('JWT_USER_CACHE_TIMEOUT', cast=float, default=60)
+
 
 # API auto-documentation settings.
 
@@ -237,7 +265,7 @@ SPECTACULAR_SETTINGS = {
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.backends.CachedJWTAuthentication',
     ),
 }
 
@@ -268,3 +296,106 @@ def _get_default_channel_layers_config() -> dict[str, Any]:
 CHANNEL_LAYERS = {
     "default": _get_default_channel_layers_config(),
 }
+
+# JSON-кодек веб-сокетов: `orjson` или `json` (стандартная библиотека).
+# Если `orjson` не установлен, используется стандартная библиотека.
+WEBSOCKET_JSON_CODEC = config('WEBSOCKET_JSON_CODEC', default='orjson')
+
+# Redis слоя каналов. В нем же хранятся онлайн-статусы, а без Redis - в памяти процесса.
+CHANNEL_LAYER_REDIS_DSN: str | None = CHANNEL_LAYERS["default"].get("CONFIG", {}).get("hosts", [None])[0]
+
+# Как часто (в секундах) соединения процесса заново вступают в группы своих пользователей
+# (см. `ConnectionRegistry`). Должно быть меньше `group_expiry` слоя каналов (по умолчанию сутки).
+WEBSOCKET_USER_GROUPS_REFRESH_INTERVAL = config('WEBSOCKET_USER_GROUPS_REFRESH_INTERVAL', cast=float, default=3_600)
+
+# Индикаторы набора текста в чатах: не чаще одной рассылки "печатает" за интервал (в секундах)
+# и автоматическое "перестал печатать", если клиент молчит дольше таймаута.
+CHAT_TYPING_BROADCAST_INTERVAL = config('CHAT_TYPING_BROADCAST_INTERVAL', cast=float, default=3)
+CHAT_TYPING_TIMEOUT = config('CHAT_TYPING_TIMEOUT', cast=float, default=6)
+
+# Онлайн-статус пользователей (см. `PresenceTracker`).
+# Через сколько секунд без heartbeat'а пользователь считается оффлайн.
+PRESENCE_TTL = config('PRESENCE_TTL', cast=float, default=45)
+# Как часто процесс отправляет heartbeat'ы за всех подключенных пользователей.
+PRESENCE_HEARTBEAT_INTERVAL = config('PRESENCE_HEARTBEAT_INTERVAL', cast=float, default=15)
+# Как часто записываются новые подключения и рассылаются изменения статусов подписчикам.
+PRESENCE_TICK_INTERVAL = config('PRESENCE_TICK_INTERVAL', cast=float, default=2)
+# На скольких пользователей можно подписаться с одного соединения.
+PRESENCE_MAX_SUBSCRIPTIONS = config('PRESENCE_MAX_SUBSCRIPTIONS', cast=int, default=200)
+
+
+# Cache settings.
+
+def _get_default_cache_config() -> dict[str, Any]:
+    redis_dsn: str | None = config('REDIS_DSN', default=None)
+
+    if redis_dsn is None:
+        return {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+
+    cache_dsn = redis_dsn.format(
+        host=config('REDIS_HOST'),
+        username=config('REDIS_USER'),
+        password=config('REDIS_PASSWORD'),
+        db=config('REDIS_CACHE_DB', default=1),
+    )
+
+    return {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': cache_dsn,
+    }
+
+CACHES = {
+    'default': _get_default_cache_config(),
+}
+
+# Время жизни закэшированного множества подписок пользователя в секундах.
+USER_SUBSCRIPTIONS_CACHE_TIMEOUT = config('USER_SUBSCRIPTIONS_CACHE_TIMEOUT', cast=int, default=30)
+
+# Кэш карточек пользователей (id, имя, аватарка).
+# Размер и время жизни (в секундах) локального LRU в памяти процесса.
+USER_CARDS_LOCAL_CACHE_SIZE = config('USER_CARDS_LOCAL_CACHE_SIZE', cast=int, default=10_000)
+USER_CARDS_LOCAL_CACHE_TIMEOUT = config('USER_CARDS_LOCAL_CACHE_TIMEOUT', cast=float, default=10)
+# Время жизни карточки в общем кэше в секундах.
+USER_CARDS_CACHE_TIMEOUT = config('USER_CARDS_CACHE_TIMEOUT', cast=int, default=600)
+
+# Кэш участников чатов для рассылки сообщений по группам пользователей.
+# Размер и время жизни (в секундах) локального LRU в памяти процесса.
+CHAT_MEMBERS_LOCAL_CACHE_SIZE = config('CHAT_MEMBERS_LOCAL_CACHE_SIZE', cast=int, default=10_000)
+CHAT_MEMBERS_LOCAL_CACHE_TIMEOUT = config('CHAT_MEMBERS_LOCAL_CACHE_TIMEOUT', cast=float, default=60)
+# Время жизни состава чата в общем кэше в секундах.
+CHAT_MEMBERS_CACHE_TIMEOUT = config('CHAT_MEMBERS_CACHE_TIMEOUT', cast=int, default=3600)
+
+# Пул процессов для хэширования паролей.
+# Количество процессов. При 0 пароли хэшируются в потоке воркера.
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', cast=int, default=2)
+# Максимальное количество задач в очереди пула на один воркер приложения.
+PASSWORD_HASHING_MAX_PENDING = config('PASSWORD_HASHING_MAX_PENDING', cast=int, default=32)
+# Сколько секунд задача может ждать места в очереди, прежде чем запрос будет отклонен.
+PASSWORD_HASHING_QUEUE_TIMEOUT = config('PASSWORD_HASHING_QUEUE_TIMEOUT', cast=float, default=2)
+
+# Количество рекомендаций подписок, которые хранятся для одного пользователя.
+FOLLOW_SUGGESTIONS_TOP_K = config('FOLLOW_SUGGESTIONS_TOP_K', cast=int, default=50)
+
+# Отложенная (write-behind) запись сообщений чатов. При включении сообщения рассылаются
+# сразу, а в БД записываются пачками в фоне (см. `ChatMessagesFlusher`).
+CHAT_MESSAGES_WRITE_BEHIND = config('CHAT_MESSAGES_WRITE_BEHIND', cast=bool, default=False)
+# Интервал записи в секундах и количество сообщений, при котором запись происходит раньше.
+CHAT_MESSAGES_FLUSH_INTERVAL = config('CHAT_MESSAGES_FLUSH_INTERVAL', cast=float, default=0.5)
+CHAT_MESSAGES_FLUSH_BATCH_SIZE = config('CHAT_MESSAGES_FLUSH_BATCH_SIZE', cast=int, default=500)
+# Сколько незаписанных сообщений может быть в памяти процесса (граница потерь при падении).
+# Сверх этого сообщения записываются сразу.
+CHAT_MESSAGES_MAX_BUFFERED = config('CHAT_MESSAGES_MAX_BUFFERED', cast=int, default=5_000)
+# Номер воркера для генератора id сообщений (0-63). При -1 номер арендуется в общем кэше:
+# живой процесс держит его эксклюзивно и продлевает аренду (время жизни - в секундах).
+# Без REDIS_DSN общего кэша нет, и отложенная запись не запустится, пока номер не задан явно.
+CHAT_MESSAGES_SNOWFLAKE_WORKER_ID = config('CHAT_MESSAGES_SNOWFLAKE_WORKER_ID', cast=int, default=-1)
+CHAT_MESSAGES_WORKER_ID_LEASE_TTL = config('CHAT_MESSAGES_WORKER_ID_LEASE_TTL', cast=int, default=60)
+# Начало отсчета времени в id сообщений (2024-01-01 UTC, в миллисекундах).
+CHAT_MESSAGES_SNOWFLAKE_EPOCH_MS = 1_704_067_200_000
+
+# Интервал в секундах, с которым прогресс чтения чатов записывается в БД (см. `ReadProgressFlusher`),
+# и количество участников чатов, при котором запись происходит раньше.
+CHAT_READ_PROGRESS_FLUSH_INTERVAL = config('CHAT_READ_PROGRESS_FLUSH_INTERVAL', cast=float, default=1)
+CHAT_READ_PROGRESS_MAX_PENDING = config('CHAT_READ_PROGRESS_MAX_PENDING', cast=int, default=5_000)
@@ -0,0 +1 @@
+from .flusher import BackgroundBatchFlusher
@@ -0,0 +1,139 @@
+import atexit
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    Generic,
+    Hashable,
+    TypeVar,
+)
+
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+
+KeyT = TypeVar('KeyT', bound=Hashable)
+ValueT = TypeVar('ValueT')
+
+
+class BackgroundBatchFlusher(ABC, Generic[KeyT, ValueT]):
+    """
+    Накопление изменений в памяти процесса и их запись в БД пачками в фоновом потоке.
+
+    Изменения по одному ключу схлопываются методом `merge`. Пачка записывается
+    раз в `interval` секунд или раньше, если накопилось `max_pending` ключей.
+    Поток запускается при первом изменении. При завершении процесса поток
+    останавливается, а оставшиеся изменения записываются.
+
+    Если запись пачки упала, изменения возвращаются в буфер и будут записаны со следующей пачкой.
+    """
+
+    def __init__(self, name: str, interval: float, max_pending: int) -> None:
+        self.name = name
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: dict[KeyT, ValueT] = {}
+        # Пачка, которая записывается прямо сейчас. Нужна, чтобы `get` не терял значения во время записи.
+        self._in_flight: dict[KeyT, ValueT] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @abstractmethod
+    def flush_batch(self, batch: dict[KeyT, ValueT]) -> None:
+        """Запись пачки изменений в БД"""
+
+        raise NotImplementedError()
+
+    def merge(self, old_value: ValueT, new_value: ValueT) -> ValueT:
+        """Схлопывание двух изменений по одному ключу. По умолчанию остается последнее."""
+
+        return new_value
+
+    def add(self, key: KeyT, value: ValueT) -> None:
+        with self._lock:
+            if key in self._pending:
+                value = self.merge(self._pending[key], value)
+            self._pending[key] = value
+            is_full = len(self._pending) >= self.max_pending
+            self._start_thread_if_needed()
+
+        if is_full:
+            self._wakeup.set()
+
+    def get(self, key: KeyT, default: Any = None) -> ValueT | Any:
+        """Получение еще не записанного в БД значения"""
+
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            return self._in_flight.get(key, default)
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def buffered_count(self) -> int:
+        """Количество еще не записанных значений, включая пачку, которая записывается сейчас"""
+
+        with self._lock:
+            return len(self._pending) + len(self._in_flight)
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+            if len(batch) == 0:
+                return
+
+            try:
+                self.flush_batch(batch)
+            except Exception:
+                logger.exception(
+                    f'Не удалось записать пачку изменений "{self.name}" ({len(batch)} шт.). '
+                    f'Изменения будут записаны со следующей пачкой.'
+                )
+                self._requeue(batch)
+            finally:
+                with self._lock:
+                    self._in_flight = {}
+
+    def stop(self) -> None:
+        """Остановка фонового потока и запись оставшихся изменений"""
+
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+        self.flush()
+
+    def _requeue(self, batch: dict[KeyT, ValueT]) -> None:
+        with self._lock:
+            for key, value in batch.items():
+                if key in self._pending:
+                    value = self.merge(value, self._pending[key])
+                self._pending[key] = value
+
+    def _start_thread_if_needed(self) -> None:
+        if self._thread is not None or self._stopped.is_set():
+            return
+
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+            # У потока свое соединение с БД. Закроем его, если оно устарело или сломалось.
+            close_old_connections()
@@ -3,4 +3,5 @@ from .serializers import (
     OpenAPIDetailWithCodeSerializer,
     OpenAPIBadRequestSerializerFactory,
     get_pagination_schema,
+    get_cursor_pagination_schema,
 )
@@ -18,6 +18,20 @@ def get_pagination_schema(
     )
 
 
+def get_cursor_pagination_schema(
+    name: str,
+    child_schema: Type[serializers.Serializer],
+) -> serializers.Serializer:
+    return inline_serializer(
+        name=name,
+        fields={
+            'next': serializers.URLField(),
+            'previous': serializers.URLField(),
+            'results': child_schema(many=True),
+        },
+    )
+
+
 class OpenAPIDetailSerializer(serializers.Serializer):
     detail = serializers.CharField()
 
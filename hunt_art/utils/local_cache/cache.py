@@ -0,0 +1,70 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import (
+    Any,
+    Generic,
+    Hashable,
+    Iterable,
+    TypeVar,
+)
+
+
+KeyT = TypeVar('KeyT', bound=Hashable)
+ValueT = TypeVar('ValueT')
+
+
+class LocalTTLCache(Generic[KeyT, ValueT]):
+    """
+    Потокобезопасный LRU-кэш в памяти процесса с временем жизни записей.
+
+    При превышении `max_size` вытесняются давно не использовавшиеся записи.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._items: OrderedDict[KeyT, tuple[ValueT, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: KeyT, default: Any = None) -> ValueT | Any:
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[KeyT]) -> dict[KeyT, ValueT]:
+        now = time.monotonic()
+        values: dict[KeyT, ValueT] = {}
+        with self._lock:
+            for key in keys:
+                item = self._items.get(key)
+                if item is None:
+                    continue
+                value, expires_at = item
+                if expires_at <= now:
+                    del self._items[key]
+                    continue
+                self._items.move_to_end(key)
+                values[key] = value
+
+        return values
+
+    def set(self, key: KeyT, value: ValueT, timeout: float) -> None:
+        self.set_many({key: value}, timeout)
+
+    def set_many(self, values: dict[KeyT, ValueT], timeout: float) -> None:
+        if timeout <= 0:
+            return
+
+        expires_at = time.monotonic() + timeout
+        with self._lock:
+            for key, value in values.items():
+                self._items[key] = (value, expires_at)
+                self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key: KeyT) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
@@ -0,0 +1 @@
+from .generator import SnowflakeGenerator, get_snowflake_timestamp_ms
@@ -0,0 +1,75 @@
+import time
+import threading
+
+
+def get_snowflake_timestamp_ms(
+    identifier: int,
+    epoch_ms: int,
+    worker_id_bits: int = 10,
+    sequence_bits: int = 12,
+) -> int:
+    """Время выдачи идентификатора в миллисекундах Unix (раскладка - как у генератора)"""
+
+    return (identifier >> (worker_id_bits + sequence_bits)) + epoch_ms
+
+
+class SnowflakeGenerator:
+    """
+    Генератор идентификаторов в стиле Snowflake.
+
+    Идентификатор состоит из времени в миллисекундах от `epoch_ms` (41 бит),
+    номера воркера (`worker_id_bits`) и порядкового номера внутри миллисекунды
+    (`sequence_bits`). Идентификаторы монотонно растут внутри процесса и уникальны
+    между процессами, если у каждого процесса свой `worker_id`.
+
+    По умолчанию раскладка классическая (64 бита). Если идентификаторы уходят
+    в JavaScript, суммарно не должно быть больше 53 бит, иначе числа потеряют точность.
+    """
+
+    TIMESTAMP_BITS = 41
+
+    def __init__(
+        self,
+        worker_id: int,
+        epoch_ms: int,
+        worker_id_bits: int = 10,
+        sequence_bits: int = 12,
+    ) -> None:
+        self.max_worker_id = (1 << worker_id_bits) - 1
+        if not 0 <= worker_id <= self.max_worker_id:
+            raise ValueError(f'Номер воркера должен быть от 0 до {self.max_worker_id}.')
+
+        self.worker_id = worker_id
+        self.epoch_ms = epoch_ms
+        self._worker_id_shift = sequence_bits
+        self._timestamp_shift = worker_id_bits + sequence_bits
+        self._max_sequence = (1 << sequence_bits) - 1
+        self._last_timestamp_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def generate(self) -> int:
+        with self._lock:
+            timestamp_ms = self._get_timestamp_ms()
+            # Если часы отстали, продолжаем от последнего выданного времени,
+            # чтобы не выдать повторный идентификатор.
+            timestamp_ms = max(timestamp_ms, self._last_timestamp_ms)
+
+            if timestamp_ms == self._last_timestamp_ms:
+                self._sequence = (self._sequence + 1) & self._max_sequence
+                if self._sequence == 0:
+                    # Номера внутри миллисекунды закончились, ждем следующую.
+                    while timestamp_ms <= self._last_timestamp_ms:
+                        timestamp_ms = self._get_timestamp_ms()
+            else:
+                self._sequence = 0
+
+            self._last_timestamp_ms = timestamp_ms
+            return (
+                (timestamp_ms << self._timestamp_shift)
+                | (self.worker_id << self._worker_id_shift)
+                | self._sequence
+            )
+
+    def _get_timestamp_ms(self) -> int:
+        return time.time_ns() // 1_000_000 - self.epoch_ms